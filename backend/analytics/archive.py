@@ -0,0 +1,132 @@
+"""Retention for the ``Event`` table: compressed, day-partitioned archive files.
+
+``archive_events`` moves events older than ``ANALYTICS_ARCHIVE_AFTER_DAYS``
+out of the live table in ``pk`` order. Each batch is written, per UTC day, to
+a gzip NDJSON file (one JSON object per line) inside that day's partition
+directory (``<ANALYTICS_ARCHIVE_DIR>/YYYY-MM-DD/<first id>-<last id>.ndjson.gz``).
+Files are written under a temporary name, synced and renamed into place, and
+only then are the rows deleted, so a crash can at worst archive a batch twice,
+never lose it or leave a half-written file. Readers drop repeated ids within a
+partition, which is enough because an event always lands in its own day.
+
+Only events already counted by the rollups (at or below the ``RollupCursor``
+mark) are archived, so the hourly and daily counts stay complete; rebuilding
+the rollups counts the archive as well as the live table. Like the rollups,
+archiving stops at the first event in ``pk`` order that is still too recent.
+
+``archived_events`` answers range queries by opening only the partitions whose
+day falls inside the requested window.
+"""
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.utils import timezone
+from .models import Event, RollupCursor
+from .rollups import CURSOR_NAME
+
+PARTITION_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+FILE_RE = re.compile(r'^(\d+)-(\d+)\.ndjson\.gz$')
+
+
+def archive_dir():
+    return settings.ANALYTICS_ARCHIVE_DIR
+
+
+def partitions(since=None, until=None):
+    """Return ``(day, path)`` for the archived days overlapping ``[since, until)``, oldest first."""
+    try:
+        names = os.listdir(archive_dir())
+    except FileNotFoundError:
+        return []
+    first = since.astimezone(dt_timezone.utc).date() if since else date.min
+    last = until.astimezone(dt_timezone.utc).date() if until else date.max
+    found = []
+    for name in names:
+        if PARTITION_RE.match(name):
+            day = date.fromisoformat(name)
+            if first <= day <= last:
+                found.append((day, os.path.join(archive_dir(), name)))
+    return sorted(found)
+
+
+def partition_files(path):
+    """Return a partition's batch files in ``pk`` order."""
+    files = [(int(match.group(1)), name) for name in os.listdir(path) if (match := FILE_RE.match(name))]
+    return [os.path.join(path, name) for _, name in sorted(files)]
+
+
+def write_partition_file(day, rows):
+    """Write one batch of a day's events atomically into its partition."""
+    directory = os.path.join(archive_dir(), day.isoformat())
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{rows[0]['id']}-{rows[-1]['id']}.ndjson.gz")
+    with open(path + '.tmp', 'wb') as f:
+        with gzip.GzipFile(fileobj=f, mode='wb') as out:
+            for row in rows:
+                out.write(json.dumps(row, separators=(',', ':')).encode() + b'\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def archive_batch(cutoff, batch_size=5000):
+    """Archive and delete the oldest events before ``cutoff``; returns how many moved."""
+    mark = RollupCursor.objects.filter(name=CURSOR_NAME).values_list('last_event_id', flat=True).first() or 0
+    # Read the lowest ids and stop at the first event that is not old enough, as the
+    # rollups do: each batch, including the last, is a primary-key range scan of at
+    # most batch_size rows, and the live table needs no index on timestamp.
+    rows = list(
+        Event.objects.filter(pk__lte=mark).order_by('pk')
+        .values('id', 'user_id', 'event_type', 'timestamp', 'route_id', 'object_id', 'metadata')[:batch_size]
+    )
+    for index, row in enumerate(rows):
+        if row['timestamp'] >= cutoff:
+            rows = rows[:index]
+            break
+    if not rows:
+        return 0
+
+    by_day = {}
+    for row in rows:
+        timestamp = row['timestamp'].astimezone(dt_timezone.utc)
+        row['timestamp'] = timestamp.isoformat()
+        by_day.setdefault(timestamp.date(), []).append(row)
+    for day, day_rows in by_day.items():
+        write_partition_file(day, day_rows)
+
+    Event.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_events(days=None, batch_size=5000, now=None):
+    """Move every event older than ``days`` into the archive; returns the number moved."""
+    days = settings.ANALYTICS_ARCHIVE_AFTER_DAYS if days is None else days
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    total = 0
+    while moved := archive_batch(cutoff, batch_size):
+        total += moved
+    return total
+
+
+def archived_events(since=None, until=None, user_id=None, event_type=None):
+    """Yield archived events (as dicts) with ``since <= timestamp < until``, day by day."""
+    for _, directory in partitions(since, until):
+        seen = set()
+        for path in partition_files(directory):
+            with gzip.open(path, 'rt') as f:
+                for line in f:
+                    row = json.loads(line)
+                    if row['id'] in seen:
+                        continue
+                    seen.add(row['id'])
+                    if user_id is not None and row['user_id'] != user_id:
+                        continue
+                    if event_type is not None and row['event_type'] != event_type:
+                        continue
+                    row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+                    if (since and row['timestamp'] < since) or (until and row['timestamp'] >= until):
+                        continue
+                    yield row
@@ -0,0 +1,304 @@
+"""In-memory columnar store for cohort, funnel and time-to-completion queries.
+
+``CohortEngine`` keeps enrollments, content progress, quiz attempts and daily
+course activity (from ``DailyEventRollup``, so it outlives event archival) as
+NumPy column arrays. Users, courses, quizzes and event types are coded as dense
+integers and times as epoch seconds. Each table is loaded by streaming
+``values_list`` in ``pk`` order and refreshed incrementally from its id
+high-water mark; progress rows are also re-read when their ``completed_at``
+moves. Deletions, regrades and rows that commit behind a mark are picked up by
+the full rebuild every ``ANALYTICS_ENGINE_REBUILD_SECONDS``.
+
+Queries then run as vectorized masks, ``bincount``s and sorts over one course's
+rows, with no joins in the database.
+"""
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+import numpy as np
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+DAY = 24 * 60 * 60
+PERIODS = {'day': DAY, 'week': 7 * DAY}
+WEEK_OFFSET = 3 * DAY  # the epoch was a Thursday; shift so weeks start on Monday
+LOAD_CHUNK = 10000
+
+
+class Coder:
+    """Dense integer codes for ids or strings, assigned in order of first appearance."""
+
+    def __init__(self):
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.codes)
+        return code
+
+    def get(self, value):
+        return self.codes.get(value, -1)
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class Table:
+    """Append-only column arrays with amortized growth; ``table[name]`` is a view of the filled rows."""
+
+    def __init__(self, **dtypes):
+        self.size = 0
+        self.columns = {name: np.empty(1024, dtype) for name, dtype in dtypes.items()}
+
+    def append(self, rows):
+        """Append ``rows``, tuples in column order."""
+        if not rows:
+            return
+        end = self.size + len(rows)
+        capacity = len(self.columns['id'])
+        if end > capacity:
+            capacity = max(end, capacity * 2)
+            for name, array in self.columns.items():
+                grown = np.empty(capacity, array.dtype)
+                grown[:self.size] = array[:self.size]
+                self.columns[name] = grown
+        for array, values in zip(self.columns.values(), zip(*rows)):
+            array[self.size:end] = values
+        self.size = end
+
+    def last_id(self):
+        return int(self.columns['id'][self.size - 1]) if self.size else 0
+
+    def __getitem__(self, name):
+        return self.columns[name][:self.size]
+
+
+def epoch(value):
+    return int(value.timestamp())
+
+
+class CohortEngine:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.built_at = None
+        self.loaded_at = None
+        self.reset()
+
+    def reset(self):
+        self.users, self.courses, self.quizzes, self.event_types = Coder(), Coder(), Coder(), Coder()
+        self.enrollments = Table(id=np.int64, user=np.int32, course=np.int32, at=np.int64)
+        self.progress = Table(id=np.int64, user=np.int32, course=np.int32, completed=np.bool_, at=np.int64)
+        self.attempts = Table(id=np.int64, user=np.int32, quiz=np.int32, score=np.float32, at=np.int64)
+        self.activity = Table(id=np.int64, user=np.int32, course=np.int32, event_type=np.int16, at=np.int64)
+        self.progress_checked_at = None
+        self.content_totals = np.zeros(0, np.int32)  # per course code
+        self.final_quiz = np.zeros(0, np.int32)      # per course code, -1 when the course has no quiz
+
+    # Loading
+
+    def refresh(self, force=False):
+        """Load rows added since the last refresh, or rebuild when ``force`` or due."""
+        with self.lock:
+            now = time.monotonic()
+            if force or self.built_at is None or now - self.built_at >= settings.ANALYTICS_ENGINE_REBUILD_SECONDS:
+                self.reset()
+                self.built_at = now
+            elif now - self.loaded_at < settings.ANALYTICS_ENGINE_REFRESH_SECONDS:
+                return
+            self.load()
+            self.loaded_at = now
+
+    def stream(self, table, queryset, fields, convert):
+        rows = queryset.filter(pk__gt=table.last_id()).order_by('pk').values_list(*fields)
+        chunk = []
+        for row in rows.iterator(chunk_size=LOAD_CHUNK):
+            chunk.append(convert(row))
+            if len(chunk) == LOAD_CHUNK:
+                table.append(chunk)
+                chunk = []
+        table.append(chunk)
+
+    def load(self):
+        from assessments.models import Quiz, QuizAttempt
+        from courses.models import Content, Enrollment
+        from progress.models import Progress
+        from .models import DailyEventRollup
+
+        started = timezone.now()
+        user, course, quiz = self.users.encode, self.courses.encode, self.quizzes.encode
+        self.stream(
+            self.enrollments, Enrollment.objects.all(), ('id', 'student_id', 'course_id', 'enrolled_at'),
+            lambda row: (row[0], user(row[1]), course(row[2]), epoch(row[3])),
+        )
+        progress_fields = ('id', 'user_id', 'content__module__course_id', 'is_completed', 'completed_at')
+
+        def convert_progress(row):
+            return row[0], user(row[1]), course(row[2]), row[3], epoch(row[4])
+
+        if self.progress_checked_at is not None:
+            # Rows below the mark that were saved again (completed or reset) since the last refresh.
+            changed = list(
+                Progress.objects.filter(pk__lte=self.progress.last_id(), completed_at__gte=self.progress_checked_at)
+                .values_list(*progress_fields)
+            )
+            if changed:
+                rows = [convert_progress(row) for row in changed]
+                ids = np.array([row[0] for row in rows], np.int64)
+                positions = np.searchsorted(self.progress['id'], ids)
+                found = positions < self.progress.size
+                found[found] = self.progress['id'][positions[found]] == ids[found]
+                for name, index in (('completed', 3), ('at', 4)):
+                    self.progress[name][positions[found]] = np.array([row[index] for row in rows])[found]
+        self.stream(self.progress, Progress.objects.all(), progress_fields, convert_progress)
+        # Overlap by the rollup lag so saves that committed late are not missed.
+        self.progress_checked_at = started - timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG)
+        self.stream(
+            self.attempts, QuizAttempt.objects.exclude(score=None),
+            ('id', 'user_id', 'quiz_id', 'score', 'submitted_at'),
+            lambda row: (row[0], user(row[1]), quiz(row[2]), row[3], epoch(row[4])),
+        )
+        self.stream(
+            self.activity, DailyEventRollup.objects.exclude(course_id=0),
+            ('id', 'user_id', 'course_id', 'event_type', 'bucket'),
+            lambda row: (row[0], user(row[1]), course(row[2]), self.event_types.encode(row[3]), epoch(row[4])),
+        )
+
+        # Small per-course lookups, recomputed in full each time.
+        totals = {
+            course(course_id): n
+            for course_id, n in Content.objects.order_by().values('module__course').annotate(n=Count('id'))
+            .values_list('module__course', 'n')
+        }
+        final = {}
+        quizzes = Quiz.objects.order_by('module__order', 'module_id').values_list('module__course_id', 'id')
+        for course_id, quiz_id in quizzes:
+            final[course(course_id)] = quiz(quiz_id)
+        self.content_totals = np.zeros(len(self.courses), np.int32)
+        self.content_totals[list(totals)] = list(totals.values())
+        self.final_quiz = np.full(len(self.courses), -1, np.int32)
+        self.final_quiz[list(final)] = list(final.values())
+
+    # Queries. Each returns plain Python values ready for a Response.
+
+    def cohort(self, course_id, since=None, until=None):
+        """Return ``(course code, user codes, enrolled_at)`` for a course's enrollments, sorted by user."""
+        code = self.courses.get(course_id)
+        mask = self.enrollments['course'] == code
+        if since:
+            mask &= self.enrollments['at'] >= epoch(since)
+        if until:
+            mask &= self.enrollments['at'] < epoch(until)
+        users, enrolled_at = self.enrollments['user'][mask], self.enrollments['at'][mask]
+        order = np.argsort(users, kind='stable')
+        return code, users[order], enrolled_at[order]
+
+    def required_items(self, code, completion):
+        total = int(self.content_totals[code]) if 0 <= code < len(self.content_totals) else 0
+        return max(math.ceil(completion * total), 1) if total else 0
+
+    def completed_rows(self, code):
+        mask = (self.progress['course'] == code) & self.progress['completed']
+        return self.progress['user'][mask], self.progress['at'][mask]
+
+    def funnel(self, course_id, since=None, until=None, completion=0.5, pass_score=None):
+        """Enrolled -> completed ``completion`` of the content -> passed the course's last quiz."""
+        pass_score = settings.ANALYTICS_PASS_SCORE if pass_score is None else pass_score
+        with self.lock:
+            code, users, _ = self.cohort(course_id, since, until)
+            required = self.required_items(code, completion)
+            done = np.bincount(self.completed_rows(code)[0], minlength=len(self.users))
+            completed = users[done[users] >= required] if required else users[:0]
+            quiz = self.final_quiz[code] if 0 <= code < len(self.final_quiz) else -1
+            mask = (self.attempts['quiz'] == quiz) & (self.attempts['score'] >= pass_score)
+            passed = completed[np.isin(completed, self.attempts['user'][mask])] if quiz >= 0 else completed[:0]
+
+        steps = []
+        for name, members in (('enrolled', users), ('completed', completed), ('passed', passed)):
+            previous = steps[-1]['users'] if steps else len(members)
+            steps.append({
+                'step': name,
+                'users': len(members),
+                'conversion': len(members) / previous if previous else 0,
+                'overall': len(members) / len(users) if len(users) else 0,
+            })
+        return {'required_items': required, 'pass_score': pass_score, 'steps': steps}
+
+    def time_to_completion(self, course_id, since=None, until=None, completion=1.0):
+        """Hours from enrollment until a learner's ``completion`` share of the content was done."""
+        with self.lock:
+            code, users, enrolled_at = self.cohort(course_id, since, until)
+            required = self.required_items(code, completion)
+            learners, times = self.completed_rows(code)
+            hours = np.zeros(0)
+            if required and len(learners):
+                order = np.lexsort((times, learners))
+                learners, times = learners[order], times[order]
+                starts = np.flatnonzero(np.r_[True, learners[1:] != learners[:-1]])
+                counts = np.diff(np.r_[starts, len(learners)])
+                reached = starts[counts >= required]
+                done_users, done_at = learners[reached], times[reached + required - 1]
+                positions = np.searchsorted(users, done_users)
+                in_cohort = positions < len(users)
+                in_cohort[in_cohort] = users[positions[in_cohort]] == done_users[in_cohort]
+                hours = np.maximum(done_at[in_cohort] - enrolled_at[positions[in_cohort]], 0) / 3600
+
+        result = {'cohort': len(users), 'completed': len(hours), 'required_items': required}
+        if len(hours):
+            p25, median, p75, p90 = np.percentile(hours, [25, 50, 75, 90])
+            result.update(mean_hours=float(hours.mean()), median_hours=float(median),
+                          p25_hours=float(p25), p75_hours=float(p75), p90_hours=float(p90))
+        return result
+
+    def retention(self, course_id, since=None, until=None, period='week', periods=8, event_type=None):
+        """Share of each enrollment cohort active in the course 0..``periods``-1 periods after enrolling."""
+        length = PERIODS[period]
+        offset = WEEK_OFFSET if period == 'week' else 0
+        with self.lock:
+            code, users, enrolled_at = self.cohort(course_id, since, until)
+            if not len(users):
+                return []
+            mask = self.activity['course'] == code
+            if event_type:
+                mask &= self.activity['event_type'] == self.event_types.get(event_type)
+            active_users, active_at = self.activity['user'][mask], self.activity['at'][mask]
+
+        start_bucket = (enrolled_at + offset) // length
+        positions = np.searchsorted(users, active_users)
+        in_cohort = positions < len(users)
+        in_cohort[in_cohort] = users[positions[in_cohort]] == active_users[in_cohort]
+        members = positions[in_cohort]
+        since_start = (active_at[in_cohort] + offset) // length - start_bucket[members]
+        keep = (since_start >= 0) & (since_start < periods)
+        # One count per (learner, period), however many active days fall in it.
+        pairs = np.unique(members[keep] * periods + since_start[keep])
+
+        cohorts, cohort_of = np.unique(start_bucket, return_inverse=True)
+        sizes = np.bincount(cohort_of, minlength=len(cohorts))
+        active = np.bincount(
+            cohort_of[pairs // periods] * periods + pairs % periods, minlength=len(cohorts) * periods
+        ).reshape(len(cohorts), periods)
+        return [
+            {
+                'cohort': datetime.fromtimestamp(int(bucket) * length - offset, dt_timezone.utc),
+                'size': int(size),
+                'active': row.tolist(),
+                'rates': (row / size).round(4).tolist(),
+            }
+            for bucket, size, row in zip(cohorts, sizes, active)
+        ]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = CohortEngine()
+    return _engine
@@ -0,0 +1,158 @@
+"""Buffered ingestion of analytics events.
+
+``track`` never writes to the database on the request thread in buffered
+mode: events go into a bounded in-process queue and a daemon thread writes
+them with ``bulk_create`` whenever a batch fills or the flush interval
+passes. When the queue is full new events are dropped and counted rather
+than blocking the request. The queue is drained on interpreter shutdown.
+"""
+import atexit
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.db import close_old_connections
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+
+class EventBuffer:
+    def __init__(self, max_size, batch_size, flush_interval):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_size)
+        self.counters = Counter()
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.pid = None
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, pending=self.queue.qsize())
+
+    def push(self, event):
+        """Queue ``event`` for writing; returns False if it was dropped."""
+        self.ensure_worker()
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.count('dropped')
+            return False
+        self.count('queued')
+        return True
+
+    def ensure_worker(self):
+        if self.pid == os.getpid() and self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.pid == os.getpid() and self.thread is not None and self.thread.is_alive():
+                return
+            if self.pid != os.getpid():
+                # Forked (e.g. a preloaded app server): the parent's thread and queue lock did not come along.
+                self.queue = queue.Queue(maxsize=self.max_size)
+                self.pid = os.getpid()
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.run, name='analytics-ingest', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while not self.stopping.is_set():
+            batch = self.take(self.flush_interval)
+            if batch:
+                self.write(batch)
+        self.flush()
+
+    def take(self, timeout):
+        """Collect up to one batch, waiting at most ``timeout`` seconds for it to fill."""
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Write everything queued so far on the calling thread."""
+        while True:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                return
+            self.write(batch)
+
+    def write(self, batch):
+        close_old_connections()
+        try:
+            Event.objects.bulk_create(batch)
+        except Exception:
+            logger.exception('Dropping %d analytics events that could not be written', len(batch))
+            self.count('failed', len(batch))
+        else:
+            self.count('written', len(batch))
+
+    def stop(self, timeout=5):
+        """Stop the worker after it drains the queue (or drain it here if none is running)."""
+        self.stopping.set()
+        if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+            self.thread.join(timeout)
+        else:
+            self.flush()
+        if self.counters['dropped'] or self.counters['failed']:
+            logger.warning('Analytics ingestion stopped: %s', self.stats())
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = EventBuffer(
+                    settings.ANALYTICS_BUFFER_SIZE, settings.ANALYTICS_BATCH_SIZE, settings.ANALYTICS_FLUSH_INTERVAL
+                )
+                atexit.register(_buffer.stop)
+    return _buffer
+
+
+def track(user, event_type, metadata=None, route_id=None, object_id=None):
+    """Record an event according to ANALYTICS_INGEST_MODE and ANALYTICS_SAMPLE_RATE."""
+    mode = settings.ANALYTICS_INGEST_MODE
+    if mode == 'off':
+        return
+    rate = settings.ANALYTICS_SAMPLE_RATE
+    if rate < 1 and random.random() >= rate:
+        if mode == 'buffered':
+            get_buffer().count('sampled_out')
+        return
+    event = Event(user_id=user.pk, event_type=event_type, route_id=route_id, object_id=object_id, metadata=metadata)
+    if mode == 'buffered':
+        get_buffer().push(event)
+        return
+    try:
+        event.save()
+    except Exception:
+        # Analytics must never break the request.
+        logger.exception('Could not record analytics event')
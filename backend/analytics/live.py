@@ -0,0 +1,208 @@
+"""Live instructor dashboards over server-sent events.
+
+``AnalyticsViewSet.live`` checks the instructor once and returns a signed,
+short-lived stream URL listing their course ids (``EventSource`` cannot send
+the JWT header). ``live_stream`` is an async view: it verifies the signature
+without touching the database and subscribes the connection to the process's
+single ``ChangeFeed``.
+
+The feed polls while anyone is subscribed, once per
+``ANALYTICS_LIVE_POLL_INTERVAL`` however many dashboards are connected. It
+reads new enrollments, payments and quiz attempts past per-table id
+high-water marks for the watched courses, and fans them out as deltas to each
+subscriber's queue. Payments are created pending and succeed later, so
+pending ones seen in the last ``PENDING_WINDOW`` are re-checked on each poll.
+Rows that commit out of id order can be missed; a dashboard treats the stream
+as deltas on top of the ``instructor_stats`` snapshot it loaded, and
+reconnecting reloads that snapshot.
+
+The endpoint needs an ASGI server (``uvicorn backend.asgi:application``).
+Under WSGI (``runserver``, gunicorn's sync workers) a response is only sent
+once the stream ends, so both the ticket action and the stream refuse with 503
+there instead of holding a worker while delivering nothing.
+"""
+import asyncio
+import json
+import logging
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import Max
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SIGNING_SALT = 'analytics.live'
+PENDING_WINDOW = timedelta(hours=24)
+UNSUPPORTED = 'Live updates need the ASGI server (uvicorn backend.asgi:application).'
+
+
+def stream_supported(request):
+    """Whether ``request`` (a Django or DRF request) is being served by the ASGI handler."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def signed_stream_url(request, user, course_ids):
+    token = signing.dumps({'u': user.pk, 'c': sorted(course_ids)}, salt=SIGNING_SALT, compress=True)
+    return request.build_absolute_uri(f"{reverse('analytics-live-stream')}?ticket={token}")
+
+
+class ChangeFeed:
+    def __init__(self, interval, queue_size):
+        self.interval = interval
+        self.queue_size = queue_size
+        self.subscribers = {}  # queue -> frozenset of course ids
+        self.task = None
+        self.marks = None
+        self.pending = {}      # payment id -> created_at
+
+    def subscribe(self, course_ids):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers[queue] = frozenset(course_ids)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.pop(queue, None)
+
+    def watched(self):
+        return set().union(*self.subscribers.values())
+
+    async def run(self):
+        while self.subscribers:
+            await asyncio.sleep(self.interval)
+            watched = self.watched()
+            if not watched:
+                continue
+            try:
+                changes = await sync_to_async(self.poll, thread_sensitive=False)(watched)
+            except Exception:
+                logger.exception('Live analytics poll failed')
+                continue
+            self.dispatch(changes)
+        # Nobody is listening: forget the marks so the next subscriber starts from now.
+        self.marks = None
+        self.pending.clear()
+
+    def dispatch(self, changes):
+        """Queue each change for the subscribers watching its course."""
+        for queue, course_ids in list(self.subscribers.items()):
+            for change in changes:
+                if change['course'] not in course_ids:
+                    continue
+                try:
+                    queue.put_nowait(change)
+                except asyncio.QueueFull:
+                    # A stalled client: end its stream so it reconnects and reloads the snapshot.
+                    self.unsubscribe(queue)
+                    break
+
+    def poll(self, course_ids):
+        """Return the changes in ``course_ids`` since the last poll (none on the first)."""
+        from assessments.models import QuizAttempt
+        from courses.models import Enrollment
+        from payments.models import Payment
+
+        close_old_connections()
+        tables = {'enrollment': Enrollment, 'payment': Payment, 'quiz_attempt': QuizAttempt}
+        tops = {name: model.objects.aggregate(top=Max('pk'))['top'] or 0 for name, model in tables.items()}
+        if self.marks is None:
+            self.marks = tops
+            since = timezone.now() - PENDING_WINDOW
+            self.pending = dict(
+                Payment.objects.filter(status='pending', created_at__gte=since).values_list('pk', 'created_at')
+            )
+            return []
+
+        def new_rows(name, queryset):
+            return queryset.filter(pk__gt=self.marks[name], pk__lte=tops[name]).order_by('pk')
+
+        enrollments = new_rows('enrollment', Enrollment.objects.filter(course_id__in=course_ids))
+        changes = [
+            {'type': 'enrollment', 'course': course_id, 'id': pk, 'at': enrolled_at}
+            for pk, course_id, enrolled_at in enrollments.values_list('pk', 'course_id', 'enrolled_at')
+        ]
+        changes += [
+            {'type': 'quiz_attempt', 'course': course_id, 'id': pk, 'quiz': quiz_id, 'score': score, 'at': submitted_at}
+            for pk, course_id, quiz_id, score, submitted_at in new_rows(
+                'quiz_attempt', QuizAttempt.objects.filter(quiz__module__course_id__in=course_ids)
+            ).values_list('pk', 'quiz__module__course_id', 'quiz_id', 'score', 'submitted_at')
+        ]
+
+        payments = list(
+            new_rows('payment', Payment.objects.filter(course_id__in=course_ids))
+            .values_list('pk', 'course_id', 'amount', 'status', 'created_at')
+        )
+        cutoff = timezone.now() - PENDING_WINDOW
+        self.pending = {pk: created_at for pk, created_at in self.pending.items() if created_at >= cutoff}
+        if self.pending:
+            payments += list(
+                Payment.objects.filter(pk__in=list(self.pending), course_id__in=course_ids).exclude(status='pending')
+                .values_list('pk', 'course_id', 'amount', 'status', 'created_at')
+            )
+        for pk, course_id, amount, status, created_at in payments:
+            if status == 'pending':
+                self.pending[pk] = created_at
+                continue
+            self.pending.pop(pk, None)
+            if status == 'succeeded':
+                changes.append({'type': 'payment', 'course': course_id, 'id': pk, 'amount': float(amount)})
+
+        self.marks = tops
+        return changes
+
+
+def format_event(change):
+    data = json.dumps({key: value for key, value in change.items() if key != 'type'}, cls=DjangoJSONEncoder)
+    return f"event: {change['type']}\nid: {change['type']}-{change['id']}\ndata: {data}\n\n"
+
+
+async def event_stream(feed, course_ids):
+    queue = feed.subscribe(course_ids)
+    try:
+        yield f'retry: {settings.ANALYTICS_LIVE_RETRY_MS}\n\n'
+        while queue in feed.subscribers or not queue.empty():
+            try:
+                change = await asyncio.wait_for(queue.get(), timeout=settings.ANALYTICS_LIVE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle connection.
+                yield ': keep-alive\n\n'
+                continue
+            yield format_event(change)
+    finally:
+        feed.unsubscribe(queue)
+
+
+async def live_stream(request):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not stream_supported(request):
+        return HttpResponse(UNSUPPORTED, status=503)
+    try:
+        payload = signing.loads(
+            request.GET.get('ticket', ''), salt=SIGNING_SALT, max_age=settings.ANALYTICS_LIVE_TICKET_MAX_AGE
+        )
+    except signing.BadSignature:
+        return HttpResponse('Invalid or expired stream ticket.', status=403)
+
+    response = StreamingHttpResponse(event_stream(get_feed(), payload['c']), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # let nginx pass events through as they are written
+    return response
+
+
+_feed = None
+
+
+def get_feed():
+    global _feed
+    if _feed is None:
+        _feed = ChangeFeed(settings.ANALYTICS_LIVE_POLL_INTERVAL, settings.ANALYTICS_LIVE_QUEUE_SIZE)
+    return _feed
@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from analytics.archive import archive_events
+from analytics.rollups import roll_up_events
+
+
+class Command(BaseCommand):
+    help = 'Move old analytics events into the daily compressed archive and delete them from the live table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Archive events older than this (default ANALYTICS_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--loop', type=int, metavar='SECONDS', help='Keep running, archiving every SECONDS')
+
+    def handle(self, *args, **options):
+        while True:
+            # Archiving stops at the rollup mark, so count pending events first.
+            roll_up_events(options['batch_size'])
+            moved = archive_events(options['days'], options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Archived {moved} events'))
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
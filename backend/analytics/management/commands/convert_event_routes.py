@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from analytics.routes import convert_events, sync_routes
+
+
+class Command(BaseCommand):
+    help = 'Move events that store a raw path in metadata onto the route columns (resumable with --after-id)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--after-id', type=int, default=0, help='Resume after this Event id')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        sync_routes()
+        scanned = converted = 0
+        for last_id, batch_scanned, batch_converted in convert_events(options['after_id'], options['batch_size']):
+            scanned += batch_scanned
+            converted += batch_converted
+            self.stdout.write(f'{scanned} scanned, {converted} converted (resume with --after-id {last_id})')
+        self.stdout.write(self.style.SUCCESS(f'Converted {converted} of {scanned} events to route columns'))
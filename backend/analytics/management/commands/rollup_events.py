@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from analytics.rollups import reset_rollups, roll_up_events
+
+
+class Command(BaseCommand):
+    help = 'Fold new analytics events into the hourly and daily rollup tables (safe to rerun)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--loop', type=int, metavar='SECONDS', help='Keep running, catching up every SECONDS')
+        parser.add_argument(
+            '--rebuild', action='store_true', help='Discard the rollups and recount every event, archived ones included'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            archived = reset_rollups(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Recounted {archived} archived events'))
+        while True:
+            counted = roll_up_events(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Rolled up {counted} events'))
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
@@ -1,4 +1,5 @@
-from .models import Event
+from .ingest import track
+from .routes import describe
 
 class AnalyticsMiddleware:
     """Middleware to track page views and user actions"""
@@ -13,14 +14,8 @@ class AnalyticsMiddleware:
         if request.user.is_authenticated and request.method == 'GET':
             # Only track API calls, not static files
             if request.path.startswith('/api/'):
-                try:
-                    Event.objects.create(
-                        user=request.user,
-                        event_type='PAGE_VIEW',
-                        metadata={'path': request.path, 'method': request.method}
-                    )
-                except Exception:
-                    # Silently fail if event creation fails
-                    pass
+                # Queued for a background bulk insert; no database write on this request.
+                route_id, object_id, extras = describe(request.resolver_match, request.method, request.path)
+                track(request.user, 'PAGE_VIEW', extras, route_id=route_id, object_id=object_id)
         
         return response
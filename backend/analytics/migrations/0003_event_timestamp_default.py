@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:23
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_event_event_user_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_event_timestamp_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_event_id', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyEventRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('event_type', models.CharField(choices=[('PAGE_VIEW', 'Page View'), ('COURSE_PURCHASE', 'Course Purchase'), ('COURSE_COMPLETION', 'Course Completion'), ('QUIZ_ATTEMPT', 'Quiz Attempt'), ('ASSIGNMENT_SUBMIT', 'Assignment Submit')], max_length=30)),
+                ('course_id', models.PositiveIntegerField(default=0)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course_id', 'bucket'], name='daily_rollup_course_idx'), models.Index(fields=['user', 'bucket'], name='daily_rollup_user_idx')],
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'event_type', 'course_id', 'user'), name='daily_rollup_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyEventRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('event_type', models.CharField(choices=[('PAGE_VIEW', 'Page View'), ('COURSE_PURCHASE', 'Course Purchase'), ('COURSE_COMPLETION', 'Course Completion'), ('QUIZ_ATTEMPT', 'Quiz Attempt'), ('ASSIGNMENT_SUBMIT', 'Assignment Submit')], max_length=30)),
+                ('course_id', models.PositiveIntegerField(default=0)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course_id', 'bucket'], name='hourly_rollup_course_idx'), models.Index(fields=['user', 'bucket'], name='hourly_rollup_user_idx')],
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'event_type', 'course_id', 'user'), name='hourly_rollup_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_event_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='object_id',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Route',
+            fields=[
+                ('id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('method', models.CharField(default='GET', max_length=10)),
+            ],
+            options={
+                'unique_together': {('name', 'method')},
+            },
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='route',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='analytics.route'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['route', 'object_id', 'timestamp'], name='event_route_object_idx'),
+        ),
+    ]
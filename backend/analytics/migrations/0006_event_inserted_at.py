@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_event_routes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='inserted_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
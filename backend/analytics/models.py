@@ -1,5 +1,18 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+class Route(models.Model):
+    """Dictionary of URL routes referenced by ``Event.route``; ids come from analytics.routes.route_id."""
+    id = models.PositiveIntegerField(primary_key=True)
+    name = models.CharField(max_length=100)
+    method = models.CharField(max_length=10, default='GET')
+
+    class Meta:
+        unique_together = ('name', 'method')
+
+    def __str__(self):
+        return f"{self.method} {self.name}"
 
 class Event(models.Model):
     class EventType(models.TextChoices):
@@ -11,8 +24,63 @@ class Event(models.Model):
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='events')
     event_type = models.CharField(max_length=30, choices=EventType.choices)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when a buffered batch is written.
+    timestamp = models.DateTimeField(default=timezone.now)
+    # Set when the row is written; the rollups wait on this, not on timestamp, for ids below them to commit.
+    inserted_at = models.DateTimeField(auto_now_add=True)
+    # Page views record the resolved route and the id of the object it is about
+    # (see analytics.routes); metadata keeps only what does not fit those columns.
+    # No FK constraint, so a route added to the URLconf is recorded before sync_routes runs.
+    route = models.ForeignKey(Route, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+                              related_name='+')
+    object_id = models.PositiveIntegerField(null=True, blank=True)
     metadata = models.JSONField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'timestamp', 'id'], name='event_user_idx'),
+            models.Index(fields=['route', 'object_id', 'timestamp'], name='event_route_object_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.event_type} at {self.timestamp}"
+
+class EventRollup(models.Model):
+    """Event counts per (bucket, event_type, course, user); see analytics.rollups."""
+    bucket = models.DateTimeField()
+    event_type = models.CharField(max_length=30, choices=Event.EventType.choices)
+    course_id = models.PositiveIntegerField(default=0)  # 0 when the event is not tied to a course
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+class HourlyEventRollup(EventRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'event_type', 'course_id', 'user'], name='hourly_rollup_key'),
+        ]
+        indexes = [
+            models.Index(fields=['course_id', 'bucket'], name='hourly_rollup_course_idx'),
+            models.Index(fields=['user', 'bucket'], name='hourly_rollup_user_idx'),
+        ]
+
+class DailyEventRollup(EventRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'event_type', 'course_id', 'user'], name='daily_rollup_key'),
+        ]
+        indexes = [
+            models.Index(fields=['course_id', 'bucket'], name='daily_rollup_course_idx'),
+            models.Index(fields=['user', 'bucket'], name='daily_rollup_user_idx'),
+        ]
+
+class RollupCursor(models.Model):
+    """High-water mark: every Event with id <= last_event_id is counted in the rollups."""
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_event_id}"
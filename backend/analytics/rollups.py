@@ -0,0 +1,164 @@
+"""Hourly and daily rollups of ``Event`` counts.
+
+``roll_up_events`` reads events past the ``RollupCursor`` high-water mark in
+``id`` order, counts them per (bucket, event_type, course, user) and adds the
+counts to ``HourlyEventRollup``/``DailyEventRollup`` in the same transaction
+that advances the cursor, so each event is counted exactly once however
+often the job runs. Events inserted less than ``ANALYTICS_ROLLUP_LAG``
+seconds ago are left for the next run, giving in-flight transactions and the
+ingestion buffer time to commit ids below the mark. The lag runs from
+``inserted_at``, not ``timestamp``: the buffer writes events after they happen,
+so a back-dated event can still be committing behind a later id.
+
+The course of an event comes from its route and ``object_id`` (a course, or a
+module, content, quiz or assignment of that course), from
+``metadata['course_id']``, or from the raw API path older events record.
+"""
+import re
+from collections import Counter, defaultdict
+from datetime import timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import DailyEventRollup, Event, HourlyEventRollup, RollupCursor
+from .routes import route_target
+
+CURSOR_NAME = 'event-rollups'
+PATH_RE = re.compile(r'^/api/(courses|modules|contents|quizzes|assignments)/(\d+)/')
+ROLLUPS = {'hour': HourlyEventRollup, 'day': DailyEventRollup}
+
+
+def truncate(timestamp, granularity):
+    timestamp = timestamp.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0) if granularity == 'day' else timestamp
+
+
+def event_target(route_id, object_id, metadata):
+    """Return a ``('courses', id)`` style reference for an event, or None."""
+    target = route_target(route_id, object_id) if route_id is not None else None
+    if target or not isinstance(metadata, dict):
+        return target
+    course_id = metadata.get('course_id', metadata.get('course'))
+    if isinstance(course_id, int) or (isinstance(course_id, str) and course_id.isdigit()):
+        return 'courses', int(course_id)
+    match = PATH_RE.match(str(metadata.get('path', '')))
+    return (match.group(1), int(match.group(2))) if match else None
+
+
+def resolve_courses(targets):
+    """Map ``(kind, id)`` references to course ids with one query per kind."""
+    from assessments.models import Assignment, Quiz
+    from courses.models import Content, Module
+
+    lookups = {
+        'modules': (Module, 'course_id'),
+        'contents': (Content, 'module__course_id'),
+        'quizzes': (Quiz, 'module__course_id'),
+        'assignments': (Assignment, 'module__course_id'),
+    }
+    by_kind = defaultdict(set)
+    for kind, object_id in targets:
+        by_kind[kind].add(object_id)
+
+    courses = {('courses', pk): pk for pk in by_kind.pop('courses', ())}
+    for kind, ids in by_kind.items():
+        model, field = lookups[kind]
+        for pk, course_id in model.objects.filter(pk__in=ids).order_by().values_list('pk', field):
+            courses[kind, pk] = course_id
+    return courses
+
+
+def apply_counts(model, counts):
+    """Add ``{(bucket, event_type, course_id, user_id): n}`` to ``model``'s rows."""
+    if not counts:
+        return
+    buckets = {key[0] for key in counts}
+    users = {key[3] for key in counts}
+    existing = {
+        (row.bucket, row.event_type, row.course_id, row.user_id): row
+        for row in model.objects.filter(bucket__in=buckets, user_id__in=users)
+    }
+    changed, new = [], []
+    for key, n in counts.items():
+        if key in existing:
+            existing[key].count += n
+            changed.append(existing[key])
+        else:
+            bucket, event_type, course_id, user_id = key
+            new.append(model(bucket=bucket, event_type=event_type, course_id=course_id, user_id=user_id, count=n))
+    model.objects.bulk_update(changed, ['count'], batch_size=1000)
+    model.objects.bulk_create(new, batch_size=1000)
+
+
+def count_events(rows):
+    """Add ``(pk, user_id, event_type, timestamp, route_id, object_id, metadata)`` rows to the rollups."""
+    targets = {pk: event_target(route_id, object_id, metadata) for pk, *_, route_id, object_id, metadata in rows}
+    courses = resolve_courses({target for target in targets.values() if target})
+    counts = {granularity: Counter() for granularity in ROLLUPS}
+    for pk, user_id, event_type, timestamp, *_ in rows:
+        course_id = courses.get(targets[pk], 0)
+        for granularity, counter in counts.items():
+            counter[truncate(timestamp, granularity), event_type, course_id, user_id] += 1
+    for granularity, model in ROLLUPS.items():
+        apply_counts(model, counts[granularity])
+
+
+def roll_up_batch(batch_size=5000, now=None):
+    """Fold the next batch of events into the rollups; returns how many were counted."""
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG)
+    with transaction.atomic():
+        cursor, _ = RollupCursor.objects.select_for_update().get_or_create(name=CURSOR_NAME)
+        rows = list(
+            Event.objects.filter(pk__gt=cursor.last_event_id).order_by('pk')
+            .values_list('pk', 'user_id', 'event_type', 'timestamp', 'route_id', 'object_id', 'metadata',
+                         'inserted_at')[:batch_size]
+        )
+        # Stop at the first event inserted too recently, so the mark only ever passes a settled prefix.
+        for index, row in enumerate(rows):
+            if row[-1] >= cutoff:
+                rows = rows[:index]
+                break
+        if not rows:
+            return 0
+
+        count_events([row[:-1] for row in rows])
+        cursor.last_event_id = rows[-1][0]
+        cursor.save(update_fields=['last_event_id', 'updated_at'])
+    return len(rows)
+
+
+def roll_up_events(batch_size=5000, now=None):
+    """Catch the rollups up with the event table; returns the number of events counted."""
+    total = 0
+    while counted := roll_up_batch(batch_size, now):
+        total += counted
+    return total
+
+
+def reset_rollups(batch_size=5000):
+    """Discard the rollups and count the archived events again; returns how many were counted.
+
+    Archived events are no longer in the live table, so they are counted from
+    their partitions here; ``roll_up_events`` then recounts the live table from
+    its first id. An archived event that is still live (a batch written just
+    before a crash, not yet deleted) is left to that recount. Do not run
+    ``archive_events`` at the same time.
+    """
+    from courses.enrollment import batched
+    from .archive import archived_events
+
+    total = 0
+    with transaction.atomic():
+        for model in ROLLUPS.values():
+            model.objects.all().delete()
+        RollupCursor.objects.filter(name=CURSOR_NAME).delete()
+        for batch in batched(archived_events(), batch_size):
+            live = set(Event.objects.filter(pk__in=[row['id'] for row in batch]).values_list('pk', flat=True))
+            rows = [
+                (row['id'], row['user_id'], row['event_type'], row['timestamp'],
+                 row['route_id'], row['object_id'], row['metadata'])
+                for row in batch if row['id'] not in live
+            ]
+            count_events(rows)
+            total += len(rows)
+    return total
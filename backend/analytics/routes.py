@@ -0,0 +1,149 @@
+"""Route-coded events.
+
+Instead of the raw path, an event records the URL route it hit as
+``Event.route`` and the id of the object the route is about as
+``Event.object_id``; ``metadata`` only keeps what does not fit those columns.
+A route id is a stable hash of ``"<method> <url name>"``, so recording an
+event never has to look up the ``Route`` dictionary. ``sync_routes`` (run after
+every ``migrate``) adds the URLconf's routes to that table, and names are read
+back from the table (cached per id), so events of a route since removed from
+the URLconf still resolve. Only a route not in the table yet is looked up in
+the URLconf.
+"""
+import zlib
+from functools import lru_cache
+from django.db import transaction
+from django.urls import Resolver404, URLResolver, get_resolver, resolve
+
+# Route basenames whose pk is an object the rollups can tie to a course.
+OBJECT_KINDS = {
+    'course': 'courses', 'module': 'modules', 'content': 'contents', 'quiz': 'quizzes', 'assignment': 'assignments',
+}
+TRACKED_METHODS = ('GET',)
+
+
+def route_id(name, method='GET'):
+    return zlib.crc32(f'{method} {name}'.encode()) & 0x7fffffff
+
+
+def route_basename(name, callback):
+    initkwargs = getattr(callback, 'initkwargs', None) or {}
+    return initkwargs.get('basename') or name.rsplit('-', 1)[0]
+
+
+def iter_url_names(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_url_names(pattern.url_patterns)
+        elif pattern.name:
+            yield pattern.name, pattern.callback
+
+
+@lru_cache(maxsize=None)
+def url_routes():
+    """``{route id: (name, method, object kind or None)}`` for every named URL."""
+    return {
+        route_id(name, method): (name, method, OBJECT_KINDS.get(route_basename(name, callback)))
+        for name, callback in iter_url_names(get_resolver().url_patterns)
+        for method in TRACKED_METHODS
+    }
+
+
+def sync_routes():
+    """Add any URL route missing from the ``Route`` dictionary; returns how many were added."""
+    from .models import Route
+
+    routes = url_routes()
+    known = set(Route.objects.filter(pk__in=routes).values_list('pk', flat=True))
+    Route.objects.bulk_create(
+        [Route(pk=pk, name=name, method=method) for pk, (name, method, _) in routes.items() if pk not in known],
+        ignore_conflicts=True,
+    )
+    return len(routes.keys() - known)
+
+
+def describe(match, method, path):
+    """Return ``(route_id, object_id, extras)`` for a resolved request (``match`` may be None)."""
+    if match is None or not match.url_name:
+        return None, None, {'path': path}
+    object_id = None
+    extras = {}
+    for key, value in match.kwargs.items():
+        if key == 'pk' and str(value).isdigit():
+            object_id = int(value)
+        elif key != 'format':
+            extras[key] = str(value)
+    return route_id(match.url_name, method), object_id, extras or None
+
+
+_known_routes = {}
+
+
+def known_route(route):
+    """``(name, method, object kind or None)`` for a ``Route`` id, or None; rows never change, so hits are cached.
+
+    Events can record a route before ``sync_routes`` has added it, so a miss
+    falls back to the URLconf (uncached, until the row exists).
+    """
+    if route is None:
+        return None
+    if route not in _known_routes:
+        from .models import Route
+
+        row = Route.objects.filter(pk=route).values_list('name', 'method').first()
+        if row is None:
+            return url_routes().get(route)
+        name, method = row
+        _known_routes[route] = (name, method, OBJECT_KINDS.get(name.rsplit('-', 1)[0]))
+    return _known_routes[route]
+
+
+def route_name(route):
+    return (known_route(route) or (None,))[0]
+
+
+def route_target(route, object_id):
+    """Return ``('courses', id)`` style references for a route-coded event, or None."""
+    kind = (known_route(route) or (None, None, None))[2]
+    return (kind, object_id) if kind and object_id is not None else None
+
+
+@lru_cache(maxsize=4096)
+def describe_path(path, method):
+    try:
+        match = resolve(path)
+    except Resolver404:
+        match = None
+    return describe(match, method, path)
+
+
+def convert_events(after_id=0, batch_size=2000):
+    """Move events still carrying a raw ``path`` in ``metadata`` onto route columns, in ``pk`` order.
+
+    Yields ``(last_id, scanned, converted)`` after each batch; each batch is one
+    keyset read and one ``bulk_update`` in its own transaction, so the run can
+    be interrupted and resumed from the last reported id.
+    """
+    from .models import Event
+
+    last_id = after_id
+    while True:
+        batch = list(
+            Event.objects.filter(pk__gt=last_id, route__isnull=True, metadata__has_key='path')
+            .order_by('pk').only('pk', 'metadata')[:batch_size]
+        )
+        if not batch:
+            return
+        converted = []
+        for event in batch:
+            extras = {key: value for key, value in event.metadata.items() if key not in ('path', 'method')}
+            route, object_id, path_extras = describe_path(event.metadata['path'], event.metadata.get('method', 'GET'))
+            if route is None:
+                continue
+            event.route_id, event.object_id = route, object_id
+            event.metadata = {**extras, **(path_extras or {})} or None
+            converted.append(event)
+        with transaction.atomic():
+            Event.objects.bulk_update(converted, ['route', 'object_id', 'metadata'], batch_size=500)
+        last_id = batch[-1].pk
+        yield last_id, len(batch), len(converted)
@@ -1,8 +1,14 @@
 from rest_framework import serializers
 from .models import Event
+from .routes import route_name
 
 class EventSerializer(serializers.ModelSerializer):
+    route_name = serializers.SerializerMethodField()
+
     class Meta:
         model = Event
-        fields = '__all__'
+        exclude = ['inserted_at']
         read_only_fields = ['user', 'timestamp']
+
+    def get_route_name(self, obj):
+        return route_name(obj.route_id)
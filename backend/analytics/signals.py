@@ -0,0 +1,10 @@
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+from .routes import sync_routes
+
+
+@receiver(post_migrate)
+def refresh_route_dictionary(sender, **kwargs):
+    # Every migrate picks up URL routes added since the last deploy.
+    if sender.name == 'analytics':
+        sync_routes()
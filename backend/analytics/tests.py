@@ -1,3 +1,467 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+from asgiref.sync import sync_to_async
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from assessments.models import Quiz, QuizAttempt
+from courses.models import Course, Module, Content, Enrollment
+from payments.models import Payment
+from progress.models import CourseProgress, Progress
+from .archive import archive_events, archived_events, partitions
+from .columnar import get_engine
+from .ingest import EventBuffer, get_buffer
+from .live import ChangeFeed
+from .models import Event, DailyEventRollup, HourlyEventRollup, Route, RollupCursor
+from .rollups import roll_up_events
+from .routes import convert_events, route_id, route_name, route_target
 
-# Create your tests here.
+User = get_user_model()
+
+
+class EventIngestionTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='learner', password='pass1234')
+
+    def test_buffer_writes_in_background_and_drains_on_stop(self):
+        buffer = EventBuffer(max_size=100, batch_size=10, flush_interval=0.05)
+        for i in range(25):
+            buffer.push(Event(user=self.user, event_type='PAGE_VIEW', metadata={'i': i}))
+        buffer.stop()
+        self.assertEqual(Event.objects.count(), 25)
+        self.assertEqual(buffer.stats()['written'], 25)
+        self.assertEqual(buffer.stats()['pending'], 0)
+
+    def test_full_buffer_drops_and_counts(self):
+        buffer = EventBuffer(max_size=3, batch_size=10, flush_interval=60)
+        buffer.ensure_worker = lambda: None  # keep the queue from being consumed
+        results = [buffer.push(Event(user=self.user, event_type='PAGE_VIEW')) for _ in range(5)]
+        self.assertEqual(results, [True] * 3 + [False] * 2)
+        self.assertEqual(buffer.stats()['dropped'], 2)
+        buffer.flush()
+        self.assertEqual(Event.objects.count(), 3)
+
+    @override_settings(ANALYTICS_INGEST_MODE='buffered')
+    def test_middleware_does_not_write_during_request(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertNumQueries(1):  # the event list itself; no INSERT
+            client.get('/api/analytics/events/')
+        get_buffer().stop()
+        self.assertEqual(Event.objects.filter(event_type='PAGE_VIEW').count(), 1)
+
+
+class EventSamplingTests(TestCase):
+    @override_settings(ANALYTICS_SAMPLE_RATE=0)
+    def test_sampled_out_events_are_not_recorded(self):
+        user = User.objects.create_user(username='learner', password='pass1234')
+        client = APIClient()
+        client.force_authenticate(user)
+        client.get('/api/analytics/events/')
+        self.assertFalse(Event.objects.exists())
+
+
+@override_settings(ANALYTICS_ROLLUP_LAG=0)
+class EventRollupTests(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.student = User.objects.create_user(username='learner', password='pass1234')
+        self.course = Course.objects.create(title='Python', description='...', instructor=self.instructor)
+        self.content = Content.objects.create(module=Module.objects.create(course=self.course, title='M'),
+                                              content_type='TEXT', title='Lesson')
+        self.day = timezone.now().replace(hour=10, minute=0, second=0, microsecond=0) - timedelta(days=1)
+
+    def event(self, path, minutes=0, event_type='PAGE_VIEW'):
+        return Event(user=self.student, event_type=event_type, timestamp=self.day + timedelta(minutes=minutes),
+                     metadata={'path': path, 'method': 'GET'})
+
+    def test_rollups_count_each_event_once(self):
+        Event.objects.bulk_create([
+            self.event(f'/api/courses/{self.course.id}/'),
+            self.event(f'/api/contents/{self.content.id}/', minutes=30),
+            self.event(f'/api/contents/{self.content.id}/', minutes=90),
+            self.event('/api/notifications/'),
+        ])
+        self.assertEqual(roll_up_events(batch_size=3), 4)
+        self.assertEqual(roll_up_events(), 0)
+        hourly = dict(HourlyEventRollup.objects.filter(course_id=self.course.id).values_list('bucket', 'count'))
+        self.assertEqual(hourly, {self.day: 2, self.day + timedelta(hours=1): 1})
+        self.assertEqual(DailyEventRollup.objects.get(course_id=self.course.id).count, 3)
+        self.assertEqual(DailyEventRollup.objects.get(course_id=0).count, 1)
+
+        Event.objects.bulk_create([self.event(f'/api/courses/{self.course.id}/', minutes=5)])
+        roll_up_events()
+        self.assertEqual(DailyEventRollup.objects.get(course_id=self.course.id).count, 4)
+        self.assertEqual(RollupCursor.objects.get().last_event_id, Event.objects.latest('pk').pk)
+
+    @override_settings(ANALYTICS_ROLLUP_LAG=60)
+    def test_recent_events_wait_for_the_lag(self):
+        Event.objects.create(user=self.student, event_type='PAGE_VIEW', metadata={})
+        self.assertEqual(roll_up_events(), 0)
+        self.assertEqual(roll_up_events(now=timezone.now() + timedelta(minutes=5)), 1)
+
+    @override_settings(ANALYTICS_ROLLUP_LAG=60)
+    def test_back_dated_events_committed_late_are_counted(self):
+        # Buffered events are written long after they happened, and an earlier id can commit after a later one.
+        first, _ = Event.objects.bulk_create([
+            self.event(f'/api/courses/{self.course.id}/'), self.event(f'/api/courses/{self.course.id}/', minutes=1)
+        ])
+        Event.objects.filter(pk=first.pk).delete()  # not committed yet
+        self.assertEqual(roll_up_events(), 0)
+        Event.objects.bulk_create([first])
+        self.assertEqual(roll_up_events(now=timezone.now() + timedelta(minutes=5)), 2)
+        self.assertEqual(DailyEventRollup.objects.get(course_id=self.course.id).count, 2)
+
+    def test_rollup_api_is_scoped(self):
+        Event.objects.bulk_create([self.event(f'/api/courses/{self.course.id}/'), self.event('/api/notifications/')])
+        roll_up_events()
+        client = APIClient()
+        client.force_authenticate(self.instructor)
+        response = client.get('/api/analytics/stats/rollups/', {'granularity': 'hour'})
+        self.assertEqual(response.data['results'], [
+            {'bucket': self.day, 'event_type': 'PAGE_VIEW', 'course_id': self.course.id, 'count': 1, 'users': 1}
+        ])
+        client.force_authenticate(self.student)
+        self.assertEqual(len(client.get('/api/analytics/stats/rollups/').data['results']), 2)
+        self.assertEqual(client.get('/api/analytics/stats/rollups/', {'granularity': 'week'}).status_code, 400)
+
+
+class InstructorStatsTests(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.students = [User.objects.create_user(username=f's{i}', password='pass1234') for i in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.instructor)
+
+    def add_course(self, title, paid, completed):
+        course = Course.objects.create(title=title, description='...', instructor=self.instructor, price=10)
+        quiz = Quiz.objects.create(module=Module.objects.create(course=course, title='M'), title='Q')
+        for index, student in enumerate(self.students):
+            Enrollment.objects.create(student=student, course=course)
+            Payment.objects.create(user=student, course=course, amount=10,
+                                   status='succeeded' if index < paid else 'pending')
+            CourseProgress.objects.create(user=student, course=course, total_count=2,
+                                          completed_count=2 if index < completed else 1)
+            QuizAttempt.objects.create(user=student, quiz=quiz, score=50 + index * 25)
+        return course
+
+    def test_revenue_and_rates_from_grouped_queries(self):
+        first = self.add_course('One', paid=2, completed=3)
+        # Courses (with their enrollment counters), payments, progress, quiz attempts and the analytics event.
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/analytics/stats/instructor_stats/')
+        self.add_course('Two', paid=1, completed=0)
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/analytics/stats/instructor_stats/')
+
+        self.assertEqual(response.data['total_enrollments'], 6)
+        self.assertEqual(response.data['total_revenue'], 30.0)
+        row = next(row for row in response.data['courses'] if row['id'] == first.id)
+        self.assertEqual((row['revenue'], row['payments'], row['enrollments']), (20.0, 2, 3))
+        self.assertEqual(row['completion_rate'], 100)
+        self.assertEqual(row['average_quiz_score'], 75)
+
+        future = (timezone.now() + timedelta(days=1)).isoformat()
+        response = self.client.get('/api/analytics/stats/instructor_stats/', {'since': future})
+        self.assertEqual((response.data['total_enrollments'], response.data['total_revenue']), (0, 0))
+        self.assertEqual(self.client.get('/api/analytics/stats/instructor_stats/', {'since': 'soon'}).status_code, 400)
+
+
+@override_settings(ANALYTICS_ROLLUP_LAG=0)
+class EventArchiveTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(ANALYTICS_ARCHIVE_DIR=directory.name))
+        self.student = User.objects.create_user(username='learner', password='pass1234')
+        self.other = User.objects.create_user(username='other', password='pass1234')
+        self.now = timezone.now()
+        Event.objects.bulk_create([
+            Event(user=user, event_type='PAGE_VIEW', timestamp=self.now - timedelta(days=days, hours=hours))
+            for user in (self.student, self.other) for days in (100, 120) for hours in (0, 1)
+        ] + [Event(user=self.student, event_type='PAGE_VIEW', timestamp=self.now - timedelta(days=1), metadata={})])
+        roll_up_events()
+
+    def test_old_events_move_to_daily_partitions(self):
+        self.assertEqual(archive_events(days=90, batch_size=3, now=self.now), 8)
+        self.assertEqual(Event.objects.count(), 1)
+        self.assertEqual(archive_events(days=90, now=self.now), 0)
+        self.assertEqual(len({day for day, _ in partitions()}), len({
+            (self.now - timedelta(days=days, hours=hours)).date() for days in (100, 120) for hours in (0, 1)
+        }))
+
+        window = archived_events(since=self.now - timedelta(days=101), until=self.now - timedelta(days=99),
+                                 user_id=self.student.id)
+        self.assertEqual(sorted(row['timestamp'] for row in window),
+                         [self.now - timedelta(days=100, hours=1), self.now - timedelta(days=100)])
+        self.assertEqual(len(list(archived_events())), 8)
+
+    def test_repeated_batches_are_read_once(self):
+        archive_events(days=90, now=self.now)
+        for _, directory in partitions():
+            for name in os.listdir(directory):
+                with open(os.path.join(directory, name), 'rb') as f:
+                    data = f.read()
+                # As if a crash between writing and deleting had archived the batch again.
+                with open(os.path.join(directory, '0-' + name.split('-', 1)[1]), 'wb') as f:
+                    f.write(data)
+        self.assertEqual(len(list(archived_events())), 8)
+
+    def test_events_not_yet_rolled_up_stay_live(self):
+        Event.objects.create(user=self.student, event_type='PAGE_VIEW', timestamp=self.now - timedelta(days=200))
+        archive_events(days=90, now=self.now)
+        self.assertEqual(Event.objects.count(), 2)
+
+    def test_archiving_stops_at_the_first_recent_event(self):
+        Event.objects.create(user=self.student, event_type='PAGE_VIEW', timestamp=self.now - timedelta(days=200))
+        roll_up_events()
+        self.assertEqual(archive_events(days=90, now=self.now), 8)
+        # The 200-day-old event comes after a recent one in id order, so it waits for that one to age.
+        self.assertEqual(Event.objects.count(), 2)
+
+    def test_rebuild_counts_archived_events(self):
+        archive_events(days=90, now=self.now)
+        counts = sorted(DailyEventRollup.objects.values_list('bucket', 'user_id', 'count'))
+        # As if a crash between writing and deleting had left one archived event live.
+        row = next(archived_events())
+        Event.objects.create(id=row['id'], user_id=row['user_id'], event_type=row['event_type'],
+                             timestamp=row['timestamp'])
+        out = StringIO()
+        call_command('rollup_events', '--rebuild', stdout=out)
+        self.assertIn('Recounted 7 archived events', out.getvalue())
+        self.assertEqual(sorted(DailyEventRollup.objects.values_list('bucket', 'user_id', 'count')), counts)
+
+    def test_archived_api_is_scoped_to_the_user(self):
+        archive_events(days=90, now=self.now)
+        client = APIClient()
+        client.force_authenticate(self.student)
+        response = client.get('/api/analytics/events/archived/', {'limit': 3})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertTrue(response.data['truncated'])
+        since = (self.now - timedelta(days=110)).isoformat()
+        response = client.get('/api/analytics/events/archived/', {'since': since})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertFalse(response.data['truncated'])
+        self.assertEqual(client.get('/api/analytics/events/archived/', {'until': 'later'}).status_code, 400)
+
+    @override_settings(ANALYTICS_ARCHIVE_MAX_SPAN_DAYS=10)
+    def test_archived_api_reads_a_bounded_window(self):
+        archive_events(days=90, now=self.now)
+        client = APIClient()
+        client.force_authenticate(self.student)
+        # No bounds: the newest ten days of the archive, which leaves out the 120-day-old events.
+        response = client.get('/api/analytics/events/archived/')
+        self.assertEqual(len(response.data['results']), 2)
+        until = (self.now - timedelta(days=115)).isoformat()
+        response = client.get('/api/analytics/events/archived/', {'until': until})
+        self.assertEqual(len(response.data['results']), 2)
+        since = (self.now - timedelta(days=130)).isoformat()
+        response = client.get('/api/analytics/events/archived/', {'since': since, 'until': until})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ANALYTICS_ENGINE_REFRESH_SECONDS=0, ANALYTICS_PASS_SCORE=60)
+class CohortEngineTests(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.course = Course.objects.create(title='Python', description='...', instructor=self.instructor)
+        lessons = Module.objects.create(course=self.course, title='Lessons', order=1)
+        self.contents = [Content.objects.create(module=lessons, content_type='TEXT', title=f'L{i}') for i in range(4)]
+        final = Module.objects.create(course=self.course, title='Final', order=2)
+        self.quiz = Quiz.objects.create(module=final, title='Q')
+        self.start = timezone.now().replace(hour=10, minute=0, second=0, microsecond=0) - timedelta(days=30)
+        self.start -= timedelta(days=self.start.weekday())
+        self.students = [User.objects.create_user(username=f's{i}', password='pass1234') for i in range(4)]
+        for student in self.students:
+            self.enroll(student)
+        # s0 finishes everything, s1 half, s2 a quarter; s0 and s1 sit the final quiz.
+        for student, done in zip(self.students, (4, 2, 1, 0)):
+            for hours, content in enumerate(self.contents[:done], start=7):
+                self.complete(student, content, self.start + timedelta(hours=hours))
+        QuizAttempt.objects.create(user=self.students[0], quiz=self.quiz, score=80)
+        QuizAttempt.objects.create(user=self.students[1], quiz=self.quiz, score=40)
+        DailyEventRollup.objects.bulk_create([
+            DailyEventRollup(bucket=self.start + timedelta(days=days), event_type='PAGE_VIEW',
+                             course_id=self.course.id, user=student, count=1)
+            for student, days in ((self.students[0], 0), (self.students[0], 1), (self.students[0], 8),
+                                  (self.students[1], 2))
+        ])
+        get_engine().refresh(force=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.instructor)
+
+    def enroll(self, student):
+        enrollment = Enrollment.objects.create(student=student, course=self.course)
+        Enrollment.objects.filter(pk=enrollment.pk).update(enrolled_at=self.start)
+
+    def complete(self, student, content, at):
+        progress = Progress.objects.create(user=student, content=content, is_completed=True)
+        Progress.objects.filter(pk=progress.pk).update(completed_at=at)
+
+    def get(self, name, **params):
+        return self.client.get(f'/api/analytics/stats/{name}/', {'course': self.course.id, **params})
+
+    def test_funnel_counts_each_step(self):
+        steps = self.get('funnel').data['steps']
+        self.assertEqual([step['users'] for step in steps], [4, 2, 1])
+        self.assertEqual(steps[2]['conversion'], 0.5)
+        self.assertEqual([step['users'] for step in self.get('funnel', pass_score=30).data['steps']], [4, 2, 2])
+        self.assertEqual([step['users'] for step in self.get('funnel', completion=1).data['steps']], [4, 1, 1])
+
+    def test_refresh_picks_up_new_and_changed_rows(self):
+        late = User.objects.create_user(username='late', password='pass1234')
+        self.enroll(late)
+        Progress.objects.filter(user=self.students[2]).update(completed_at=timezone.now())
+        Progress.objects.create(user=self.students[2], content=self.contents[1], is_completed=True)
+        Progress.objects.filter(user=self.students[0], content=self.contents[3]).update(
+            is_completed=False, completed_at=timezone.now()
+        )
+        self.assertEqual([step['users'] for step in self.get('funnel').data['steps']], [5, 3, 1])
+        self.assertEqual(self.get('time_to_completion').data['completed'], 0)
+
+    def test_time_to_completion(self):
+        data = self.get('time_to_completion').data
+        self.assertEqual((data['cohort'], data['completed'], data['median_hours']), (4, 1, 10))
+        self.assertEqual(self.get('time_to_completion', completion=0.5).data['median_hours'], 8)
+
+    def test_weekly_retention(self):
+        results = self.get('retention', periods=3).data['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual((results[0]['cohort'], results[0]['size']), (self.start.replace(hour=0), 4))
+        self.assertEqual(results[0]['active'], [2, 1, 0])
+        self.assertEqual(self.get('retention', period='day', periods=3).data['results'][0]['active'], [1, 1, 1])
+
+    def test_requires_owned_course(self):
+        other = Course.objects.create(title='Other', description='...', instructor=self.students[0])
+        self.assertEqual(self.get('funnel', course=other.id).status_code, 404)
+        self.assertEqual(self.get('retention', period='month').status_code, 400)
+        self.client.force_authenticate(self.students[0])
+        self.assertEqual(self.get('funnel').status_code, 403)
+
+
+@override_settings(ANALYTICS_ROLLUP_LAG=0)
+class RouteCodedEventTests(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.student = User.objects.create_user(username='learner', password='pass1234')
+        self.course = Course.objects.create(title='Python', description='...', instructor=self.instructor)
+        self.content = Content.objects.create(module=Module.objects.create(course=self.course, title='M'),
+                                              content_type='TEXT', title='Lesson')
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_page_views_record_route_and_object(self):
+        self.client.get(f'/api/contents/{self.content.id}/')
+        event = Event.objects.get()
+        self.assertEqual((event.route.name, event.object_id, event.metadata), ('content-detail', self.content.id, None))
+
+        Event.objects.update(timestamp=timezone.now() - timedelta(hours=1))
+        roll_up_events()
+        self.assertEqual(DailyEventRollup.objects.get().course_id, self.course.id)
+
+    def test_convert_existing_events(self):
+        Event.objects.bulk_create([
+            Event(user=self.student, event_type='PAGE_VIEW', metadata={'path': path, 'method': 'GET', **extra})
+            for path, extra in (
+                (f'/api/courses/{self.course.id}/', {}),
+                ('/api/communication/notifications/', {'source': 'email'}),
+                ('/elsewhere/', {}),
+            )
+        ])
+        progress = list(convert_events(batch_size=2))
+        self.assertEqual([(scanned, converted) for _, scanned, converted in progress], [(2, 2), (1, 0)])
+        self.assertEqual(
+            Event.objects.filter(route=route_id('course-detail'), object_id=self.course.id).count(), 1
+        )
+        notifications = Event.objects.get(route__name='notification-list')
+        self.assertEqual((notifications.object_id, notifications.metadata), (None, {'source': 'email'}))
+        self.assertEqual(Event.objects.get(route=None).metadata['path'], '/elsewhere/')
+        # A rerun only rescans the path that resolves to no route.
+        self.assertEqual([(scanned, converted) for _, scanned, converted in convert_events()], [(1, 0)])
+        self.assertTrue(Route.objects.filter(name='course-detail', method='GET').exists())
+
+    def test_routes_removed_from_the_urlconf_still_resolve(self):
+        retired = Route.objects.create(pk=route_id('course-outline'), name='course-outline')
+        self.assertEqual(route_name(retired.pk), 'course-outline')
+        self.assertEqual(route_target(retired.pk, self.course.id), ('courses', self.course.id))
+        with self.assertNumQueries(0):
+            self.assertEqual(route_name(retired.pk), 'course-outline')
+        self.assertIsNone(route_name(route_id('never-registered')))
+        # Not synced yet: answered from the URLconf until the row exists.
+        Route.objects.filter(name='course-detail').delete()
+        self.assertEqual(route_target(route_id('course-detail'), self.course.id), ('courses', self.course.id))
+
+
+class LiveDashboardTests(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.student = User.objects.create_user(username='learner', password='pass1234')
+        self.course = Course.objects.create(title='Python', description='...', instructor=self.instructor)
+        self.other = Course.objects.create(title='Go', description='...', instructor=self.student)
+        self.quiz = Quiz.objects.create(module=Module.objects.create(course=self.course, title='M'), title='Q')
+
+    def test_feed_reports_new_rows_once(self):
+        feed = ChangeFeed(interval=60, queue_size=10)
+        pending = Payment.objects.create(user=self.student, course=self.course, amount=25, status='pending')
+        self.assertEqual(feed.poll({self.course.id}), [])
+
+        Enrollment.objects.create(student=self.student, course=self.course)
+        Enrollment.objects.create(student=self.instructor, course=self.other)
+        QuizAttempt.objects.create(user=self.student, quiz=self.quiz, score=80)
+        Payment.objects.create(user=self.student, course=self.course, amount=10, status='pending')
+        changes = feed.poll({self.course.id})
+        self.assertEqual([(change['type'], change['course']) for change in changes],
+                         [('enrollment', self.course.id), ('quiz_attempt', self.course.id)])
+        self.assertEqual(changes[1]['score'], 80)
+
+        Payment.objects.filter(pk=pending.pk).update(status='succeeded')
+        changes = feed.poll({self.course.id})
+        self.assertEqual(changes, [{'type': 'payment', 'course': self.course.id, 'id': pending.pk, 'amount': 25.0}])
+        self.assertEqual(feed.poll({self.course.id}), [])
+
+    def test_stream_url_is_for_instructors(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        self.assertEqual(client.get('/api/analytics/stats/live/').status_code, 403)
+        client.force_authenticate(self.instructor)
+        # The test client goes through the WSGI handler, where a stream would never be delivered.
+        self.assertEqual(client.get('/api/analytics/stats/live/').status_code, 503)
+        self.assertEqual(client.get('/api/analytics/live/', {'ticket': 'forged'}).status_code, 503)
+
+    async def test_stream_pushes_changes_for_the_ticket_courses(self):
+        token = await sync_to_async(AccessToken.for_user)(self.instructor)
+        headers = {'Authorization': f'Bearer {token}'}
+        response = await self.async_client.get('/api/analytics/stats/live/', headers=headers)
+        url = json.loads(response.content)['url']
+        self.assertIn('/api/analytics/live/?ticket=', url)
+        self.assertEqual((await self.async_client.get('/api/analytics/live/', {'ticket': 'forged'})).status_code, 403)
+
+        feed = ChangeFeed(interval=60, queue_size=10)
+        with mock.patch('analytics.live._feed', feed):
+            response = await self.async_client.get(url)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            stream = aiter(response.streaming_content)
+            self.assertTrue((await anext(stream)).startswith(b'retry:'))
+            feed.dispatch([
+                {'type': 'enrollment', 'course': self.other.id, 'id': 1},
+                {'type': 'payment', 'course': self.course.id, 'id': 2, 'amount': 10.0},
+            ])
+            chunk = await asyncio.wait_for(anext(stream), timeout=5)
+            self.assertEqual(chunk, b'event: payment\nid: payment-2\ndata: {"course": %d, "id": 2, "amount": 10.0}\n\n'
+                             % self.course.id)
+            # A client disconnect cancels the pending read; the subscription must go with it.
+            read = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0.05)
+            read.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await read
+            self.assertEqual(feed.subscribers, {})
+            feed.task.cancel()
@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .live import live_stream
 from .views import EventViewSet, AnalyticsViewSet
 
 router = DefaultRouter()
@@ -7,5 +8,6 @@ router.register(r'events', EventViewSet, basename='event')
 router.register(r'stats', AnalyticsViewSet, basename='analytics')
 
 urlpatterns = [
+    path('live/', live_stream, name='analytics-live-stream'),
     path('', include(router.urls)),
 ]
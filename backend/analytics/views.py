@@ -1,14 +1,31 @@
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Count, Q
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from itertools import islice
+from django.conf import settings
+from django.db.models import Avg, Count, F, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .archive import archived_events, partitions
+from .columnar import PERIODS, get_engine
+from .live import UNSUPPORTED, signed_stream_url, stream_supported
 from .models import Event
+from .rollups import ROLLUPS
+from .routes import route_name
 from .serializers import EventSerializer
+from assessments.models import QuizAttempt
 from courses.models import Course, Enrollment
+from payments.models import Payment
+from progress.models import CourseProgress
+from backend.pagination import EventPagination
 
 class EventViewSet(viewsets.ModelViewSet):
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = EventPagination
+
+    ARCHIVE_PAGE_MAX = 1000
 
     def get_queryset(self):
         return Event.objects.filter(user=self.request.user)
@@ -16,31 +33,258 @@ class EventViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def archived(self, request):
+        """The user's events moved out of the live table by ``archive_events``.
+
+        ``since`` and ``until`` (ISO date or datetime) pick the window; only the
+        daily archive partitions inside it are read. The window spans at most
+        ``ANALYTICS_ARCHIVE_MAX_SPAN_DAYS``: a missing bound is set that far from
+        the other, and with neither the window ends after the newest partition.
+        Returns at most ``limit`` events (default 100, max 1000) in partition order.
+        """
+        try:
+            since = AnalyticsViewSet.parse_time(request.query_params.get('since'))
+            until = AnalyticsViewSet.parse_time(request.query_params.get('until'))
+            limit = min(max(int(request.query_params.get('limit', 100)), 1), self.ARCHIVE_PAGE_MAX)
+        except ValueError:
+            return Response({'error': 'since and until must be ISO 8601 dates or datetimes, limit an integer'},
+                            status=400)
+        span = timedelta(days=settings.ANALYTICS_ARCHIVE_MAX_SPAN_DAYS)
+        if since and until:
+            if until - since > span:
+                return Response({'error': f'since and until may be at most {span.days} days apart'}, status=400)
+        elif since:
+            until = since + span
+        elif until:
+            since = until - span
+        else:
+            days = partitions()
+            until = (datetime.combine(days[-1][0] + timedelta(days=1), time.min, tzinfo=dt_timezone.utc)
+                     if days else timezone.now())
+            since = until - span
+        events = archived_events(since, until, user_id=request.user.id,
+                                 event_type=request.query_params.get('event_type') or None)
+        results = list(islice(events, limit + 1))
+        return Response({
+            'results': [
+                {
+                    'id': row['id'],
+                    'event_type': row['event_type'],
+                    'timestamp': row['timestamp'],
+                    'route_name': route_name(row.get('route_id')),
+                    'object_id': row.get('object_id'),
+                    'metadata': row['metadata'],
+                }
+                for row in results[:limit]
+            ],
+            'truncated': len(results) > limit,
+        })
+
 class AnalyticsViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     @action(detail=False, methods=['get'])
     def instructor_stats(self, request):
-        """Get analytics for instructor's courses"""
+        """Per-course enrollments, revenue, completion rate and quiz scores for the instructor.
+
+        ``since``/``until`` (ISO date or datetime) restrict enrollments,
+        succeeded payments and quiz attempts to that window; completion rate is
+        always over current enrollments. Every figure comes from one grouped
+        query, so the cost does not grow with the number of courses.
+        """
         if request.user.role != 'INSTRUCTOR':
             return Response({'error': 'Only instructors can access this'}, status=403)
+        try:
+            since = self.parse_time(request.query_params.get('since'))
+            until = self.parse_time(request.query_params.get('until'))
+        except ValueError:
+            return Response({'error': 'since and until must be ISO 8601 dates or datetimes'}, status=400)
+
+        def in_range(queryset, field):
+            if since:
+                queryset = queryset.filter(**{f'{field}__gte': since})
+            if until:
+                queryset = queryset.filter(**{f'{field}__lt': until})
+            return queryset
 
-        courses = Course.objects.filter(instructor=request.user)
-        
-        stats = {
-            'total_courses': courses.count(),
-            'total_enrollments': Enrollment.objects.filter(course__instructor=request.user).count(),
-            'total_revenue': sum(course.price for course in courses) * Enrollment.objects.filter(course__instructor=request.user).count(),
-            'courses': []
+        courses = list(Course.objects.filter(instructor=request.user).only('id', 'title', 'enrollment_count'))
+        course_ids = [course.id for course in courses]
+
+        if since or until:
+            enrollments = dict(
+                in_range(Enrollment.objects.filter(course_id__in=course_ids), 'enrolled_at')
+                .values('course').annotate(n=Count('id')).values_list('course', 'n')
+            )
+        else:
+            enrollments = {course.id: course.enrollment_count for course in courses}
+        revenue = {
+            row['course']: row
+            for row in in_range(Payment.objects.filter(course_id__in=course_ids, status='succeeded'), 'created_at')
+            .values('course').annotate(revenue=Sum('amount'), payments=Count('id'))
+        }
+        completion = {
+            row['course']: row
+            for row in CourseProgress.objects.filter(course_id__in=course_ids).values('course').annotate(
+                learners=Count('id'),
+                completed=Count('id', filter=Q(total_count__gt=0, completed_count__gte=F('total_count'))),
+            )
+        }
+        quizzes = {
+            row['quiz__module__course']: row
+            for row in in_range(QuizAttempt.objects.filter(quiz__module__course_id__in=course_ids), 'submitted_at')
+            .values('quiz__module__course').annotate(average=Avg('score'), attempts=Count('id'))
         }
 
+        rows = []
         for course in courses:
-            enrollments = Enrollment.objects.filter(course=course).count()
-            stats['courses'].append({
+            completed = completion.get(course.id, {}).get('completed', 0)
+            rows.append({
                 'id': course.id,
                 'title': course.title,
-                'enrollments': enrollments,
-                'revenue': float(course.price) * enrollments
+                'enrollments': enrollments.get(course.id, 0),
+                'revenue': float(revenue.get(course.id, {}).get('revenue') or 0),
+                'payments': revenue.get(course.id, {}).get('payments', 0),
+                'completed': completed,
+                'completion_rate': completed / course.enrollment_count * 100 if course.enrollment_count else 0,
+                'quiz_attempts': quizzes.get(course.id, {}).get('attempts', 0),
+                'average_quiz_score': quizzes.get(course.id, {}).get('average'),
             })
 
-        return Response(stats)
+        return Response({
+            'since': since,
+            'until': until,
+            'total_courses': len(rows),
+            'total_enrollments': sum(row['enrollments'] for row in rows),
+            'total_revenue': sum(row['revenue'] for row in rows),
+            'courses': rows,
+        })
+
+    @action(detail=False, methods=['get'])
+    def rollups(self, request):
+        """Event counts per bucket from the hourly/daily rollup tables.
+
+        Query params: ``granularity`` (hour|day), ``since``/``until`` (ISO
+        date or datetime; default the last 7 days hourly, 30 days daily),
+        ``event_type`` and ``course``. Instructors see all learners' activity
+        in their courses; everyone else sees only their own.
+        """
+        params = request.query_params
+        granularity = params.get('granularity', 'day')
+        if granularity not in ROLLUPS:
+            return Response({'error': 'granularity must be hour or day'}, status=400)
+        try:
+            until = self.parse_time(params.get('until')) or timezone.now()
+            since = self.parse_time(params.get('since')) or until - timedelta(days=7 if granularity == 'hour' else 30)
+        except ValueError:
+            return Response({'error': 'since and until must be ISO 8601 dates or datetimes'}, status=400)
+
+        rows = ROLLUPS[granularity].objects.filter(bucket__gte=since, bucket__lt=until)
+        if request.user.role == 'INSTRUCTOR':
+            rows = rows.filter(course_id__in=Course.objects.filter(instructor=request.user).values('pk'))
+        else:
+            rows = rows.filter(user=request.user)
+        if params.get('event_type'):
+            rows = rows.filter(event_type=params['event_type'])
+        if params.get('course'):
+            if not params['course'].isdigit():
+                return Response({'error': 'course must be an id'}, status=400)
+            rows = rows.filter(course_id=int(params['course']))
+
+        series = (
+            rows.values('bucket', 'event_type', 'course_id')
+            .annotate(count=Sum('count'), users=Count('user', distinct=True))
+            .order_by('bucket', 'event_type', 'course_id')
+        )
+        return Response({'granularity': granularity, 'since': since, 'until': until, 'results': list(series)})
+
+    @action(detail=False, methods=['get'])
+    def funnel(self, request):
+        """Enrolled -> completed ``completion`` (default 0.5) of the content -> passed the last quiz.
+
+        Query params: ``course`` (required), ``since``/``until`` to pick the
+        enrollment cohort, ``completion`` and ``pass_score``.
+        """
+        params, error = self.cohort_params(request, completion=0.5)
+        if error:
+            return error
+        try:
+            pass_score = float(request.query_params.get('pass_score', settings.ANALYTICS_PASS_SCORE))
+        except ValueError:
+            return Response({'error': 'pass_score must be a number'}, status=400)
+        return Response(get_engine().funnel(pass_score=pass_score, **params))
+
+    @action(detail=False, methods=['get'])
+    def time_to_completion(self, request):
+        """Distribution of hours from enrollment to finishing ``completion`` (default all) of the content."""
+        params, error = self.cohort_params(request, completion=1.0)
+        if error:
+            return error
+        return Response(get_engine().time_to_completion(**params))
+
+    @action(detail=False, methods=['get'])
+    def retention(self, request):
+        """Per enrollment cohort, how many learners were active in the course each ``period`` after enrolling.
+
+        Query params: ``course`` (required), ``since``/``until``, ``period``
+        (day|week), ``periods`` (1-52, default 8) and ``event_type``.
+        """
+        params, error = self.cohort_params(request)
+        if error:
+            return error
+        period = request.query_params.get('period', 'week')
+        periods = request.query_params.get('periods', '8')
+        if period not in PERIODS or not periods.isdigit() or not 1 <= int(periods) <= 52:
+            return Response({'error': 'period must be day or week and periods between 1 and 52'}, status=400)
+        return Response({'period': period, 'results': get_engine().retention(
+            period=period, periods=int(periods), event_type=request.query_params.get('event_type') or None, **params
+        )})
+
+    @action(detail=False, methods=['get'])
+    def live(self, request):
+        """Return a short-lived URL for the server-sent event stream of changes in the instructor's courses."""
+        if request.user.role != 'INSTRUCTOR':
+            return Response({'error': 'Only instructors can access this'}, status=403)
+        if not stream_supported(request):
+            return Response({'error': UNSUPPORTED}, status=503)
+        course_ids = list(Course.objects.filter(instructor=request.user).values_list('pk', flat=True))
+        return Response({
+            'url': signed_stream_url(request, request.user, course_ids),
+            'expires_in': settings.ANALYTICS_LIVE_TICKET_MAX_AGE,
+        })
+
+    def cohort_params(self, request, completion=None):
+        """Validate the parameters shared by the cohort engine actions; returns ``(params, error_response)``."""
+        if request.user.role != 'INSTRUCTOR':
+            return None, Response({'error': 'Only instructors can access this'}, status=403)
+        course = request.query_params.get('course', '')
+        if not course.isdigit():
+            return None, Response({'error': 'course must be an id'}, status=400)
+        if not Course.objects.filter(pk=int(course), instructor=request.user).exists():
+            return None, Response({'error': 'Course not found'}, status=404)
+        params = {'course_id': int(course)}
+        try:
+            params['since'] = self.parse_time(request.query_params.get('since'))
+            params['until'] = self.parse_time(request.query_params.get('until'))
+            if completion is not None:
+                params['completion'] = float(request.query_params.get('completion', completion))
+                if not 0 < params['completion'] <= 1:
+                    raise ValueError(params['completion'])
+        except ValueError:
+            return None, Response(
+                {'error': 'since and until must be ISO 8601 dates or datetimes, completion in (0, 1]'}, status=400
+            )
+        get_engine().refresh()
+        return params, None
+
+    @staticmethod
+    def parse_time(value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(value)
+            parsed = datetime.combine(day, time.min)
+        return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
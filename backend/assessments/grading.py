@@ -0,0 +1,221 @@
+"""Compiled answer keys and the quiz grading engine.
+
+A quiz's questions are compiled once into an ``AnswerKey`` (NumPy columns of
+correct options and points, in question order) and cached under the quiz's
+``key_version``, which every question edit bumps in the database. Grading an
+attempt costs one primary-key read of that version; every process then picks
+up an edit on its next read instead of serving its own stale copy.
+
+Single-answer questions score full points when the selected index equals
+``correct_answer``. Multi-answer questions (non-empty ``correct_answers``)
+take a list of indices and score ``points * max(0, (right - wrong) / len(correct))``.
+A batch of attempts is graded as one ``(attempts, questions)`` matrix: the
+submitted indices are read out of each answers dict, then matched against the
+key and summed into scores with array operations.
+"""
+import numpy as np
+from django.core.cache import cache
+
+KEY_CACHE_TIMEOUT = 60 * 60 * 24
+UNANSWERED = -2  # never a correct index, nor the -1 that marks multi-answer questions
+MAX_INDEX = 2 ** 31
+
+
+def answer_key_cache_key(quiz_id, version):
+    return f'quiz:{quiz_id}:v{version}:answer-key'
+
+
+def key_version(quiz_id):
+    """Return the quiz's current ``key_version``, or None if it does not exist."""
+    from .models import Quiz
+
+    return Quiz.objects.filter(pk=quiz_id).values_list('key_version', flat=True).first()
+
+
+class AnswerKey:
+    __slots__ = ('quiz_id', 'question_ids', 'single', 'multi', 'points', 'total_points')
+
+    def __init__(self, quiz_id, rows):
+        """``rows`` are ``(question_id, correct_answer, correct_answers, points)`` tuples."""
+        rows = list(rows)
+        self.quiz_id = quiz_id
+        self.question_ids = tuple(question_id for question_id, _, _, _ in rows)
+        # Correct index per question, or -1 for multi-answer questions.
+        self.single = np.array([-1 if multi else single for _, single, multi, _ in rows], dtype=np.int64)
+        self.multi = {  # position -> frozenset of correct indices
+            position: frozenset(int(i) for i in multi) for position, (_, _, multi, _) in enumerate(rows) if multi
+        }
+        self.points = np.array([points for _, _, _, points in rows], dtype=np.float64)
+        self.total_points = float(self.points.sum())
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def credit_matrix(self, answer_sets):
+        """Return the points earned per attempt and question, as an ``(attempts, questions)`` array."""
+        answer_sets = list(answer_sets)
+        selected = np.full((len(answer_sets), len(self)), UNANSWERED, dtype=np.int64)
+        earned = np.zeros(selected.shape)
+        for row, answers in enumerate(answer_sets):
+            if not isinstance(answers, dict):
+                continue
+            for position, question_id in enumerate(self.question_ids):
+                response = answers.get(str(question_id), answers.get(question_id))
+                if response is None:
+                    continue
+                if position in self.multi:
+                    earned[row, position] = self.points[position] * multi_credit(response, self.multi[position])
+                elif (index := as_index(response)) is not None and 0 <= index < MAX_INDEX:
+                    selected[row, position] = index
+        return earned + np.where(selected == self.single, self.points, 0.0)
+
+    def credits(self, answers):
+        """Return the points earned per question, in key order."""
+        return self.credit_matrix([answers])[0]
+
+    def score(self, earned):
+        if not self.total_points:
+            return 0
+        return float(earned.sum()) / self.total_points * 100
+
+    def grade(self, answers):
+        """Return ``(score, {question_id: credit})`` where credit is the fraction of points earned."""
+        earned = self.credits(answers)
+        results = {
+            question_id: (float(earned[position] / self.points[position]) if self.points[position] else 0)
+            for position, question_id in enumerate(self.question_ids)
+        }
+        return self.score(earned), results
+
+    def grade_each(self, answer_sets):
+        """Like ``grade`` for a batch of attempts, from one credit matrix."""
+        earned = self.credit_matrix(answer_sets)
+        fractions = np.divide(earned, self.points, out=np.zeros(earned.shape), where=self.points != 0)
+        return [
+            (self.score(row), dict(zip(self.question_ids, credits.tolist()))) for row, credits in zip(earned, fractions)
+        ]
+
+    def correct_options(self):
+        """Return ``{question_id: [correct indices]}`` for reviewing a submitted attempt."""
+        return {
+            question_id: sorted(self.multi[position]) if position in self.multi else [int(self.single[position])]
+            for position, question_id in enumerate(self.question_ids)
+        }
+
+    def grade_many(self, answer_sets):
+        """Score a batch of attempts against this key; returns one score per answer set."""
+        earned = self.credit_matrix(answer_sets)
+        if not self.total_points:
+            return [0] * len(earned)
+        return (earned.sum(axis=1) / self.total_points * 100).tolist()
+
+
+def as_index(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def multi_credit(response, correct):
+    if not isinstance(response, (list, tuple)):
+        response = [response]
+    selected = {index for index in map(as_index, response) if index is not None}
+    right = len(selected & correct)
+    wrong = len(selected - correct)
+    return max(0.0, (right - wrong) / len(correct))
+
+
+def compile_answer_key(quiz_id):
+    from .models import Question
+
+    rows = Question.objects.filter(quiz_id=quiz_id).order_by('pk').values_list(
+        'pk', 'correct_answer', 'correct_answers', 'points'
+    )
+    return AnswerKey(quiz_id, rows)
+
+
+def get_answer_key(quiz_id, version=None):
+    """Return the quiz's compiled key; pass ``version`` when the quiz row is already loaded."""
+    if version is None:
+        version = key_version(quiz_id)
+        if version is None:
+            return AnswerKey(quiz_id, [])
+    key = cache.get(answer_key_cache_key(quiz_id, version))
+    if key is None:
+        key = compile_answer_key(quiz_id)
+        cache.set(answer_key_cache_key(quiz_id, version), key, timeout=KEY_CACHE_TIMEOUT)
+    return key
+
+
+def dump_results(results):
+    """``{question_id: credit}`` as stored in ``QuizAttempt.question_results``."""
+    return {str(question_id): credit for question_id, credit in results.items()}
+
+
+def load_results(stored):
+    return {int(question_id): credit for question_id, credit in stored.items()}
+
+
+def grade_attempt(quiz_id, answers, version=None):
+    return get_answer_key(quiz_id, version).grade(answers)
+
+
+def grade_attempts(attempts):
+    """Grade ``(quiz_id, answers)`` pairs: one version read for the batch, one matrix per quiz."""
+    from .models import Quiz
+
+    attempts = list(attempts)
+    by_quiz = {}
+    for position, (quiz_id, answers) in enumerate(attempts):
+        by_quiz.setdefault(quiz_id, []).append((position, answers))
+    versions = dict(Quiz.objects.filter(pk__in=list(by_quiz)).values_list('pk', 'key_version'))
+    scores = [0] * len(attempts)
+    for quiz_id, items in by_quiz.items():
+        key = get_answer_key(quiz_id, versions[quiz_id]) if quiz_id in versions else AnswerKey(quiz_id, [])
+        for (position, _), score in zip(items, key.grade_many(answers for _, answers in items)):
+            scores[position] = score
+    return scores
+
+
+def regrade_quiz(quiz_id, after_id=0, batch_size=2000, max_batches=None):
+    """Rescore a quiz's attempts against its current key, in ``pk`` order.
+
+    Yields ``(last_id, graded, changed)`` after each batch. Every batch is a
+    keyset-paginated read (``pk > last_id``) followed by a ``bulk_update`` of the
+    attempts whose grading moved and the matching ``QuestionStats`` deltas,
+    committed together, so memory stays bounded, locks are short, the stats are
+    never rebuilt wholesale, and an interrupted run resumes from the last
+    reported id.
+    """
+    from django.db import transaction
+    from .models import QuizAttempt
+    from .stats import record_regrades
+
+    key = get_answer_key(quiz_id)
+    last_id = after_id
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        batch = list(
+            QuizAttempt.objects.filter(quiz_id=quiz_id, pk__gt=last_id)
+            .order_by('pk').values_list('pk', 'answers', 'score', 'question_results')[:batch_size]
+        )
+        if not batch:
+            return
+        stale, moved, changed = [], [], 0
+        for (pk, answers, old_score, stored), (score, results) in zip(
+            batch, key.grade_each(answers for _, answers, _, _ in batch)
+        ):
+            score_changed = old_score is None or abs(old_score - score) > 1e-9
+            # Attempts graded before results were stored are taken to have counted as they grade now.
+            old_results = results if stored is None else load_results(stored)
+            if score_changed or stored is None or old_results != results:
+                stale.append(QuizAttempt(pk=pk, score=score, question_results=dump_results(results)))
+                moved.append((answers, score if old_score is None else old_score, old_results, score, results))
+                changed += score_changed
+        with transaction.atomic():
+            QuizAttempt.objects.bulk_update(stale, ['score', 'question_results'], batch_size=500)
+            record_regrades(quiz_id, moved, key.question_ids)
+        last_id = batch[-1][0]
+        batches += 1
+        yield last_id, len(batch), changed
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from assessments.stats import rebuild_question_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-question item-analysis statistics from all quiz attempts in one pass'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, action='append', dest='quizzes', help='Limit to this quiz id (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        attempts, questions = rebuild_question_stats(options['quizzes'], options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics for {questions} questions from {attempts} attempts'))
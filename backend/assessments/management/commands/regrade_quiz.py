@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from assessments.grading import regrade_quiz
+from assessments.models import Quiz, QuizAttempt
+
+
+class Command(BaseCommand):
+    help = 'Rescore every attempt of a quiz against its current answer key (resumable with --after-id)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz', type=int, help='Quiz id')
+        parser.add_argument('--after-id', type=int, default=0, help='Resume after this QuizAttempt id')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        quiz_id = options['quiz']
+        if not Quiz.objects.filter(pk=quiz_id).exists():
+            raise CommandError(f'Quiz {quiz_id} does not exist')
+        total = QuizAttempt.objects.filter(quiz_id=quiz_id, pk__gt=options['after_id']).count()
+
+        graded = changed = 0
+        for last_id, batch_graded, batch_changed in regrade_quiz(quiz_id, options['after_id'], options['batch_size']):
+            graded += batch_graded
+            changed += batch_changed
+            self.stdout.write(f'{graded}/{total} graded, {changed} changed (resume with --after-id {last_id})')
+        self.stdout.write(self.style.SUCCESS(f'Regraded {graded} attempts of quiz {quiz_id}; {changed} scores changed'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0006_question_multi_answer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='assessments.question')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('option_counts', models.JSONField(default=dict)),
+                ('credit_sum', models.FloatField(default=0)),
+                ('credit_sq_sum', models.FloatField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('score_sq_sum', models.FloatField(default=0)),
+                ('credit_score_sum', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_stats', to='assessments.quiz')),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0007_questionstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['quiz', 'submitted_at', 'id'], name='attempt_quiz_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['assignment', 'submitted_at', 'id'], name='submission_assignment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['quiz', 'submitted_at', 'id'], name='submission_quiz_idx'),
+        ),
+    ]
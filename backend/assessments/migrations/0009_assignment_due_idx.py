@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0008_submission_target_indexes'),
+        ('courses', '0006_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['due_date'], name='assignment_due_idx'),
+        ),
+    ]
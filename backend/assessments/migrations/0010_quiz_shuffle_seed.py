@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0009_assignment_due_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='shuffle_seed',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
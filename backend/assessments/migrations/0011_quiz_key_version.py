@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0010_quiz_shuffle_seed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='key_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
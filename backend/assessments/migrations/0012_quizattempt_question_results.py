@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0011_quiz_key_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='question_results',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
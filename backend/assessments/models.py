@@ -6,6 +6,21 @@ class Quiz(models.Model):
     module = models.OneToOneField(Module, on_delete=models.CASCADE, related_name='quiz')
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
+    # When set, students get questions and options in a per-attempt order derived from this seed.
+    shuffle_seed = models.PositiveIntegerField(blank=True, null=True)
+    # Bumped whenever the quiz or its questions change; cached answer keys and student
+    # payloads are stored under it, so every process stops using a stale copy at once.
+    key_version = models.PositiveIntegerField(default=0, editable=False)
+
+    def save(self, *args, **kwargs):
+        # key_version only moves through bump_key_version(); an instance loaded before a
+        # question edit must not write its old value back over the bump.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'key_version'
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -15,6 +30,10 @@ class Question(models.Model):
     text = models.TextField()
     options = models.JSONField(default=list) # List of strings
     correct_answer = models.IntegerField() # Index of the correct option
+    # Multi-answer questions list every correct index here (correct_answer is then ignored)
+    # and are scored with partial credit; see assessments.grading.
+    correct_answers = models.JSONField(default=list, blank=True)
+    points = models.FloatField(default=1)
 
     def __str__(self):
         return self.text[:50]
@@ -25,6 +44,11 @@ class Assignment(models.Model):
     description = models.TextField()
     due_date = models.DateTimeField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['due_date'], name='assignment_due_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -37,6 +61,14 @@ class Submission(models.Model):
     text_answer = models.TextField(blank=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['submitted_at', 'id'], name='submission_submitted_idx'),
+            models.Index(fields=['user', 'submitted_at', 'id'], name='submission_user_idx'),
+            models.Index(fields=['assignment', 'submitted_at', 'id'], name='submission_assignment_idx'),
+            models.Index(fields=['quiz', 'submitted_at', 'id'], name='submission_quiz_idx'),
+        ]
+
     def __str__(self):
         return f"Submission by {self.user.username}"
 
@@ -45,10 +77,54 @@ class QuizAttempt(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempts')
     answers = models.JSONField(default=dict)  # {question_id: selected_option_index}
     score = models.FloatField(null=True, blank=True)
+    # {question_id: credit} as graded, so stats deltas and deletes undo exactly what was added.
+    # Null for attempts graded before this was stored; a regrade or stats rebuild fills it in.
+    question_results = models.JSONField(null=True, blank=True, editable=False)
     submitted_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-submitted_at']
-    
+        indexes = [
+            models.Index(fields=['submitted_at', 'id'], name='attempt_submitted_idx'),
+            models.Index(fields=['user', 'submitted_at', 'id'], name='attempt_user_idx'),
+            models.Index(fields=['quiz', 'submitted_at', 'id'], name='attempt_quiz_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.quiz.title} ({self.score}%)"
+
+class QuestionStats(models.Model):
+    """Running item-analysis sums for one question, kept current by assessments.stats.
+
+    ``credit`` is the fraction of the question's points earned and ``score`` the
+    attempt's total score; the sums are enough to derive difficulty and the
+    item-total correlation (discrimination) without re-reading attempts.
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='question_stats')
+    attempts = models.PositiveIntegerField(default=0)
+    option_counts = models.JSONField(default=dict)  # {option_index: times selected}
+    credit_sum = models.FloatField(default=0)
+    credit_sq_sum = models.FloatField(default=0)
+    score_sum = models.FloatField(default=0)
+    score_sq_sum = models.FloatField(default=0)
+    credit_score_sum = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def difficulty(self):
+        """Percent of the available credit earned; higher means easier."""
+        return self.credit_sum / self.attempts * 100 if self.attempts else None
+
+    @property
+    def discrimination(self):
+        """Pearson correlation between question credit and attempt score."""
+        n = self.attempts
+        covariance = n * self.credit_score_sum - self.credit_sum * self.score_sum
+        spread = (n * self.credit_sq_sum - self.credit_sum ** 2) * (n * self.score_sq_sum - self.score_sum ** 2)
+        if n < 2 or spread <= 0:
+            return None
+        return covariance / spread ** 0.5
+
+    def __str__(self):
+        return f"Stats for question {self.question_id}"
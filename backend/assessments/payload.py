@@ -0,0 +1,60 @@
+"""Precompiled student view of a quiz.
+
+The student payload (questions and options, never the answer key) is
+serialized once per quiz and cached under the quiz's ``key_version``, which
+changes with the quiz or any of its questions, so serving a quiz to a student
+reads that one column instead of the ``Question`` table.
+Quizzes with a ``shuffle_seed`` are reordered per student and attempt; the
+order is derived from the seed, so reloading the page keeps it stable.
+"""
+import random
+from django.core.cache import cache
+from django.db.models import Prefetch
+from .grading import key_version
+
+PAYLOAD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def student_quiz_cache_key(quiz_id, version):
+    return f'quiz:{quiz_id}:v{version}:student-payload'
+
+
+def compile_student_quiz(quiz_id):
+    from .models import Quiz, Question
+    from .serializers import StudentQuizSerializer
+
+    quiz = Quiz.objects.prefetch_related(
+        Prefetch('questions', queryset=Question.objects.order_by('pk'))
+    ).filter(pk=quiz_id).first()
+    if quiz is None:
+        return None
+    return {'shuffle_seed': quiz.shuffle_seed, 'data': StudentQuizSerializer(quiz).data}
+
+
+def get_student_quiz(quiz_id):
+    """Return ``{'shuffle_seed', 'data'}`` for the quiz, or None if it does not exist."""
+    version = key_version(quiz_id)
+    if version is None:
+        return None
+    payload = cache.get(student_quiz_cache_key(quiz_id, version))
+    if payload is None:
+        payload = compile_student_quiz(quiz_id)
+        if payload is not None:
+            cache.set(student_quiz_cache_key(quiz_id, version), payload, timeout=PAYLOAD_CACHE_TIMEOUT)
+    return payload
+
+
+def shuffle_quiz(data, seed):
+    """Return a copy of ``data`` with questions and options reordered by ``seed``.
+
+    Each shuffled question carries ``option_order``: the original index of each
+    displayed option, which is what an attempt must submit.
+    """
+    rng = random.Random(seed)
+    questions = []
+    for question in data['questions']:
+        order = list(range(len(question['options'])))
+        rng.shuffle(order)
+        questions.append(dict(question, options=[question['options'][i] for i in order], option_order=order))
+    rng.shuffle(questions)
+    return dict(data, questions=questions)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Quiz, Question, Assignment, Submission, QuizAttempt
+from .grading import get_answer_key
+from .models import Quiz, Question, Assignment, Submission, QuizAttempt, QuestionStats
 
 class QuestionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,7 +12,25 @@ class QuizSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Quiz
-        fields = '__all__'
+        exclude = ('key_version',)
+
+class StudentQuestionSerializer(serializers.ModelSerializer):
+    """A question as a student sees it: no answer key."""
+    multiple = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Question
+        fields = ['id', 'text', 'options', 'points', 'multiple']
+
+    def get_multiple(self, obj):
+        return bool(obj.correct_answers)
+
+class StudentQuizSerializer(serializers.ModelSerializer):
+    questions = StudentQuestionSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Quiz
+        fields = ['id', 'module', 'title', 'description', 'questions']
 
 class AssignmentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -26,8 +45,36 @@ class SubmissionSerializer(serializers.ModelSerializer):
 
 class QuizAttemptSerializer(serializers.ModelSerializer):
     quiz_title = serializers.CharField(source='quiz.title', read_only=True)
-    
+    question_results = serializers.SerializerMethodField()
+    correct_answers = serializers.SerializerMethodField()
+
     class Meta:
         model = QuizAttempt
-        fields = ['id', 'quiz', 'quiz_title', 'answers', 'score', 'submitted_at']
+        fields = ['id', 'quiz', 'quiz_title', 'answers', 'score', 'question_results', 'correct_answers', 'submitted_at']
         read_only_fields = ('score', 'submitted_at')
+
+    def get_question_results(self, obj):
+        if obj.question_results is not None:
+            return obj.question_results
+        # Graded against the cached answer key, so this costs no queries per row.
+        _, results = get_answer_key(obj.quiz_id, obj.quiz.key_version).grade(obj.answers)
+        return {str(question_id): credit for question_id, credit in results.items()}
+
+    def get_correct_answers(self, obj):
+        # Only the course instructor sees the key: a student who got it back could
+        # write it into later attempts.
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        if user is None or user.role != 'INSTRUCTOR' or obj.quiz.module.course.instructor_id != user.pk:
+            return None
+        key = get_answer_key(obj.quiz_id, obj.quiz.key_version)
+        return {str(question_id): options for question_id, options in key.correct_options().items()}
+
+class QuestionStatsSerializer(serializers.ModelSerializer):
+    text = serializers.CharField(source='question.text', read_only=True)
+    difficulty = serializers.FloatField(read_only=True)
+    discrimination = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = QuestionStats
+        fields = ['question', 'text', 'attempts', 'difficulty', 'discrimination', 'option_counts', 'updated_at']
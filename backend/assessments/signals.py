@@ -0,0 +1,21 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Quiz, Question
+
+
+def bump_key_version(quiz_id):
+    # Part of the writer's transaction: readers see the new version together with the
+    # new questions, and recompile rather than reuse what any process has cached.
+    Quiz.objects.filter(pk=quiz_id).update(key_version=F('key_version') + 1)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    bump_key_version(instance.quiz_id)
+
+
+@receiver(post_save, sender=Quiz)
+def quiz_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_key_version(instance.pk)
@@ -0,0 +1,138 @@
+"""Per-question item analysis: difficulty, option distribution, discrimination.
+
+Each graded attempt adds its per-question credit, its score and the options it
+picked to running sums in ``QuestionStats`` (one locked read and one bulk
+update per attempt), so the statistics are served without touching
+``QuizAttempt.answers``. Deletes and regrades move the sums by the grading
+stored on the attempt, so they undo exactly what was added.
+``rebuild_question_stats`` recomputes the sums from history in one streaming
+pass, e.g. to repair them after a raw data fix.
+"""
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.utils import timezone
+from .grading import as_index, dump_results, get_answer_key, load_results
+from .models import QuestionStats, QuizAttempt
+
+SUM_FIELDS = ['attempts', 'credit_sum', 'credit_sq_sum', 'score_sum', 'score_sq_sum', 'credit_score_sum']
+
+
+class StatsAccumulator:
+    """Collects the additive deltas of many attempts, keyed by question id."""
+
+    def __init__(self):
+        self.sums = defaultdict(lambda: [0] * len(SUM_FIELDS))
+        self.options = defaultdict(Counter)
+
+    def add(self, answers, score, results, sign=1):
+        answers = answers if isinstance(answers, dict) else {}
+        for question_id, credit in results.items():
+            sums = self.sums[question_id]
+            for i, value in enumerate((1, credit, credit * credit, score, score * score, credit * score)):
+                sums[i] += sign * value
+            for option in selected_options(answers.get(str(question_id), answers.get(question_id))):
+                self.options[question_id][str(option)] += sign
+
+    def apply(self, row):
+        for field, delta in zip(SUM_FIELDS, self.sums[row.question_id]):
+            setattr(row, field, getattr(row, field) + delta)
+        counts = Counter(row.option_counts)
+        counts.update(self.options[row.question_id])
+        row.option_counts = {option: count for option, count in sorted(counts.items()) if count > 0}
+
+
+def selected_options(response):
+    if response is None:
+        return []
+    if not isinstance(response, (list, tuple)):
+        response = [response]
+    return sorted({index for index in map(as_index, response) if index is not None})
+
+
+def record_attempt(quiz_id, answers, score, results, sign=1, known=None):
+    """Add (``sign=1``) or remove (``sign=-1``) one graded attempt from the quiz's stats."""
+    record_attempts(quiz_id, [(answers, score, results)], sign, known)
+
+
+def record_attempts(quiz_id, graded, sign=1, known=None):
+    """Apply many graded ``(answers, score, results)`` attempts of one quiz in one update.
+
+    ``known`` limits the update to those question ids: stored results can name
+    questions deleted since, whose stats rows went with them.
+    """
+    accumulator = StatsAccumulator()
+    for answers, score, results in graded:
+        accumulator.add(answers, score, results, sign)
+    save_deltas(quiz_id, accumulator, known)
+
+
+def record_regrades(quiz_id, regraded, known=None):
+    """Move ``(answers, old_score, old_results, score, results)`` attempts from their old grading to the new one."""
+    accumulator = StatsAccumulator()
+    for answers, old_score, old_results, score, results in regraded:
+        accumulator.add(answers, old_score, old_results, -1)
+        accumulator.add(answers, score, results)
+    save_deltas(quiz_id, accumulator, known)
+
+
+def save_deltas(quiz_id, accumulator, known=None):
+    question_ids = set(accumulator.sums)
+    if known is not None:
+        question_ids &= set(known)
+    if not question_ids:
+        return
+    with transaction.atomic():
+        QuestionStats.objects.bulk_create(
+            [QuestionStats(question_id=question_id, quiz_id=quiz_id) for question_id in question_ids],
+            ignore_conflicts=True,
+        )
+        rows = list(QuestionStats.objects.select_for_update().filter(question_id__in=question_ids))
+        now = timezone.now()
+        for row in rows:
+            accumulator.apply(row)
+            row.updated_at = now
+        QuestionStats.objects.bulk_update(rows, SUM_FIELDS + ['option_counts', 'updated_at'])
+
+
+def rebuild_question_stats(quiz_ids=None, chunk_size=2000):
+    """Recompute stats from every attempt in one pass; returns ``(attempts, questions)``.
+
+    Attempts count as they were graded; those without stored results are graded
+    against the current key and get their results stored.
+    """
+    attempts = QuizAttempt.objects.order_by()
+    if quiz_ids is not None:
+        attempts = attempts.filter(quiz_id__in=quiz_ids)
+
+    accumulator = StatsAccumulator()
+    keys = {}
+    backfill = []
+    count = 0
+    rows = attempts.values_list('pk', 'quiz_id', 'answers', 'score', 'question_results')
+    for pk, quiz_id, answers, score, stored in rows.iterator(chunk_size=chunk_size):
+        if quiz_id not in keys:
+            keys[quiz_id] = get_answer_key(quiz_id)
+        if stored is None:
+            graded_score, results = keys[quiz_id].grade(answers)
+            score = graded_score if score is None else score
+            backfill.append(QuizAttempt(pk=pk, question_results=dump_results(results)))
+        else:
+            results = load_results(stored)
+        accumulator.add(answers, score, results)
+        count += 1
+
+    rows = []
+    for quiz_id, key in keys.items():
+        for question_id in key.question_ids:
+            row = QuestionStats(question_id=question_id, quiz_id=quiz_id)
+            accumulator.apply(row)
+            rows.append(row)
+
+    with transaction.atomic():
+        stale = QuestionStats.objects.all()
+        if quiz_ids is not None:
+            stale = stale.filter(quiz_id__in=quiz_ids)
+        stale.delete()
+        QuestionStats.objects.bulk_create(rows, batch_size=1000)
+        QuizAttempt.objects.bulk_update(backfill, ['question_results'], batch_size=500)
+    return count, len(rows)
@@ -1,3 +1,301 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from courses.models import Course, Module
+from .grading import get_answer_key, grade_attempts, regrade_quiz
+from .models import Quiz, Question, QuizAttempt, QuestionStats, Assignment, Submission
+from .signals import bump_key_version
+from .stats import rebuild_question_stats
 
-# Create your tests here.
+User = get_user_model()
+
+
+class QuizTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.instructor = instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.student = User.objects.create_user(username='learner', password='pass1234')
+        course = Course.objects.create(title='Python', description='...', instructor=instructor)
+        self.quiz = Quiz.objects.create(module=Module.objects.create(course=course, title='Basics'), title='Check')
+        self.q1 = Question.objects.create(quiz=self.quiz, text='2 + 2?', options=['3', '4'], correct_answer=1)
+        self.q2 = Question.objects.create(quiz=self.quiz, text='Primes?', options=['2', '3', '4', '5'],
+                                          correct_answer=0, correct_answers=[0, 1, 3], points=3)
+
+
+class GradingTests(QuizTestCase):
+
+    def test_single_and_multi_answer_scoring(self):
+        key = get_answer_key(self.quiz.id)
+        score, results = key.grade({str(self.q1.id): '1', str(self.q2.id): [0, 1, 2]})
+        # q1 full (1 point), q2 (2 right - 1 wrong) / 3 of 3 points = 1 point
+        self.assertAlmostEqual(score, 2 / 4 * 100)
+        self.assertEqual(results, {self.q1.id: 1.0, self.q2.id: 1 / 3})
+        self.assertEqual(key.grade({str(self.q1.id): 'not a number'})[0], 0)
+
+    def test_batch_grading_uses_cached_key(self):
+        get_answer_key(self.quiz.id)
+        attempts = [(self.quiz.id, {str(self.q1.id): i % 2}) for i in range(100)]
+        with self.assertNumQueries(1):  # key versions
+            scores = grade_attempts(attempts)
+        self.assertEqual(scores.count(25.0), 50)
+        self.assertEqual(get_answer_key(self.quiz.id).grade_many([{str(self.q2.id): [0, 1, 2]}, None, {}]),
+                         [25.0, 0.0, 0.0])
+
+    def test_question_edit_invalidates_key(self):
+        self.assertEqual(get_answer_key(self.quiz.id).grade({str(self.q1.id): 0})[0], 0)
+        self.q1.correct_answer = 0
+        self.q1.save()
+        self.assertEqual(get_answer_key(self.quiz.id).grade({str(self.q1.id): 0})[0], 25)
+
+    def test_edit_in_another_process_is_seen(self):
+        get_answer_key(self.quiz.id)
+        # Another worker's edit: rows and version change, this process's cache is untouched.
+        Question.objects.filter(pk=self.q1.pk).update(correct_answer=0)
+        bump_key_version(self.quiz.id)
+        self.assertEqual(get_answer_key(self.quiz.id).grade({str(self.q1.id): 0})[0], 25)
+
+    def test_stale_quiz_save_keeps_key_version(self):
+        stale = Quiz.objects.get(pk=self.quiz.pk)
+        self.q1.save()
+        stale.title = 'Renamed'
+        stale.save()
+        self.assertEqual(Quiz.objects.get(pk=self.quiz.pk).key_version, stale.key_version + 2)
+
+    def test_attempt_submission(self):
+        self.client.force_authenticate(self.student)
+        answers = {str(self.q1.id): 1, str(self.q2.id): [0, 1, 3]}
+        response = self.client.post('/api/quiz-attempts/', {'quiz': self.quiz.id, 'answers': answers}, format='json')
+        self.assertEqual(response.data['score'], 100)
+        self.assertEqual(response.data['question_results'], {str(self.q1.id): 1.0, str(self.q2.id): 1.0})
+
+        # Quiz lookup, insert, then one stats upsert (savepoint, seed, locked read, update, release).
+        with self.assertNumQueries(7):
+            self.client.post('/api/quiz-attempts/', {'quiz': self.quiz.id, 'answers': answers}, format='json')
+        self.assertEqual(QuizAttempt.objects.filter(score=100).count(), 2)
+
+
+class RegradeTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        QuizAttempt.objects.bulk_create([
+            QuizAttempt(user=self.student, quiz=self.quiz, answers={str(self.q1.id): i % 2}, score=25 if i % 2 else 0)
+            for i in range(10)
+        ])
+        Question.objects.filter(pk=self.q1.pk).update(correct_answer=0)  # bypasses signals, like a raw fix
+        cache.clear()
+
+    def scores(self):
+        return list(QuizAttempt.objects.order_by('pk').values_list('score', flat=True))
+
+    def test_regrade_in_resumable_batches(self):
+        progress = list(regrade_quiz(self.quiz.id, batch_size=4, max_batches=2))
+        self.assertEqual([(graded, changed) for _, graded, changed in progress], [(4, 4), (4, 4)])
+        self.assertEqual(self.scores(), [25, 0] * 4 + [0, 25])
+
+        list(regrade_quiz(self.quiz.id, after_id=progress[-1][0], batch_size=4))
+        self.assertEqual(self.scores(), [25, 0] * 5)
+        self.assertEqual([changed for _, _, changed in regrade_quiz(self.quiz.id)], [0])
+
+    def test_submitted_answers_cannot_be_edited(self):
+        attempt = QuizAttempt.objects.filter(user=self.student).first()
+        submitted = attempt.answers
+        self.client.force_authenticate(self.student)
+        url = f'/api/quiz-attempts/{attempt.id}/'
+        self.assertEqual(self.client.patch(url, {'answers': {str(self.q1.id): 0}}, format='json').status_code, 405)
+        self.assertEqual(self.client.put(url, {'quiz': self.quiz.id, 'answers': {}}, format='json').status_code, 405)
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.answers, submitted)
+
+    def test_regrade_command(self):
+        out = StringIO()
+        call_command('regrade_quiz', self.quiz.id, '--batch-size', '3', stdout=out)
+        self.assertIn('Regraded 10 attempts', out.getvalue())
+        self.assertEqual(self.scores(), [25, 0] * 5)
+
+    def test_regrade_endpoint(self):
+        url = f'/api/quizzes/{self.quiz.id}/regrade/'
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.post(url).status_code, 403)
+
+        self.client.force_authenticate(self.instructor)
+        response = self.client.post(url)
+        self.assertEqual(response.data['graded'], 10)
+        self.assertEqual(response.data['changed'], 10)
+        self.assertTrue(response.data['done'])
+
+
+class QuestionStatsTests(QuizTestCase):
+    def submit(self, answers):
+        self.client.force_authenticate(self.student)
+        return self.client.post('/api/quiz-attempts/', {'quiz': self.quiz.id, 'answers': answers}, format='json')
+
+    def snapshot(self):
+        return {
+            row.question_id: (row.attempts, row.option_counts, round(row.difficulty, 6), row.discrimination)
+            for row in QuestionStats.objects.all()
+        }
+
+    def test_stats_update_incrementally_and_match_rebuild(self):
+        q1, q2 = str(self.q1.id), str(self.q2.id)
+        self.submit({q1: 1, q2: [0, 1, 3]})
+        self.submit({q1: 0, q2: [0]})
+        attempt = self.submit({q1: 0, q2: [2]}).data['id']
+        self.client.delete(f'/api/quiz-attempts/{attempt}/')
+
+        stats = QuestionStats.objects.get(question=self.q1)
+        self.assertEqual(stats.attempts, 2)
+        self.assertEqual(stats.option_counts, {'0': 1, '1': 1})
+        self.assertEqual(stats.difficulty, 50)
+        self.assertAlmostEqual(stats.discrimination, 1.0)
+
+        incremental = self.snapshot()
+        self.assertEqual(rebuild_question_stats(), (2, 2))
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_rejected_edit_leaves_stats_matching_the_attempts(self):
+        q1 = str(self.q1.id)
+        attempt = self.submit({q1: 1}).data['id']
+        before = self.snapshot()
+        # Attempts are immutable, so there is no update path that could skip the stats.
+        response = self.client.patch(f'/api/quiz-attempts/{attempt}/', {'answers': {q1: 0}}, format='json')
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(self.snapshot(), before)
+        rebuild_question_stats()
+        self.assertEqual(self.snapshot(), before)
+
+    def test_regrade_moves_stats_batch_by_batch(self):
+        q1 = str(self.q1.id)
+        for answer in (0, 0, 1):
+            self.submit({q1: answer})
+        self.assertAlmostEqual(QuestionStats.objects.get(question=self.q1).difficulty, 100 / 3)
+        self.q1.correct_answer = 0
+        self.q1.save()
+
+        regraded = list(regrade_quiz(self.quiz.id, batch_size=2))
+        self.assertEqual([changed for _, _, changed in regraded], [2, 1])
+        stats = QuestionStats.objects.get(question=self.q1)
+        self.assertEqual(stats.attempts, 3)
+        self.assertAlmostEqual(stats.difficulty, 200 / 3)
+        regraded = self.snapshot()
+        rebuild_question_stats()
+        self.assertEqual(self.snapshot(), regraded)
+
+    def test_delete_after_key_change_takes_back_what_was_added(self):
+        q1 = str(self.q1.id)
+        attempt = self.submit({q1: 1}).data['id']
+        self.q1.correct_answer = 0
+        self.q1.save()
+        self.client.delete(f'/api/quiz-attempts/{attempt}/')
+
+        stats = QuestionStats.objects.get(question=self.q1)
+        self.assertEqual((stats.attempts, stats.credit_sum, stats.score_sum), (0, 0, 0))
+
+    def test_stats_endpoint(self):
+        self.submit({str(self.q1.id): 1})
+        url = f'/api/quizzes/{self.quiz.id}/stats/'
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_authenticate(self.instructor)
+        with self.assertNumQueries(3):  # quiz, stats rows, page-view event
+            response = self.client.get(url)
+        rows = {row['question']: row for row in response.data['questions']}
+        self.assertEqual(rows[self.q1.id]['difficulty'], 100)
+        self.assertEqual(rows[self.q2.id]['option_counts'], {})
+
+
+class SubmittedWorkScopeTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        other = User.objects.create_user(username='other', password='pass1234', role='INSTRUCTOR')
+        other_course = Course.objects.create(title='Other', description='...', instructor=other)
+        self.other_quiz = Quiz.objects.create(module=Module.objects.create(course=other_course, title='M'), title='Other')
+        self.assignment = Assignment.objects.create(module=Module.objects.create(course=self.quiz.module.course, title='Essay'),
+                                                    title='Essay', description='...')
+        self.peer = User.objects.create_user(username='peer', password='pass1234')
+        for user in (self.student, self.peer):
+            QuizAttempt.objects.create(user=user, quiz=self.quiz, answers={}, score=0)
+            QuizAttempt.objects.create(user=user, quiz=self.other_quiz, answers={}, score=0)
+            Submission.objects.create(user=user, assignment=self.assignment, text_answer='...')
+        QuizAttempt.objects.filter(user=self.peer).update(submitted_at=timezone.now() - timedelta(days=10))
+
+    def ids(self, url):
+        return {row['id'] for row in self.client.get(url).data['results']}
+
+    def test_instructor_sees_only_own_courses(self):
+        self.client.force_authenticate(self.instructor)
+        own = set(QuizAttempt.objects.filter(quiz=self.quiz).values_list('id', flat=True))
+        self.assertEqual(self.ids('/api/quiz-attempts/'), own)
+        self.assertEqual(self.ids(f'/api/quiz-attempts/?quiz={self.other_quiz.id}'), set())
+        self.assertEqual(len(self.ids('/api/submissions/')), 2)
+
+        self.client.force_authenticate(self.other_quiz.module.course.instructor)
+        self.assertEqual(self.ids('/api/submissions/'), set())
+
+    def test_filters(self):
+        self.client.force_authenticate(self.instructor)
+        course = self.quiz.module.course.id
+        mine = QuizAttempt.objects.get(user=self.student, quiz=self.quiz).id
+        self.assertEqual(self.ids(f'/api/quiz-attempts/?course={course}&student={self.student.id}'), {mine})
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        self.assertEqual(self.ids(f'/api/quiz-attempts/?since={since}'), {mine})
+        self.assertEqual(len(self.ids(f'/api/submissions/?module={self.assignment.module_id}')), 2)
+        self.assertEqual(self.client.get('/api/submissions/?since=yesterday').status_code, 400)
+
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.ids(f'/api/submissions/?assignment={self.assignment.id}'),
+                         set(Submission.objects.filter(user=self.student).values_list('id', flat=True)))
+
+    def test_attempt_list_query_count_is_flat(self):
+        self.client.force_authenticate(self.instructor)
+        QuizAttempt.objects.bulk_create([QuizAttempt(user=self.peer, quiz=self.quiz, answers={}, score=0) for _ in range(30)])
+        get_answer_key(self.quiz.id)
+        with self.assertNumQueries(2):  # page, page-view event
+            self.client.get('/api/quiz-attempts/')
+
+
+class StudentQuizPayloadTests(QuizTestCase):
+    def test_student_payload_hides_key_and_is_cached(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.get(f'/api/quizzes/{self.quiz.id}/')
+        self.assertNotIn('correct_answer', response.data['questions'][0])
+        self.assertEqual([q['multiple'] for q in response.data['questions']], [False, True])
+
+        with self.assertNumQueries(2):  # key version, page-view event
+            self.client.get(f'/api/quizzes/{self.quiz.id}/')
+
+        self.q1.text = 'Two plus two?'
+        self.q1.save()
+        self.assertEqual(self.client.get(f'/api/quizzes/{self.quiz.id}/').data['questions'][0]['text'], 'Two plus two?')
+        self.assertEqual(self.client.get('/api/questions/').data, [])
+
+    def test_instructor_gets_full_quiz(self):
+        self.client.force_authenticate(self.instructor)
+        response = self.client.get(f'/api/quizzes/{self.quiz.id}/')
+        self.assertEqual(response.data['questions'][0]['correct_answer'], 1)
+
+    def test_shuffle_is_stable_per_attempt_and_maps_to_original_options(self):
+        Quiz.objects.filter(pk=self.quiz.pk).update(shuffle_seed=42)
+        cache.clear()
+        self.client.force_authenticate(self.student)
+        url = f'/api/quizzes/{self.quiz.id}/'
+        first = self.client.get(url).data
+        self.assertEqual(self.client.get(url).data, first)
+
+        primes = next(q for q in first['questions'] if q['id'] == self.q2.id)
+        self.assertEqual([primes['options'][i] for i in sorted(range(4), key=primes['option_order'].__getitem__)],
+                         ['2', '3', '4', '5'])
+
+        answers = {str(self.q1.id): 1, str(self.q2.id): [0, 1, 3]}
+        attempt = self.client.post('/api/quiz-attempts/', {'quiz': self.quiz.id, 'answers': answers}, format='json')
+        self.assertIsNone(attempt.data['correct_answers'])
+        self.assertEqual(attempt.data['question_results'], {str(self.q1.id): 1, str(self.q2.id): 1})
+        self.client.force_authenticate(self.instructor)
+        reviewed = self.client.get(f"/api/quiz-attempts/{attempt.data['id']}/").data
+        self.assertEqual(reviewed['correct_answers'], {str(self.q1.id): [1], str(self.q2.id): [0, 1, 3]})
+        self.client.force_authenticate(self.student)
+        orders = {str(self.client.get(url).data['questions']) for _ in range(2)}
+        self.assertEqual(len(orders), 1)
@@ -1,63 +1,220 @@
+from datetime import datetime, time
+from functools import reduce
+from operator import or_
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework import status as http_status
-from .models import Quiz, Question, Assignment, Submission, QuizAttempt
-from .serializers import QuizSerializer, QuestionSerializer, AssignmentSerializer, SubmissionSerializer, QuizAttemptSerializer
+from .models import Quiz, Question, Assignment, Submission, QuizAttempt, QuestionStats
+from .serializers import (
+    QuizSerializer, QuestionSerializer, AssignmentSerializer, SubmissionSerializer, QuizAttemptSerializer,
+    QuestionStatsSerializer, StudentQuizSerializer,
+)
 from courses.views import IsInstructorOrReadOnly
+from .grading import dump_results, get_answer_key, grade_attempt, load_results, regrade_quiz
+from .payload import get_student_quiz, shuffle_quiz
+from .stats import record_attempt
+from backend.pagination import SubmittedAtCursorPagination
 
 class QuizViewSet(viewsets.ModelViewSet):
     queryset = Quiz.objects.all()
     serializer_class = QuizSerializer
     permission_classes = [IsInstructorOrReadOnly]
 
+    REGRADE_BATCH_SIZE = 2000
+    REGRADE_MAX_BATCHES = 25
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return StudentQuizSerializer
+        return QuizSerializer
+
+    def get_queryset(self):
+        if self.action == 'list':
+            return Quiz.objects.prefetch_related('questions')
+        return Quiz.objects.all()
+
+    def retrieve(self, request, *args, **kwargs):
+        """Course instructors get the full quiz; everyone else the cached student payload."""
+        user = request.user
+        if not str(kwargs['pk']).isdigit():
+            raise NotFound()
+        quiz_id = int(kwargs['pk'])
+        if user.is_authenticated and user.role == 'INSTRUCTOR' and Quiz.objects.filter(
+            pk=quiz_id, module__course__instructor=user
+        ).exists():
+            return super().retrieve(request, *args, **kwargs)
+
+        payload = get_student_quiz(quiz_id)
+        if payload is None:
+            raise NotFound()
+        data = payload['data']
+        if payload['shuffle_seed'] is not None and user.is_authenticated:
+            # A new order per attempt, stable across reloads until the attempt is submitted.
+            attempt_number = QuizAttempt.objects.filter(user=user, quiz_id=data['id']).count()
+            data = shuffle_quiz(data, f"{payload['shuffle_seed']}:{user.pk}:{attempt_number}")
+        return Response(data)
+
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def regrade(self, request, pk=None):
+        """Rescore existing attempts against the current answer key.
+
+        Work is capped per request; while ``done`` is false, call again with
+        the returned ``last_id`` as ``after_id`` to continue.
+        """
+        quiz = self.get_owned_quiz(pk)
+        if quiz is None:
+            return Response({'error': 'Only the course instructor can regrade this quiz'}, status=http_status.HTTP_403_FORBIDDEN)
+        try:
+            after_id = int(request.data.get('after_id', 0))
+        except (TypeError, ValueError):
+            return Response({'error': 'after_id must be an integer'}, status=http_status.HTTP_400_BAD_REQUEST)
+
+        last_id, graded, changed, batches = after_id, 0, 0, 0
+        for last_id, batch_graded, batch_changed in regrade_quiz(
+            quiz.pk, after_id, self.REGRADE_BATCH_SIZE, self.REGRADE_MAX_BATCHES
+        ):
+            graded += batch_graded
+            changed += batch_changed
+            batches += 1
+        done = batches < self.REGRADE_MAX_BATCHES or not quiz.attempts.filter(pk__gt=last_id).exists()
+        return Response({'graded': graded, 'changed': changed, 'last_id': last_id, 'done': done})
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def stats(self, request, pk=None):
+        """Per-question difficulty, discrimination and option distribution."""
+        quiz = self.get_owned_quiz(pk)
+        if quiz is None:
+            return Response({'error': 'Only the course instructor can view these statistics'}, status=http_status.HTTP_403_FORBIDDEN)
+        rows = QuestionStats.objects.filter(quiz=quiz).select_related('question').order_by('question_id')
+        return Response({'quiz': quiz.pk, 'questions': QuestionStatsSerializer(rows, many=True).data})
+
+    def get_owned_quiz(self, pk):
+        quiz = get_object_or_404(Quiz.objects.select_related('module__course'), pk=pk)
+        return quiz if quiz.module.course.instructor_id == self.request.user.pk else None
+
 class QuestionViewSet(viewsets.ModelViewSet):
     queryset = Question.objects.all()
     serializer_class = QuestionSerializer
     permission_classes = [IsInstructorOrReadOnly]
 
+    def get_queryset(self):
+        # Questions carry the answer key, so only the course instructor may read them here.
+        user = self.request.user
+        if not user.is_authenticated:
+            return Question.objects.none()
+        return Question.objects.filter(quiz__module__course__instructor=user)
+
 class AssignmentViewSet(viewsets.ModelViewSet):
     queryset = Assignment.objects.all()
     serializer_class = AssignmentSerializer
     permission_classes = [IsInstructorOrReadOnly]
 
-class SubmissionViewSet(viewsets.ModelViewSet):
+class SubmittedWorkFilterMixin:
+    """Scope submissions/attempts to the requester and apply the shared filters.
+
+    Students see their own rows; instructors see rows for the quizzes and
+    assignments of their own courses. Both can narrow with ``course``,
+    ``module``, ``student``, ``since`` and ``until`` (ISO date or datetime,
+    ``until`` exclusive), plus ``id_filters`` on the model's own foreign keys.
+    Course scoping is done with ``IN (subquery)`` on the target ids so each
+    branch can use the ``(target, submitted_at)`` indexes.
+    """
+    targets = {}    # foreign key -> target model (Quiz/Assignment), all reached through module__course
+    id_filters = ()
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = self.queryset.all()
+        target_lookups = {}
+        if user.role == 'INSTRUCTOR':
+            target_lookups['module__course__instructor'] = user
+        else:
+            queryset = queryset.filter(user=user)
+        if (course := self.id_param('course')) is not None:
+            target_lookups['module__course_id'] = course
+        if (module := self.id_param('module')) is not None:
+            target_lookups['module_id'] = module
+        if target_lookups:
+            queryset = queryset.filter(reduce(or_, [
+                Q(**{f'{field}__in': model.objects.filter(**target_lookups).values('pk')})
+                for field, model in self.targets.items()
+            ]))
+
+        for field in self.id_filters:
+            if (value := self.id_param(field)) is not None:
+                queryset = queryset.filter(**{f'{field}_id': value})
+        if (student := self.id_param('student')) is not None:
+            queryset = queryset.filter(user_id=student)
+        if (since := self.datetime_param('since')) is not None:
+            queryset = queryset.filter(submitted_at__gte=since)
+        if (until := self.datetime_param('until')) is not None:
+            queryset = queryset.filter(submitted_at__lt=until)
+        return queryset
+
+    def id_param(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        if not value.isdigit():
+            raise ValidationError({name: 'Must be an id.'})
+        return int(value)
+
+    def datetime_param(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None and (day := parse_date(value)) is not None:
+                parsed = datetime.combine(day, time.min)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({name: 'Must be an ISO 8601 date or datetime.'})
+        return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+class SubmissionViewSet(SubmittedWorkFilterMixin, viewsets.ModelViewSet):
     queryset = Submission.objects.all()
     serializer_class = SubmissionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SubmittedAtCursorPagination
+
+    targets = {'assignment': Assignment, 'quiz': Quiz}
+    id_filters = ('assignment', 'quiz')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-    def get_queryset(self):
-        user = self.request.user
-        if user.role == 'INSTRUCTOR':
-            return Submission.objects.all()
-        return Submission.objects.filter(user=user)
-
-class QuizAttemptViewSet(viewsets.ModelViewSet):
-    queryset = QuizAttempt.objects.all()
+class QuizAttemptViewSet(SubmittedWorkFilterMixin, viewsets.ModelViewSet):
+    queryset = QuizAttempt.objects.select_related('quiz__module__course')
     serializer_class = QuizAttemptSerializer
     permission_classes = [permissions.IsAuthenticated]
-    
+    pagination_class = SubmittedAtCursorPagination
+    targets = {'quiz': Quiz}
+    id_filters = ('quiz',)
+    # Attempts are immutable once submitted: regrades and QuestionStats both assume
+    # the stored answers are the ones that were graded.
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
     def perform_create(self, serializer):
         quiz = serializer.validated_data['quiz']
         answers = serializer.validated_data['answers']
-        
-        # Calculate score
-        questions = quiz.questions.all()
-        correct_count = 0
-        
-        for question in questions:
-            question_id = str(question.id)
-            if question_id in answers:
-                if int(answers[question_id]) == question.correct_answer:
-                    correct_count += 1
-        
-        score = (correct_count / len(questions) * 100) if questions else 0
-        serializer.save(user=self.request.user, score=score)
-    
-    def get_queryset(self):
-        user = self.request.user
-        if user.role == 'INSTRUCTOR':
-            return QuizAttempt.objects.all()
-        return QuizAttempt.objects.filter(user=user)
+        score, results = grade_attempt(quiz.pk, answers, quiz.key_version)
+        serializer.save(user=self.request.user, score=score, question_results=dump_results(results))
+        record_attempt(quiz.pk, answers, score, results)
+
+    def perform_destroy(self, instance):
+        # Take back what the attempt added, not what it would score against today's key.
+        key = get_answer_key(instance.quiz_id, instance.quiz.key_version)
+        if instance.question_results is None:
+            score, results = key.grade(instance.answers)
+        else:
+            score, results = instance.score, load_results(instance.question_results)
+        instance.delete()
+        record_attempt(instance.quiz_id, instance.answers, score, results, sign=-1, known=key.question_ids)
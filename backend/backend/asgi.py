@@ -13,4 +13,6 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
+# Serve under an ASGI server (uvicorn, daphne) so long-lived streams such as
+# /api/analytics/live/ run on the event loop instead of holding a worker each.
 application = get_asgi_application()
@@ -0,0 +1,136 @@
+import json
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class StableOrderingFilter(OrderingFilter):
+    """``?ordering=`` that always ends in ``id``, in the direction of the last field.
+
+    Keyset cursors need a unique ordering: with ``?ordering=price`` alone, every
+    course at the same price would share one cursor position.
+    """
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        ordering = tuple(ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering += ('-id' if ordering[-1].startswith('-') else 'id',)
+        return ordering
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Newest-first keyset pagination on ``(created_at, id)``.
+
+    The cursor encodes the last seen position, so every page is an index
+    range scan and no ``COUNT(*)`` is issued. The position holds a value for
+    every ordering field, not only the first as in DRF's ``CursorPagination``:
+    the page after ``(v, id)`` is ``field > v OR (field = v AND id > id)``, so
+    rows sharing a value are walked by id instead of by an offset that DRF
+    caps at ``offset_cutoff``.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps([str(getattr(instance, field.lstrip('-'))) for field in ordering])
+
+    def keyset_filter(self, position, reverse):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if reverse != field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # DRF's implementation, filtering on the whole position instead of the first field.
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self.keyset_filter(current_position, reverse))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class CoursePagination(CreatedAtCursorPagination):
+    page_size = 24
+
+
+class DiscussionPagination(CreatedAtCursorPagination):
+    pass
+
+
+class NotificationPagination(CreatedAtCursorPagination):
+    max_page_size = 50
+
+
+class PaymentPagination(CreatedAtCursorPagination):
+    max_page_size = 50
+
+
+class SubmittedAtCursorPagination(CreatedAtCursorPagination):
+    ordering = ('-submitted_at', '-id')
+    page_size = 50
+    max_page_size = 200
+
+
+class EventPagination(CreatedAtCursorPagination):
+    ordering = ('-timestamp', '-id')
+    page_size = 100
+    max_page_size = 500
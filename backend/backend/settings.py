@@ -90,6 +90,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+TEST_RUNNER = 'backend.test_runner.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -102,6 +104,21 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Per-process memory cache; point this at Redis/Memcached when running several workers
+# so course tree invalidations are seen by all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Seconds a pre-rendered course tree stays cached; edits invalidate it immediately.
+COURSE_TREE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -149,6 +166,60 @@ DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Protected lesson file delivery (courses.delivery)
+# 'django' streams byte ranges from Python; 'x-accel' (nginx) and 'x-sendfile'
+# (Apache/lighttpd) hand the transfer to the front proxy instead.
+CONTENT_FILE_DELIVERY = os.getenv('CONTENT_FILE_DELIVERY', 'django')
+CONTENT_FILE_ACCEL_PREFIX = os.getenv('CONTENT_FILE_ACCEL_PREFIX', '/protected-media/')
+CONTENT_FILE_LINK_MAX_AGE = 60 * 60 * 6  # seconds a signed file link stays valid
+CONTENT_FILE_CHUNK_SIZE = 64 * 1024
+
+# Resumable chunked uploads (courses.uploads). Parts are written to
+# CHUNKED_UPLOAD_TEMP_DIR (default <MEDIA_ROOT>/upload_parts) until finalized.
+CHUNKED_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024  # advertised to clients
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = 2 * 1024 * 1024 * 1024
+CHUNKED_UPLOAD_TEMP_DIR = os.getenv('CHUNKED_UPLOAD_TEMP_DIR', '')
+CHUNKED_UPLOAD_EXPIRY_HOURS = 24
+
+# Assignment deadline reminders (communication.reminders), in minutes before
+# the due date. Each student gets at most one reminder per lead.
+ASSIGNMENT_REMINDER_LEADS = (24 * 60, 60)
+
+# Page-view ingestion (analytics.ingest). 'buffered' queues events in-process and
+# a background thread bulk-inserts them; 'sync' writes during the request (the
+# test runner switches to it, see backend.test_runner); 'off'.
+ANALYTICS_INGEST_MODE = os.getenv('ANALYTICS_INGEST_MODE', 'buffered')
+ANALYTICS_BUFFER_SIZE = 10000  # events held before new ones are dropped
+ANALYTICS_BATCH_SIZE = 500
+ANALYTICS_FLUSH_INTERVAL = 2.0  # seconds
+ANALYTICS_SAMPLE_RATE = float(os.getenv('ANALYTICS_SAMPLE_RATE', '1.0'))
+ANALYTICS_ROLLUP_LAG = 60  # seconds after its insert before rollup_events counts an event
+
+# Event retention (analytics.archive). archive_events moves events older than
+# ANALYTICS_ARCHIVE_AFTER_DAYS into one gzip NDJSON file per UTC day.
+ANALYTICS_ARCHIVE_DIR = os.getenv('ANALYTICS_ARCHIVE_DIR', str(BASE_DIR / 'archive' / 'events'))
+ANALYTICS_ARCHIVE_AFTER_DAYS = int(os.getenv('ANALYTICS_ARCHIVE_AFTER_DAYS', '90'))
+ANALYTICS_ARCHIVE_MAX_SPAN_DAYS = 31  # widest window one archived-events request may read
+
+# In-memory cohort/funnel engine (analytics.columnar), one per process. New rows
+# are loaded at most every REFRESH seconds; a full reload every REBUILD seconds
+# picks up deletions and regrades.
+ANALYTICS_ENGINE_REFRESH_SECONDS = 60
+ANALYTICS_ENGINE_REBUILD_SECONDS = 6 * 60 * 60
+ANALYTICS_PASS_SCORE = 60  # default quiz score counted as a pass in funnels
+
+# Live dashboard stream (analytics.live, served under ASGI). One change feed per
+# process polls every POLL_INTERVAL seconds while any dashboard is connected.
+ANALYTICS_LIVE_POLL_INTERVAL = 2.0
+ANALYTICS_LIVE_HEARTBEAT = 15  # seconds between keep-alive comments
+ANALYTICS_LIVE_RETRY_MS = 5000  # reconnect delay suggested to EventSource
+ANALYTICS_LIVE_QUEUE_SIZE = 1000  # undelivered changes before a slow stream is closed
+ANALYTICS_LIVE_TICKET_MAX_AGE = 60  # seconds a stream URL can be used to connect
+
+# Window for Course.recent_enrollment_count ("trending"); refresh_enrollment_counts ages it.
+RECENT_ENROLLMENT_DAYS = 7
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -0,0 +1,21 @@
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Runs the suite with events written during the request.
+
+    The buffered writer's background thread cannot see rows a test has not
+    committed, and tests that count queries or read events back need the
+    INSERT to happen in the request. Tests of the buffer opt back in with
+    ``override_settings(ANALYTICS_INGEST_MODE='buffered')``.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.ingest_override = override_settings(ANALYTICS_INGEST_MODE='sync')
+        self.ingest_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.ingest_override.disable()
+        super().teardown_test_environment(**kwargs)
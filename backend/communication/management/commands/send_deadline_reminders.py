@@ -0,0 +1,19 @@
+import time
+from django.core.management.base import BaseCommand
+from communication.reminders import send_deadline_reminders
+
+
+class Command(BaseCommand):
+    help = 'Notify enrolled students who have not submitted assignments that are due soon (safe to rerun)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', type=int, metavar='SECONDS', help='Keep running, checking every SECONDS')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        while True:
+            sent = send_deadline_reminders(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Sent {sent} deadline reminders'))
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
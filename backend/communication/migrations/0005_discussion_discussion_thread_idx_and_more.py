@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communication', '0004_alter_discussion_title_alter_discussion_user_and_more'),
+        ('courses', '0003_course_course_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discussion',
+            index=models.Index(fields=['parent', 'created_at', 'id'], name='discussion_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='notification_user_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communication', '0006_deadlinereminder'),
+        ('courses', '0007_enrollment_course_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discussion',
+            index=models.Index(fields=['course', 'parent', 'created_at', 'id'], name='discussion_course_thread_idx'),
+        ),
+    ]
@@ -10,6 +10,12 @@ class Discussion(models.Model):
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['parent', 'created_at', 'id'], name='discussion_thread_idx'),
+            models.Index(fields=['course', 'parent', 'created_at', 'id'], name='discussion_course_thread_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -19,5 +25,27 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='notification_user_idx'),
+        ]
+
     def __str__(self):
         return f"Notification for {self.user}: {self.message}"
+
+class DeadlineReminder(models.Model):
+    """Records that ``user`` was reminded about ``assignment`` at a given lead time.
+
+    The unique key makes ``communication.reminders`` idempotent: a student is
+    reminded at most once per assignment and lead, however often it runs.
+    """
+    assignment = models.ForeignKey('assessments.Assignment', on_delete=models.CASCADE, related_name='reminders')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='deadline_reminders')
+    lead_minutes = models.PositiveIntegerField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('assignment', 'user', 'lead_minutes')
+
+    def __str__(self):
+        return f"{self.user} reminded of {self.assignment} ({self.lead_minutes} min)"
@@ -0,0 +1,88 @@
+"""Assignment deadline reminders.
+
+Each run looks up assignments due within the longest lead with one indexed
+range query on ``due_date``. For each, the students still to remind are
+computed in SQL as enrolled students minus those who have submitted minus
+those already reminded at this lead. Reminder records and notifications are
+written together in batches, so a run interrupted part-way simply continues
+where it stopped on the next run. A student is notified only when this run
+inserted their reminder row, so overlapping runs cannot both notify them.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from assessments.models import Assignment, Submission
+from courses.enrollment import batched
+from courses.models import Enrollment
+from .models import DeadlineReminder, Notification
+
+
+def reminder_message(assignment):
+    due = timezone.localtime(assignment.due_date).strftime('%Y-%m-%d %H:%M')
+    return f"Reminder: '{assignment.title[:180]}' is due {due} and you have not submitted yet."
+
+
+def pending_students(assignment, lead_minutes):
+    """Ids of enrolled students who have neither submitted nor been reminded at this lead."""
+    return (
+        Enrollment.objects.filter(course_id=assignment.module.course_id)
+        .exclude(student__in=Submission.objects.filter(assignment=assignment).values('user'))
+        .exclude(student__in=DeadlineReminder.objects.filter(
+            assignment=assignment, lead_minutes=lead_minutes
+        ).values('user'))
+        .order_by()
+        .values_list('student_id', flat=True)
+    )
+
+
+def claim_reminders(assignment, lead_minutes, student_ids, attempts=3):
+    """Insert reminder rows for ``student_ids``; returns the ids this call inserted.
+
+    As in ``courses.enrollment.enroll_pairs``, the insert runs in a savepoint and
+    fails on a duplicate instead of skipping it: if another run reminded some
+    of the students since they were read, the savepoint is rolled back and
+    those students are dropped before trying again.
+    """
+    student_ids = list(student_ids)
+    while student_ids:
+        try:
+            with transaction.atomic():
+                DeadlineReminder.objects.bulk_create([
+                    DeadlineReminder(assignment=assignment, user_id=pk, lead_minutes=lead_minutes)
+                    for pk in student_ids
+                ])
+            break
+        except IntegrityError:
+            attempts -= 1
+            if not attempts:
+                raise
+            reminded = set(DeadlineReminder.objects.filter(
+                assignment=assignment, lead_minutes=lead_minutes, user_id__in=student_ids
+            ).values_list('user_id', flat=True))
+            student_ids = [pk for pk in student_ids if pk not in reminded]
+    return student_ids
+
+
+def send_deadline_reminders(now=None, leads=None, batch_size=1000):
+    """Send due reminders; returns the number of notifications created."""
+    now = now or timezone.now()
+    leads = sorted(leads or settings.ASSIGNMENT_REMINDER_LEADS)
+    if not leads:
+        return 0
+    upcoming = Assignment.objects.filter(
+        due_date__gt=now, due_date__lte=now + timedelta(minutes=leads[-1])
+    ).select_related('module')
+
+    sent = 0
+    for assignment in upcoming:
+        # Only the tightest lead applies, so a late start sends one reminder, not several.
+        lead = next(lead for lead in leads if assignment.due_date <= now + timedelta(minutes=lead))
+        message = reminder_message(assignment)
+        # Materialized first: the batches below write to a table the query reads.
+        for student_ids in batched(list(pending_students(assignment, lead)), batch_size):
+            with transaction.atomic():
+                student_ids = claim_reminders(assignment, lead, student_ids)
+                Notification.objects.bulk_create([Notification(user_id=pk, message=message) for pk in student_ids])
+            sent += len(student_ids)
+    return sent
@@ -1,3 +1,77 @@
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from assessments.models import Assignment, Submission
+from courses.models import Course, Module, Enrollment
+from .models import Discussion, Notification
+from .reminders import pending_students, send_deadline_reminders
 
-# Create your tests here.
+User = get_user_model()
+
+
+class DeadlineReminderTests(TestCase):
+    def setUp(self):
+        instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        course = Course.objects.create(title='Python', description='...', instructor=instructor)
+        self.now = timezone.now()
+        self.assignment = Assignment.objects.create(
+            module=Module.objects.create(course=course, title='Week 1'), title='Essay', description='...',
+            due_date=self.now + timedelta(hours=20),
+        )
+        Assignment.objects.create(
+            module=Module.objects.create(course=course, title='Week 2'), title='Later', description='...',
+            due_date=self.now + timedelta(days=5),
+        )
+        User.objects.bulk_create([User(username=f'student{i}') for i in range(50)])
+        self.students = list(User.objects.filter(username__startswith='student'))
+        Enrollment.objects.bulk_create([Enrollment(student=student, course=course) for student in self.students])
+        Submission.objects.create(user=self.students[0], assignment=self.assignment)
+
+    def test_reminds_unsubmitted_students_once_per_lead(self):
+        self.assertEqual(send_deadline_reminders(now=self.now, batch_size=20), 49)
+        self.assertFalse(Notification.objects.filter(user=self.students[0]).exists())
+        self.assertEqual(send_deadline_reminders(now=self.now), 0)
+
+        Submission.objects.create(user=self.students[1], assignment=self.assignment)
+        # Assignments, pending students, then one batch: savepoint, reminder savepoint, reminders,
+        # release, notifications, release.
+        with self.assertNumQueries(8):
+            sent = send_deadline_reminders(now=self.now + timedelta(hours=19, minutes=30))
+        self.assertEqual(sent, 48)
+        self.assertEqual(Notification.objects.filter(user=self.students[2]).count(), 2)
+
+    def test_overlapping_runs_notify_each_student_once(self):
+        # The second run read its pending students before the first one wrote any reminders.
+        stale = list(pending_students(self.assignment, 24 * 60))
+        self.assertEqual(send_deadline_reminders(now=self.now, batch_size=20), 49)
+        with mock.patch('communication.reminders.pending_students', return_value=stale):
+            self.assertEqual(send_deadline_reminders(now=self.now, batch_size=20), 0)
+        self.assertEqual(Notification.objects.count(), 49)
+        self.assertEqual(Notification.objects.filter(user=self.students[3]).count(), 1)
+
+
+class DiscussionFilterTests(APITestCase):
+    def setUp(self):
+        instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.user = User.objects.create_user(username='learner', password='pass1234')
+        self.course = Course.objects.create(title='Python', description='...', instructor=instructor)
+        other = Course.objects.create(title='Go', description='...', instructor=instructor)
+        Discussion.objects.bulk_create(
+            [Discussion(course=other, user=self.user, title=f'Other {i}', content='...') for i in range(30)]
+        )
+        self.thread = Discussion.objects.create(course=self.course, user=self.user, title='Mine', content='...')
+        Discussion.objects.create(course=self.course, user=self.user, title='Re', content='...', parent=self.thread)
+        self.client.force_authenticate(self.user)
+
+    def test_lists_only_the_courses_threads(self):
+        response = self.client.get('/api/communication/discussions/', {'course': self.course.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([thread['id'] for thread in response.data['results']], [self.thread.pk])
+        self.assertIsNone(response.data['next'])
+
+    def test_rejects_a_non_numeric_course(self):
+        response = self.client.get('/api/communication/discussions/', {'course': 'python'})
+        self.assertEqual(response.status_code, 400)
@@ -1,16 +1,25 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from .models import Discussion, Notification
 from .serializers import DiscussionSerializer, NotificationSerializer
+from backend.pagination import DiscussionPagination, NotificationPagination
 
 class DiscussionViewSet(viewsets.ModelViewSet):
     queryset = Discussion.objects.all()
     serializer_class = DiscussionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DiscussionPagination
 
     def get_queryset(self):
-        return Discussion.objects.filter(parent=None)
+        queryset = Discussion.objects.filter(parent=None)
+        course = self.request.query_params.get('course')
+        if course is not None:
+            if not course.isdigit():
+                raise ValidationError({'course': 'Must be a course id.'})
+            queryset = queryset.filter(course_id=course)
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -18,9 +27,10 @@ class DiscussionViewSet(viewsets.ModelViewSet):
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        return Notification.objects.filter(user=self.request.user)
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
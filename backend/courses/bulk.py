@@ -0,0 +1,225 @@
+"""Atomic bulk create/update/delete/reorder of a course's modules and contents.
+
+``bulk_create``/``bulk_update`` bypass model signals, so the course tree
+cache, search index and progress totals are refreshed here once per request.
+"""
+from django.db import transaction
+from rest_framework import serializers
+from . import search
+from .models import Module, Content
+from .signals import invalidate_course_tree
+
+MODULE_FIELDS = ['title', 'description', 'order']
+CONTENT_FIELDS = ['module', 'content_type', 'title', 'url', 'text_content', 'order']
+
+
+class BulkContentSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    module = serializers.IntegerField(required=False)
+    content_type = serializers.ChoiceField(choices=Content.ContentType.choices)
+    title = serializers.CharField(max_length=255)
+    url = serializers.URLField(required=False, allow_null=True, allow_blank=True)
+    text_content = serializers.CharField(required=False, allow_blank=True)
+    order = serializers.IntegerField(required=False, min_value=0)
+
+
+class BulkModuleSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True)
+    order = serializers.IntegerField(required=False, min_value=0)
+    contents = BulkContentSerializer(many=True, required=False)
+
+
+class BulkEditError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class BulkEdit:
+    """Validate and apply one bulk edit payload against ``course``.
+
+    Payload keys (all optional)::
+
+        modules:  {create: [...], update: [{id, ...}], delete: [id, ...]}
+        contents: {create: [{module, ...}], update: [{id, ...}], delete: [id, ...]}
+        order:    {modules: [id, ...], contents: {module_id: [id, ...]}}
+
+    Module create items may nest ``contents``. Every item is validated before
+    anything is written; per-item errors are raised together as BulkEditError.
+    """
+
+    def __init__(self, course, data):
+        self.course = course
+        self.data = data if isinstance(data, dict) else {}
+        self.errors = []
+        # One query each for the ids this course owns.
+        self.module_ids = set(Module.objects.filter(course=course).values_list('id', flat=True))
+        self.content_modules = dict(Content.objects.filter(module__course=course).values_list('id', 'module_id'))
+
+    def error(self, section, index, detail):
+        self.errors.append({'section': section, 'index': index, 'errors': detail})
+
+    def validate_items(self, section, items, serializer_class, partial=False, require_id=False):
+        if not isinstance(items, list):
+            self.error(section, None, 'Expected a list.')
+            return []
+        valid = []
+        for index, item in enumerate(items):
+            serializer = serializer_class(data=item, partial=partial)
+            if not serializer.is_valid():
+                self.error(section, index, serializer.errors)
+                continue
+            if require_id and 'id' not in serializer.validated_data:
+                self.error(section, index, {'id': ['This field is required.']})
+                continue
+            valid.append((index, serializer.validated_data))
+        return valid
+
+    def validate_ids(self, section, ids, known, detail='does not belong to this course.'):
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            self.error(section, None, 'Expected a list of ids.')
+            return []
+        for index, pk in enumerate(ids):
+            if pk not in known:
+                self.error(section, index, f'{pk} {detail}')
+        return ids
+
+    def validate(self):
+        modules = self.data.get('modules') or {}
+        contents = self.data.get('contents') or {}
+        order = self.data.get('order') or {}
+
+        self.module_creates = self.validate_items('modules.create', modules.get('create', []), BulkModuleSerializer)
+        self.module_updates = self.validate_items(
+            'modules.update', modules.get('update', []), BulkModuleSerializer, partial=True, require_id=True
+        )
+        self.module_deletes = set(self.validate_ids('modules.delete', modules.get('delete', []), self.module_ids))
+        self.content_creates = self.validate_items('contents.create', contents.get('create', []), BulkContentSerializer)
+        self.content_updates = self.validate_items(
+            'contents.update', contents.get('update', []), BulkContentSerializer, partial=True, require_id=True
+        )
+        self.content_deletes = set(self.validate_ids('contents.delete', contents.get('delete', []), self.content_modules))
+
+        live_modules = self.module_ids - self.module_deletes
+        for index, item in self.module_updates:
+            if item['id'] not in live_modules:
+                self.error('modules.update', index, f"{item['id']} is not a remaining module of this course.")
+        for index, item in self.content_creates:
+            if item.get('module') not in live_modules:
+                self.error('contents.create', index, {'module': ['Must be a remaining module of this course.']})
+        for index, item in self.content_updates:
+            if item['id'] not in self.content_modules or item['id'] in self.content_deletes:
+                self.error('contents.update', index, f"{item['id']} is not a remaining content of this course.")
+            elif item.get('module', self.content_modules[item['id']]) not in live_modules:
+                self.error('contents.update', index, {'module': ['Must be a remaining module of this course.']})
+
+        self.module_order = self.validate_ids(
+            'order.modules', order.get('modules', []), live_modules, 'is not a remaining module of this course.'
+        )
+        self.content_order = {}
+        content_order = order.get('contents', {})
+        if not isinstance(content_order, dict):
+            self.error('order.contents', None, 'Expected an object of module id to content ids.')
+            content_order = {}
+        # Where each remaining content will be once this edit's updates have moved it.
+        remaining_contents = {
+            pk: module_id for pk, module_id in self.content_modules.items() if pk not in self.content_deletes
+        }
+        for _, item in self.content_updates:
+            if item['id'] in remaining_contents and 'module' in item:
+                remaining_contents[item['id']] = item['module']
+        for key, ids in content_order.items():
+            section = f'order.contents.{key}'
+            if not str(key).isdigit() or int(key) not in live_modules:
+                self.error(section, None, f'{key} is not a remaining module of this course.')
+                continue
+            module_id = int(key)
+            in_module = {pk for pk, module in remaining_contents.items() if module == module_id}
+            self.content_order[module_id] = self.validate_ids(
+                section, ids, in_module, 'is not a remaining content of this module.'
+            )
+
+        if self.errors:
+            raise BulkEditError(self.errors)
+
+    @transaction.atomic
+    def apply(self):
+        from progress.models import CourseProgress
+
+        self.validate()
+        result = {
+            'modules': {'created': [], 'updated': 0, 'deleted': 0},
+            'contents': {'created': [], 'updated': 0, 'deleted': 0},
+            'reordered': 0,
+        }
+
+        # Deletes go through the ORM collector so cascades and progress signals still run.
+        if self.content_deletes:
+            Content.objects.filter(pk__in=self.content_deletes).delete()
+            result['contents']['deleted'] = len(self.content_deletes)
+        if self.module_deletes:
+            Module.objects.filter(pk__in=self.module_deletes).delete()
+            result['modules']['deleted'] = len(self.module_deletes)
+
+        new_modules = Module.objects.bulk_create([
+            Module(course=self.course, **{f: item[f] for f in MODULE_FIELDS if f in item})
+            for _, item in self.module_creates
+        ])
+        result['modules']['created'] = [module.pk for module in new_modules]
+
+        new_contents = [
+            Content(module_id=item['module'], **{f: item[f] for f in CONTENT_FIELDS[1:] if f in item})
+            for _, item in self.content_creates
+        ]
+        for module, (_, item) in zip(new_modules, self.module_creates):
+            new_contents += [
+                Content(module=module, **{f: nested[f] for f in CONTENT_FIELDS[1:] if f in nested})
+                for nested in item.get('contents', [])
+            ]
+        new_contents = Content.objects.bulk_create(new_contents)
+        result['contents']['created'] = [content.pk for content in new_contents]
+
+        changed_modules = self.update_rows(Module, self.module_updates, MODULE_FIELDS)
+        changed_contents = self.update_rows(Content, self.content_updates, CONTENT_FIELDS)
+        result['modules']['updated'] = len(self.module_updates)
+        result['contents']['updated'] = len(self.content_updates)
+        result['reordered'] = self.reorder()
+
+        if new_contents:
+            CourseProgress.objects.adjust_total(self.course.pk, len(new_contents))
+        search.index_documents(
+            [search.module_document(module) for module in new_modules + changed_modules]
+            + [search.content_document(content, self.course.pk) for content in new_contents + changed_contents]
+        )
+        invalidate_course_tree(self.course.pk)
+        return result
+
+    def update_rows(self, model, updates, allowed_fields):
+        if not updates:
+            return []
+        objects = model.objects.in_bulk([item['id'] for _, item in updates])
+        fields = set()
+        for _, item in updates:
+            obj = objects[item['id']]
+            for field in allowed_fields:
+                if field in item:
+                    setattr(obj, 'module_id' if field == 'module' else field, item[field])
+                    fields.add('module' if field == 'module' else field)
+        if fields:
+            model.objects.bulk_update(objects.values(), sorted(fields))
+        return list(objects.values())
+
+    def reorder(self):
+        modules = [Module(pk=pk, order=position) for position, pk in enumerate(self.module_order)]
+        contents = [
+            Content(pk=pk, order=position)
+            for ids in self.content_order.values()
+            for position, pk in enumerate(ids)
+        ]
+        if modules:
+            Module.objects.bulk_update(modules, ['order'])
+        if contents:
+            Content.objects.bulk_update(contents, ['order'])
+        return len(modules) + len(contents)
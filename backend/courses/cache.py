@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework.renderers import JSONRenderer
+
+
+def bump_course_version(*course_ids):
+    """Move ``Course.tree_version`` on, inside the writer's transaction.
+
+    The version lives on the course row rather than in the (per-process) cache,
+    so readers in every worker see it change together with the edited rows.
+    """
+    from .models import Course
+
+    Course.objects.filter(pk__in=course_ids).update(tree_version=F('tree_version') + 1)
+
+
+def get_course_tree(course_id, version, request):
+    """Return the pre-rendered JSON of the user-independent course tree."""
+    from .models import Course
+    from .serializers import CourseTreeSerializer
+
+    # Image URLs are absolute, so the rendered tree depends on the host it was built for.
+    key = f'course:{course_id}:tree:{version}:{request.scheme}://{request.get_host()}'
+    tree = cache.get(key)
+    if tree is None:
+        course = Course.objects.select_related('instructor').prefetch_related(
+            'modules__contents',
+            'modules__quiz__questions',
+            'modules__assignment',
+        ).get(pk=course_id)
+        tree = JSONRenderer().render(CourseTreeSerializer(course, context={'request': request}).data)
+        cache.set(key, tree, timeout=settings.COURSE_TREE_CACHE_TIMEOUT)
+    return tree
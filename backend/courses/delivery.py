@@ -0,0 +1,162 @@
+"""Protected, range-aware delivery of ``Content.file``.
+
+Access is checked once, when ``ContentViewSet.file_link`` issues a signed,
+short-lived URL. The media element then requests that URL as often as it
+likes (every seek is a new ``Range`` request) and each request only verifies
+the signature: no auth, enrollment or content lookup hits the database.
+
+Django streams the body in ``CONTENT_FILE_CHUNK_SIZE`` reads. Under ASGI the
+handler would collect a synchronous iterator into a list before sending it,
+so there the file is read through an async iterator instead.
+"""
+import mimetypes
+import os
+import re
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.core.files.storage import default_storage
+from django.http import (
+    Http404, HttpResponse, HttpResponseNotAllowed, HttpResponseNotModified, HttpResponseRedirect, StreamingHttpResponse,
+)
+from django.urls import reverse
+from django.utils.http import content_disposition_header, http_date, parse_etags, parse_http_date_safe
+
+SIGNING_SALT = 'courses.content-file'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def signed_file_url(request, content, user):
+    token = signing.dumps({'c': content.pk, 'u': user.pk, 'f': content.file.name}, salt=SIGNING_SALT, compress=True)
+    path = reverse('content-file', kwargs={'pk': content.pk})
+    return request.build_absolute_uri(f'{path}?token={token}')
+
+
+def parse_range(header, size):
+    """Return ``(start, end)`` inclusive for a single byte range, None to send the
+    whole file, or raise ValueError if the range cannot be satisfied."""
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        # Missing, malformed or multi-range: fall back to a full 200 response.
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError('empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError('range not satisfiable')
+    return start, end
+
+
+def file_chunks(path, start, length, chunk_size):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+async def async_file_chunks(path, start, length, chunk_size):
+    """``file_chunks`` for the ASGI handler: each read runs in a worker thread, one chunk at a time."""
+    f = await sync_to_async(open, thread_sensitive=False)(path, 'rb')
+    try:
+        f.seek(start)
+        while length > 0:
+            chunk = await sync_to_async(f.read, thread_sensitive=False)(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def offload_response(name, path):
+    mode = settings.CONTENT_FILE_DELIVERY
+    response = HttpResponse()
+    if mode == 'x-accel':
+        response['X-Accel-Redirect'] = settings.CONTENT_FILE_ACCEL_PREFIX + name
+    else:
+        response['X-Sendfile'] = path
+    # Let the proxy pick the type from the file it serves.
+    del response['Content-Type']
+    return response
+
+
+def serve_content_file(request, pk):
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    try:
+        payload = signing.loads(
+            request.GET.get('token', ''), salt=SIGNING_SALT, max_age=settings.CONTENT_FILE_LINK_MAX_AGE
+        )
+    except signing.BadSignature:
+        return HttpResponse('Invalid or expired file link.', status=403)
+    if payload['c'] != pk:
+        return HttpResponse('Invalid or expired file link.', status=403)
+
+    name = payload['f']
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        # Remote storage: the storage backend serves ranges itself.
+        return HttpResponseRedirect(default_storage.url(name))
+    if settings.CONTENT_FILE_DELIVERY != 'django':
+        return offload_response(name, path)
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('File not found.')
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = http_date(stat.st_mtime)
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return HttpResponseNotModified()
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    range_is_current = (
+        not if_range
+        or if_range == etag
+        or parse_http_date_safe(if_range) == int(stat.st_mtime)
+    )
+    if range_is_current:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    if request.method == 'HEAD':
+        response = HttpResponse(status=206 if byte_range else 200)
+    else:
+        chunks = async_file_chunks if isinstance(request, ASGIRequest) else file_chunks
+        response = StreamingHttpResponse(
+            chunks(path, start, length, settings.CONTENT_FILE_CHUNK_SIZE), status=206 if byte_range else 200
+        )
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    content_type, _ = mimetypes.guess_type(name)
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Content-Disposition'] = content_disposition_header(False, os.path.basename(name))
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
@@ -0,0 +1,153 @@
+"""Batched cohort enrollment and the denormalized ``Course`` enrollment counters."""
+from collections import Counter
+from datetime import timedelta
+from itertools import islice
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Course, Enrollment
+
+User = get_user_model()
+
+
+def recent_cutoff():
+    return timezone.now() - timedelta(days=settings.RECENT_ENROLLMENT_DAYS)
+
+
+def add_enrollments(course_id, count):
+    Course.objects.filter(pk=course_id).update(
+        enrollment_count=F('enrollment_count') + count,
+        recent_enrollment_count=F('recent_enrollment_count') + count,
+    )
+
+
+def remove_enrollment(course_id, enrolled_at):
+    Course.objects.filter(pk=course_id, enrollment_count__gt=0).update(enrollment_count=F('enrollment_count') - 1)
+    if enrolled_at >= recent_cutoff():
+        Course.objects.filter(pk=course_id, recent_enrollment_count__gt=0).update(
+            recent_enrollment_count=F('recent_enrollment_count') - 1
+        )
+
+
+def refresh_enrollment_counts(course_ids=None):
+    """Recompute both counters from Enrollment in a single UPDATE; returns rows touched."""
+    def count(enrollments):
+        return Coalesce(Subquery(
+            enrollments.filter(course=OuterRef('pk')).order_by().values('course').annotate(n=Count('pk')).values('n')
+        ), 0)
+
+    courses = Course.objects.all() if course_ids is None else Course.objects.filter(pk__in=course_ids)
+    return courses.update(
+        enrollment_count=count(Enrollment.objects.all()),
+        recent_enrollment_count=count(Enrollment.objects.filter(enrolled_at__gte=recent_cutoff())),
+    )
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def resolve_students(identifiers):
+    """Map user ids, usernames or emails to student ids with one query.
+
+    An identifier is tried as an id, then an email, then a username, so a
+    username that contains '@' still resolves.
+    """
+    identifiers = {str(ident).strip() for ident in identifiers if str(ident).strip()}
+    ids = {int(ident) for ident in identifiers if ident.isdigit()}
+    emails = {ident for ident in identifiers if '@' in ident}
+    students = User.objects.filter(role=User.Role.STUDENT).filter(
+        Q(pk__in=ids) | Q(email__in=emails) | Q(username__in=identifiers)
+    ).values_list('pk', 'username', 'email')
+
+    matches = {}
+    for pk, username, email in students:
+        for kind, key in (('id', str(pk)), ('email', email), ('username', username)):
+            matches.setdefault((kind, key), pk)
+    resolved = {}
+    for ident in identifiers:
+        for kind in ('id', 'email', 'username'):
+            if (kind, ident) in matches:
+                resolved[ident] = matches[kind, ident]
+                break
+    return resolved
+
+
+def existing_pairs(pairs):
+    student_ids = {student_id for student_id, _ in pairs}
+    course_ids = {course_id for _, course_id in pairs}
+    return set(
+        Enrollment.objects.filter(student_id__in=student_ids, course_id__in=course_ids)
+        .values_list('student_id', 'course_id')
+    ) & pairs
+
+
+def enroll_pairs(pairs, attempts=3):
+    """Enroll ``(student_id, course_id)`` pairs; returns ``(created, existing)``.
+
+    The insert runs in a savepoint and fails on a duplicate instead of skipping
+    it, so ``created`` (and the counter bump) is exactly what this call wrote:
+    if a concurrent enrollment takes one of the pairs between the read and the
+    insert, the savepoint is rolled back and the pairs are read again.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return 0, 0
+    while True:
+        existing = existing_pairs(pairs)
+        new = pairs - existing
+        try:
+            with transaction.atomic():
+                Enrollment.objects.bulk_create(
+                    [Enrollment(student_id=student_id, course_id=course_id) for student_id, course_id in new]
+                )
+            break
+        except IntegrityError:
+            attempts -= 1
+            if not attempts:
+                raise
+    # bulk_create skips the Enrollment signals, so bump the counters per course here.
+    for course_id, count in Counter(course_id for _, course_id in new).items():
+        add_enrollments(course_id, count)
+    return len(new), len(existing)
+
+
+def bulk_enroll(rows, courses=(), batch_size=1000, allowed_courses=None):
+    """Enroll students from an iterable of ``(student, course_id_or_None)`` rows.
+
+    Rows without a course are enrolled into every course in ``courses``. The
+    input is consumed in batches, each written in its own transaction, so a
+    file of any size is streamed rather than loaded.
+    """
+    courses = set(courses)
+    report = {'created': 0, 'existing': 0, 'unknown_students': [], 'unknown_courses': []}
+    for batch in batched(rows, batch_size):
+        students = resolve_students(student for student, _ in batch)
+        row_courses = {course_id for _, course_id in batch if course_id is not None} - courses
+        known_courses = courses | set(Course.objects.filter(pk__in=row_courses).values_list('pk', flat=True))
+        if allowed_courses is not None:
+            known_courses &= set(allowed_courses)
+
+        pairs = []
+        for student, course_id in batch:
+            student_id = students.get(str(student).strip())
+            if student_id is None:
+                report['unknown_students'].append(student)
+                continue
+            targets = courses if course_id is None else {course_id}
+            for target in targets:
+                if target in known_courses:
+                    pairs.append((student_id, target))
+                else:
+                    report['unknown_courses'].append(target)
+
+        with transaction.atomic():
+            created, existing = enroll_pairs(pairs)
+        report['created'] += created
+        report['existing'] += existing
+    return report
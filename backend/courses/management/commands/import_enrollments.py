@@ -0,0 +1,65 @@
+import csv
+import json
+from django.core.management.base import BaseCommand, CommandError
+from courses.enrollment import bulk_enroll
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Enroll a cohort from a CSV or NDJSON file of students (id, username or email)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV with a "student" column (and optional "course"), or NDJSON objects')
+        parser.add_argument('--course', type=int, action='append', dest='courses', default=[],
+                            help='Course id for rows without a course column (repeatable)')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        courses = set(options['courses'])
+        missing = courses - set(Course.objects.filter(pk__in=courses).values_list('pk', flat=True))
+        if missing:
+            raise CommandError(f'Unknown course ids: {sorted(missing)}')
+
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = self.read_ndjson(f) if fmt == 'ndjson' else self.read_csv(f)
+            report = bulk_enroll(rows, courses=courses, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} enrollments, {report['existing']} already existed"
+        ))
+        for key in ('unknown_students', 'unknown_courses'):
+            if report[key]:
+                unique = list(dict.fromkeys(report[key]))
+                self.stdout.write(self.style.WARNING(f"{len(unique)} {key.replace('_', ' ')}: {unique[:20]}"))
+
+    def read_csv(self, f):
+        reader = csv.DictReader(f)
+        if 'student' not in (reader.fieldnames or []):
+            raise CommandError('CSV input needs a "student" column')
+        for row in reader:
+            if row['student'] is None:
+                raise CommandError(f'Line {reader.line_num}: missing "student" value')
+            yield row['student'], self.course_id(row.get('course'), reader.line_num)
+
+    def read_ndjson(self, f):
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise CommandError(f'Line {line_number}: {e}')
+            if not isinstance(row, dict) or 'student' not in row:
+                raise CommandError(f'Line {line_number}: expected an object with a "student" key')
+            yield row['student'], self.course_id(row.get('course'), line_number)
+
+    def course_id(self, value, line_number):
+        if value in (None, ''):
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise CommandError(f'Line {line_number}: course must be a course id, got {value!r}')
@@ -1,7 +1,11 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from courses.models import Course, Enrollment
+from django.db import transaction
+from courses.enrollment import enroll_pairs
+from courses.models import Course, Content, Enrollment
 from progress.models import Progress
+from collections import defaultdict
 import random
 
 User = get_user_model()
@@ -24,46 +28,38 @@ class Command(BaseCommand):
 
         self.stdout.write(f'Found {students.count()} students and {courses.count()} courses')
 
-        enrollments_created = 0
-        progress_created = 0
+        course_ids = list(courses.values_list('pk', flat=True))
+        content_by_course = defaultdict(list)
+        for content_id, course_id in Content.objects.values_list('pk', 'module__course_id'):
+            content_by_course[course_id].append(content_id)
 
-        for student in students:
-            # Enroll each student in 2-5 random courses
-            num_enrollments = random.randint(2, min(5, courses.count()))
-            selected_courses = random.sample(list(courses), num_enrollments)
+        # Enroll each student in 2-5 random courses
+        pairs = set()
+        for student_id in students.values_list('pk', flat=True):
+            num_enrollments = random.randint(2, min(5, len(course_ids)))
+            pairs.update((student_id, course_id) for course_id in random.sample(course_ids, num_enrollments))
+        already = set(Enrollment.objects.values_list('student_id', 'course_id')) & pairs
+        new_pairs = pairs - already
 
-            for course in selected_courses:
-                # Create enrollment if it doesn't exist
-                enrollment, created = Enrollment.objects.get_or_create(
-                    student=student,
-                    course=course
-                )
-                
-                if created:
-                    enrollments_created += 1
-                    self.stdout.write(f'Enrolled {student.username} in {course.title}')
+        progress = []
+        for student_id, course_id in new_pairs:
+            all_content = content_by_course[course_id]
+            if all_content:
+                # Mark 30-70% of content as completed
+                completion_rate = random.uniform(0.3, 0.7)
+                num_to_complete = int(len(all_content) * completion_rate)
+                progress += [
+                    Progress(user_id=student_id, content_id=content_id, is_completed=True)
+                    for content_id in random.sample(all_content, num_to_complete)
+                ]
 
-                    # Create random progress for this enrollment
-                    # Get all content items in this course
-                    all_content = []
-                    for module in course.modules.all():
-                        all_content.extend(module.contents.all())
-
-                    if all_content:
-                        # Mark 30-70% of content as completed
-                        completion_rate = random.uniform(0.3, 0.7)
-                        num_to_complete = int(len(all_content) * completion_rate)
-                        completed_content = random.sample(all_content, num_to_complete)
-
-                        for content in completed_content:
-                            progress, prog_created = Progress.objects.get_or_create(
-                                user=student,
-                                content=content,
-                                defaults={'is_completed': True}
-                            )
-                            if prog_created:
-                                progress_created += 1
+        with transaction.atomic():
+            enrollments_created, _ = enroll_pairs(new_pairs)
+            Progress.objects.bulk_create(progress, batch_size=1000, ignore_conflicts=True)
+        progress_created = len(progress)
 
         self.stdout.write(self.style.SUCCESS(
             f'Successfully created {enrollments_created} enrollments and {progress_created} progress records'
         ))
+        # Progress rows above bypass the API, so refresh the per-course summaries.
+        call_command('rebuild_course_progress', stdout=self.stdout)
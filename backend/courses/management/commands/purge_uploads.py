@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from courses.uploads import purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete unfinished chunked uploads and their part files (schedule daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, help='Age in hours (default CHUNKED_UPLOAD_EXPIRY_HOURS)')
+
+    def handle(self, *args, **options):
+        purged = purge_stale_uploads(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} stale uploads'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from courses import search
+from courses.models import Course, Module, Content
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for courses, modules and contents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError('Full-text indexing requires the SQLite backend with FTS5.')
+        batch_size = options['batch_size']
+
+        sources = [
+            ('courses', Course.objects.only('id', 'title', 'description'), search.course_document),
+            ('modules', Module.objects.only('id', 'course_id', 'title', 'description'), search.module_document),
+            ('contents', Content.objects.only('id', 'title', 'text_content', 'module__course_id').select_related('module'),
+             lambda content: search.content_document(content, content.module.course_id)),
+        ]
+        with transaction.atomic():
+            search.clear_index()
+            for label, queryset, to_document in sources:
+                count, batch = 0, []
+                for obj in queryset.order_by().iterator(chunk_size=batch_size):
+                    batch.append(to_document(obj))
+                    if len(batch) >= batch_size:
+                        search.index_documents(batch)
+                        count += len(batch)
+                        batch = []
+                search.index_documents(batch)
+                count += len(batch)
+                self.stdout.write(f'Indexed {count} {label}')
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
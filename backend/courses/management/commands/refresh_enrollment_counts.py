@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from courses.enrollment import refresh_enrollment_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute Course.enrollment_count and recent_enrollment_count (schedule daily to age the recent window)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='courses', help='Limit to this course id (repeatable)')
+
+    def handle(self, *args, **options):
+        updated = refresh_enrollment_counts(options['courses'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed enrollment counts for {updated} courses'))
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:02
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def backfill_counts(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+
+    def count(enrollments):
+        return Coalesce(Subquery(
+            enrollments.filter(course=OuterRef('pk')).order_by().values('course').annotate(n=Count('pk')).values('n')
+        ), 0)
+
+    cutoff = timezone.now() - timedelta(days=settings.RECENT_ENROLLMENT_DAYS)
+    Course.objects.update(
+        enrollment_count=count(Enrollment.objects.all()),
+        recent_enrollment_count=count(Enrollment.objects.filter(enrolled_at__gte=cutoff)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='recent_enrollment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['enrollment_count', 'id'], name='course_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['recent_enrollment_count', 'id'], name='course_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['price', 'id'], name='course_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['instructor', 'created_at', 'id'], name='course_instructor_idx'),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_enrollment_course_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='tree_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,6 +1,36 @@
+import uuid
 from django.db import models
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
 
+class CourseQuerySet(models.QuerySet):
+    def with_user_state(self, user):
+        """Annotate enrollment status, content count and progress counts for ``user``.
+
+        Each value is computed by a correlated subquery (progress is a single
+        ``CourseProgress`` row lookup), so the catalog is served without
+        per-course lookups in the serializer.
+        """
+        from progress.models import CourseProgress
+
+        content_count = Content.objects.filter(module__course=OuterRef('pk')).order_by().values('module__course').annotate(c=Count('pk')).values('c')
+        queryset = self.annotate(content_count=Coalesce(Subquery(content_count, output_field=IntegerField()), 0))
+
+        if user is None or not user.is_authenticated:
+            return queryset.annotate(
+                user_is_enrolled=Value(False),
+                completed_count=Value(0, output_field=IntegerField()),
+                progress_total=Value(0, output_field=IntegerField()),
+            )
+
+        progress = CourseProgress.objects.filter(user=user, course=OuterRef('pk'))
+        return queryset.annotate(
+            user_is_enrolled=Exists(Enrollment.objects.filter(student=user, course=OuterRef('pk'))),
+            completed_count=Coalesce(Subquery(progress.values('completed_count')[:1]), 0),
+            progress_total=Coalesce(Subquery(progress.values('total_count')[:1]), 0),
+        )
+
 class Course(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
@@ -8,6 +38,34 @@ class Course(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     image = models.ImageField(upload_to='course_images/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized counters, kept current by the Enrollment signals in courses.signals;
+    # refresh_enrollment_counts repairs them and ages the recent window.
+    enrollment_count = models.PositiveIntegerField(default=0)
+    recent_enrollment_count = models.PositiveIntegerField(default=0)
+    # Bumped by courses.signals whenever anything in the course tree changes; the cached
+    # tree and the ETag are keyed on it, so every worker sees an edit on its next read.
+    tree_version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = CourseQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='course_created_idx'),
+            models.Index(fields=['enrollment_count', 'id'], name='course_popular_idx'),
+            models.Index(fields=['recent_enrollment_count', 'id'], name='course_trending_idx'),
+            models.Index(fields=['price', 'id'], name='course_price_idx'),
+            models.Index(fields=['instructor', 'created_at', 'id'], name='course_instructor_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # tree_version only moves through bump_course_version(); an instance loaded
+        # before an edit elsewhere in the tree must not write its old value back.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'tree_version'
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -51,6 +109,29 @@ class Enrollment(models.Model):
 
     class Meta:
         unique_together = ('student', 'course')
+        indexes = [
+            models.Index(fields=['course', 'enrolled_at'], name='enrollment_course_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.username} enrolled in {self.course.title}"
+
+class ChunkedUpload(models.Model):
+    """A file being sent in resumable chunks; see courses.uploads."""
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        COMPLETE = 'COMPLETE', 'Complete'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    file = models.CharField(max_length=255, blank=True)  # storage name once complete
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
@@ -0,0 +1,128 @@
+"""Full-text search over courses, modules and lesson content.
+
+On SQLite the index is an FTS5 virtual table kept in sync by the signals in
+``courses.signals``. Each indexed object gets a stable rowid derived from its
+kind and primary key, so updates and deletes are single rowid lookups.
+"""
+import re
+from django.db import connection
+from django.db.models import Q
+
+INDEX_TABLE = 'courses_search_index'
+
+KIND_CODES = {'course': 1, 'module': 2, 'content': 3}
+KINDS = {code: kind for kind, code in KIND_CODES.items()}
+
+CREATE_INDEX_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+    "course_id UNINDEXED, title, body, tokenize='porter unicode61')"
+)
+DROP_INDEX_SQL = f"DROP TABLE IF EXISTS {INDEX_TABLE}"
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def make_rowid(kind, object_id):
+    return object_id * 4 + KIND_CODES[kind]
+
+
+def course_document(course):
+    return make_rowid('course', course.pk), course.pk, course.title, course.description
+
+
+def module_document(module):
+    return make_rowid('module', module.pk), module.course_id, module.title, module.description
+
+
+def content_document(content, course_id):
+    return make_rowid('content', content.pk), course_id, content.title, content.text_content
+
+
+def index_documents(documents):
+    """Insert or replace ``(rowid, course_id, title, body)`` tuples."""
+    if not is_supported():
+        return
+    documents = list(documents)
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {INDEX_TABLE} WHERE rowid = %s", [(doc[0],) for doc in documents])
+        cursor.executemany(
+            f"INSERT INTO {INDEX_TABLE} (rowid, course_id, title, body) VALUES (%s, %s, %s, %s)", documents
+        )
+
+
+def remove_document(kind, object_id):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE rowid = %s", [make_rowid(kind, object_id)])
+
+
+def clear_index():
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {INDEX_TABLE}")
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    terms = re.findall(r'\w+', text)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search(text, limit=20, course_id=None):
+    """Return ranked hits as dicts with kind, id, course_id, title, snippet and rank."""
+    if not is_supported():
+        return fallback_search(text, limit, course_id)
+    match = build_match_query(text)
+    if not match:
+        return []
+
+    sql = (
+        f"SELECT rowid, course_id, highlight({INDEX_TABLE}, 1, '<mark>', '</mark>'), "
+        f"snippet({INDEX_TABLE}, 2, '<mark>', '</mark>', '…', 16), "
+        f"bm25({INDEX_TABLE}, 0.0, 10.0, 1.0) AS rank "
+        f"FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s"
+    )
+    params = [match]
+    if course_id is not None:
+        sql += " AND course_id = %s"
+        params.append(course_id)
+    sql += " ORDER BY rank LIMIT %s"
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        {
+            'kind': KINDS[rowid % 4],
+            'id': rowid // 4,
+            'course_id': int(hit_course_id),
+            'title': title,
+            'snippet': snippet,
+            'rank': rank,
+        }
+        for rowid, hit_course_id, title, snippet, rank in rows
+    ]
+
+
+def fallback_search(text, limit, course_id):
+    """Unranked substring search for databases without FTS5."""
+    from .models import Course, Module, Content
+
+    courses = Course.objects.filter(Q(title__icontains=text) | Q(description__icontains=text))
+    modules = Module.objects.filter(title__icontains=text)
+    contents = Content.objects.filter(Q(title__icontains=text) | Q(text_content__icontains=text))
+    if course_id is not None:
+        courses = courses.filter(pk=course_id)
+        modules = modules.filter(course_id=course_id)
+        contents = contents.filter(module__course_id=course_id)
+
+    hits = [{'kind': 'course', 'id': c.pk, 'course_id': c.pk, 'title': c.title} for c in courses[:limit]]
+    hits += [{'kind': 'module', 'id': m.pk, 'course_id': m.course_id, 'title': m.title} for m in modules[:limit]]
+    hits += [
+        {'kind': 'content', 'id': c.pk, 'course_id': c.module.course_id, 'title': c.title}
+        for c in contents.select_related('module')[:limit]
+    ]
+    return [dict(hit, snippet='', rank=0.0) for hit in hits[:limit]]
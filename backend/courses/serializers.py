@@ -1,7 +1,40 @@
 from rest_framework import serializers
-from .models import Course, Module, Content, Enrollment
+from django.conf import settings
+from .models import Course, Module, Content, Enrollment, ChunkedUpload
 from users.serializers import UserSerializer
-from assessments.serializers import QuizSerializer, AssignmentSerializer
+from assessments.serializers import StudentQuizSerializer, AssignmentSerializer
+
+def parse_field_list(request, param):
+    """Return the comma-separated names in ``?<param>=`` as a set, or None if absent."""
+    if request is None:
+        return None
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+class FieldSelectionMixin:
+    """Honour ``?fields=`` and ``?expand=`` on the top-level serializer.
+
+    ``fields`` keeps only the listed fields. Fields named in
+    ``Meta.expandable_fields`` are left out unless listed in ``expand``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+
+        expand = parse_field_list(request, 'expand') or set()
+        for name in getattr(self.Meta, 'expandable_fields', ()):
+            if name not in expand:
+                self.fields.pop(name, None)
+
+        fields = parse_field_list(request, 'fields')
+        if fields:
+            for name in set(self.fields) - fields - expand:
+                self.fields.pop(name)
 
 class ContentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,14 +43,26 @@ class ContentSerializer(serializers.ModelSerializer):
 
 class ModuleSerializer(serializers.ModelSerializer):
     contents = ContentSerializer(many=True, read_only=True)
-    quiz = QuizSerializer(read_only=True)
+    quiz = StudentQuizSerializer(read_only=True)
     assignment = AssignmentSerializer(read_only=True)
 
     class Meta:
         model = Module
         fields = '__all__'
 
-class CourseSerializer(serializers.ModelSerializer):
+class ContentSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Content
+        fields = ['id', 'title', 'content_type', 'order']
+
+class ModuleSummarySerializer(serializers.ModelSerializer):
+    contents = ContentSummarySerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Module
+        fields = ['id', 'title', 'order', 'contents']
+
+class CourseSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     instructor = UserSerializer(read_only=True)
     modules = ModuleSerializer(many=True, read_only=True)
     is_enrolled = serializers.SerializerMethodField()
@@ -25,33 +70,68 @@ class CourseSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Course
-        fields = '__all__'
+        # Popularity counters change on every enrollment; only the catalog summary shows them.
+        exclude = ('enrollment_count', 'recent_enrollment_count', 'tree_version')
 
     def get_is_enrolled(self, obj):
+        if hasattr(obj, 'user_is_enrolled'):
+            return obj.user_is_enrolled
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Enrollment.objects.filter(student=request.user, course=obj).exists()
         return False
 
     def get_progress(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            # Simple progress calculation: completed contents / total contents
-            # This is a bit expensive for a list view, but okay for MVP
-            from progress.models import Progress
-            total_content = 0
-            for module in obj.modules.all():
-                total_content += module.contents.count()
-            
-            if total_content == 0:
+        # Counts are annotated from CourseProgress by Course.objects.with_user_state();
+        # fall back to the row lookup for instances that did not come from the viewset queryset.
+        if hasattr(obj, 'completed_count'):
+            completed_content, total_content = obj.completed_count, obj.progress_total
+        else:
+            request = self.context.get('request')
+            if not (request and request.user.is_authenticated):
                 return 0
-            
-            completed_content = Progress.objects.filter(user=request.user, content__module__course=obj, is_completed=True).count()
-            return (completed_content / total_content) * 100
-        return 0
+            from progress.models import CourseProgress
+            course_progress = CourseProgress.objects.filter(user=request.user, course=obj).first()
+            return course_progress.percent if course_progress else 0
+
+        if total_content == 0:
+            return 0
+        return (completed_content / total_content) * 100
+
+class CourseTreeSerializer(CourseSerializer):
+    """User-independent part of CourseSerializer, pre-rendered by courses.cache."""
+    is_enrolled = None
+    progress = None
+
+class CourseSummarySerializer(CourseSerializer):
+    """Catalog representation: course fields only, with a module outline on ``?expand=modules``."""
+    modules = ModuleSummarySerializer(many=True, read_only=True)
+    content_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Course
+        fields = ['id', 'title', 'description', 'instructor', 'price', 'image', 'created_at',
+                  'enrollment_count', 'is_enrolled', 'progress', 'content_count', 'modules']
+        expandable_fields = ('modules',)
 
 class EnrollmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Enrollment
         fields = '__all__'
         read_only_fields = ('student', 'enrolled_at')
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ['id', 'filename', 'size', 'received', 'status', 'sha256', 'file', 'chunk_size', 'created_at', 'completed_at']
+        read_only_fields = ('received', 'status', 'sha256', 'file', 'created_at', 'completed_at')
+
+    def get_chunk_size(self, obj):
+        return settings.CHUNKED_UPLOAD_CHUNK_SIZE
+
+    def validate_size(self, value):
+        if value > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'Files may be at most {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes.')
+        return value
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from assessments.models import Quiz, Question, Assignment
+from . import search
+from .cache import bump_course_version
+from .enrollment import add_enrollments, remove_enrollment
+from .models import Course, Module, Content, Enrollment
+
+
+def invalidate_course_tree(course_id):
+    if course_id is not None:
+        bump_course_version(course_id)
+
+
+def module_course_id(module_id):
+    return Module.objects.filter(pk=module_id).values_list('course_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Course)
+def course_changed(sender, instance, **kwargs):
+    invalidate_course_tree(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Module)
+def module_changed(sender, instance, **kwargs):
+    invalidate_course_tree(instance.course_id)
+
+
+@receiver([post_save, post_delete], sender=Content)
+@receiver([post_save, post_delete], sender=Quiz)
+@receiver([post_save, post_delete], sender=Assignment)
+def module_child_changed(sender, instance, **kwargs):
+    invalidate_course_tree(module_course_id(instance.module_id))
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    course_id = Quiz.objects.filter(pk=instance.quiz_id).values_list('module__course_id', flat=True).first()
+    invalidate_course_tree(course_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def instructor_changed(sender, instance, created, update_fields=None, **kwargs):
+    # The tree embeds the instructor's profile; logins only touch last_login.
+    if not created and update_fields != frozenset({'last_login'}):
+        bump_course_version(*Course.objects.filter(instructor=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, **kwargs):
+    search.index_documents([search.course_document(instance)])
+
+
+@receiver(post_save, sender=Module)
+def index_module(sender, instance, **kwargs):
+    search.index_documents([search.module_document(instance)])
+
+
+@receiver(post_save, sender=Content)
+def index_content(sender, instance, **kwargs):
+    search.index_documents([search.content_document(instance, module_course_id(instance.module_id))])
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Content)
+def unindex(sender, instance, **kwargs):
+    search.remove_document(sender._meta.model_name, instance.pk)
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_added(sender, instance, created, **kwargs):
+    if created:
+        add_enrollments(instance.course_id, 1)
+
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_removed(sender, instance, **kwargs):
+    remove_enrollment(instance.course_id, instance.enrolled_at)
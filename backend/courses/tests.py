@@ -1,3 +1,648 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+from asgiref.sync import async_to_sync
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+from assessments.models import Quiz, Question, Assignment, Submission
+from progress.models import Progress, CourseProgress
+from . import search
+from .cache import bump_course_version
+from .enrollment import enroll_pairs, existing_pairs, resolve_students
+from .models import Course, Module, Content, Enrollment, ChunkedUpload
 
-# Create your tests here.
+User = get_user_model()
+
+
+class CourseQueryCountTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.student = User.objects.create_user(username='learner', password='pass1234')
+        self.client.force_authenticate(self.student)
+
+    def create_course(self, title):
+        course = Course.objects.create(title=title, description='About ' + title, instructor=self.instructor, price=10)
+        for m in range(2):
+            module = Module.objects.create(course=course, title=f'{title} module {m}', order=m)
+            contents = [
+                Content.objects.create(module=module, content_type='TEXT', title=f'Lesson {c}', text_content='...', order=c)
+                for c in range(3)
+            ]
+            quiz = Quiz.objects.create(module=module, title='Quiz')
+            Question.objects.create(quiz=quiz, text='Q1', options=['a', 'b'], correct_answer=0)
+            Assignment.objects.create(module=module, title='Homework', description='Do it')
+        Enrollment.objects.create(student=self.student, course=course)
+        Progress.objects.create(user=self.student, content=contents[0], is_completed=True)
+        CourseProgress.objects.record_completion(self.student, contents[0].id)
+        return course
+
+    def test_list_query_count_is_constant(self):
+        self.create_course('First')
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/courses/')
+        self.assertEqual(response.status_code, 200)
+
+        for i in range(5):
+            self.create_course(f'Extra {i}')
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/courses/')
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_expanded_list_query_count_is_constant(self):
+        for i in range(3):
+            self.create_course(f'Course {i}')
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/courses/?expand=modules')
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_query_count(self):
+        course = self.create_course('Detail')
+        with self.assertNumQueries(8):
+            response = self.client.get(f'/api/courses/{course.id}/')
+        self.assertEqual(response.status_code, 200)
+
+        # Warm tree cache: only the annotated course row and the analytics event.
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/courses/{course.id}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_annotated_enrollment_and_progress(self):
+        course = self.create_course('Progress')
+        Course.objects.create(title='Other', description='Not enrolled', instructor=self.instructor)
+
+        response = self.client.get('/api/courses/')
+        by_id = {c['id']: c for c in response.data['results']}
+        self.assertTrue(by_id[course.id]['is_enrolled'])
+        self.assertAlmostEqual(by_id[course.id]['progress'], 100 / 6)
+        other = next(c for c in response.data['results'] if c['id'] != course.id)
+        self.assertFalse(other['is_enrolled'])
+        self.assertEqual(other['progress'], 0)
+
+
+class CourseRepresentationTests(APITestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.course = Course.objects.create(title='Python', description='Learn Python', instructor=self.instructor)
+        module = Module.objects.create(course=self.course, title='Basics', description='Long module text')
+        Content.objects.create(module=module, content_type='TEXT', title='Variables', text_content='Long lesson body')
+
+    def test_list_is_summary_without_tree(self):
+        response = self.client.get('/api/courses/')
+        course = response.data['results'][0]
+        self.assertNotIn('modules', course)
+        self.assertEqual(course['content_count'], 1)
+        self.assertEqual(course['description'], 'Learn Python')
+
+    def test_list_expand_modules_outline(self):
+        response = self.client.get('/api/courses/?expand=modules')
+        module = response.data['results'][0]['modules'][0]
+        self.assertEqual(module['title'], 'Basics')
+        self.assertNotIn('description', module)
+        self.assertEqual(module['contents'][0]['title'], 'Variables')
+        self.assertNotIn('text_content', module['contents'][0])
+
+    def test_list_sparse_fields(self):
+        response = self.client.get('/api/courses/?fields=id,title')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+
+    def test_retrieve_keeps_full_tree(self):
+        response = self.client.get(f'/api/courses/{self.course.id}/')
+        content = response.json()['modules'][0]['contents'][0]
+        self.assertEqual(content['text_content'], 'Long lesson body')
+
+    def test_retrieve_sparse_fields(self):
+        response = self.client.get(f'/api/courses/{self.course.id}/?fields=title,modules')
+        self.assertEqual(set(response.data), {'title', 'modules'})
+
+
+class CoursePaginationTests(APITestCase):
+    def setUp(self):
+        instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        Course.objects.bulk_create(
+            Course(title=f'Course {i}', description='...', instructor=instructor) for i in range(30)
+        )
+
+    def test_cursor_pages_cover_catalog_without_count(self):
+        response = self.client.get('/api/courses/')
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 24)
+
+        response_2 = self.client.get(response.data['next'])
+        self.assertEqual(len(response_2.data['results']), 6)
+        self.assertIsNone(response_2.data['next'])
+        seen = {c['id'] for c in response.data['results']} | {c['id'] for c in response_2.data['results']}
+        self.assertEqual(len(seen), 30)
+
+    def test_page_size_param(self):
+        response = self.client.get('/api/courses/?page_size=5')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_pages_walk_past_a_thousand_tied_rows(self):
+        instructor = User.objects.get(username='teacher')
+        Course.objects.bulk_create(
+            Course(title=f'Tied {i}', description='...', instructor=instructor, price=10) for i in range(1200)
+        )
+        for ordering in ('price', '-price'):
+            seen = []
+            url = f'/api/courses/?ordering={ordering}&page_size=100'
+            while url:
+                response = self.client.get(url)
+                seen += [c['id'] for c in response.data['results']]
+                url = response.data['next']
+            self.assertEqual(len(seen), 1230)
+            self.assertEqual(len(set(seen)), 1230)
+
+        # Walking back from the last page returns the same rows.
+        response = self.client.get('/api/courses/?ordering=price&page_size=500')
+        last = self.client.get(self.client.get(response.data['next']).data['next'])
+        previous = self.client.get(last.data['previous'])
+        self.assertEqual([c['id'] for c in previous.data['results']],
+                         [c['id'] for c in self.client.get(response.data['next']).data['results']])
+
+
+class CourseTreeCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.student = User.objects.create_user(username='learner', password='pass1234')
+        self.course = Course.objects.create(title='Python', description='Learn Python', instructor=self.instructor)
+        self.module = Module.objects.create(course=self.course, title='Basics')
+        self.content = Content.objects.create(module=self.module, content_type='TEXT', title='Variables')
+        self.client.force_authenticate(self.student)
+        self.url = f'/api/courses/{self.course.id}/'
+
+    def test_cached_tree_merges_user_fields(self):
+        self.client.get(self.url)
+        Enrollment.objects.create(student=self.student, course=self.course)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        data = response.json()
+        self.assertTrue(data['is_enrolled'])
+        self.assertEqual(data['progress'], 0)
+        self.assertEqual(data['modules'][0]['contents'][0]['title'], 'Variables')
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_edits_invalidate_tree_and_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        quiz = Quiz.objects.create(module=self.module, title='Check')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['modules'][0]['quiz']['title'], 'Check')
+
+        etag = response['ETag']
+        Question.objects.create(quiz=quiz, text='2 + 2?', options=['3', '4'], correct_answer=1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['modules'][0]['quiz']['questions'][0]['text'], '2 + 2?')
+
+        self.content.title = 'Names'
+        self.content.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['modules'][0]['contents'][0]['title'], 'Names')
+
+    def test_edit_in_another_worker_is_seen(self):
+        etag = self.client.get(self.url)['ETag']
+        # Another worker's edit: the rows and the version change, this process's cache is untouched.
+        Content.objects.filter(pk=self.content.pk).update(title='Names')
+        bump_course_version(self.course.pk)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['modules'][0]['contents'][0]['title'], 'Names')
+
+    def test_progress_change_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.post('/api/progress/progress/mark_complete/', {'content_id': self.content.id})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['progress'], 100)
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.course = Course.objects.create(title='Python Programming', description='Learn to code', instructor=instructor)
+        self.module = Module.objects.create(course=self.course, title='Data structures')
+        self.content = Content.objects.create(
+            module=self.module, content_type='TEXT', title='Dictionaries',
+            text_content='A dictionary maps hashable keys to values in constant time.',
+        )
+
+    def search(self, q, **params):
+        return self.client.get('/api/search/', {'q': q, **params}).data['results']
+
+    def test_ranked_hits_with_snippets(self):
+        results = self.search('hashable keys')
+        self.assertEqual([(r['kind'], r['id']) for r in results], [('content', self.content.id)])
+        self.assertIn('<mark>hashable</mark>', results[0]['snippet'])
+        self.assertEqual(results[0]['course_id'], self.course.id)
+
+        kinds = {r['kind'] for r in self.search('program')}
+        self.assertEqual(kinds, {'course'})
+
+    def test_index_follows_edits_and_deletes(self):
+        self.content.text_content = 'Sets hold unique members.'
+        self.content.save()
+        self.assertEqual(self.search('hashable'), [])
+        self.assertEqual(len(self.search('unique')), 1)
+
+        self.module.delete()
+        self.assertEqual(self.search('unique'), [])
+        self.assertEqual(self.search('structures'), [])
+
+    def test_rebuild_command(self):
+        search.clear_index()
+        self.assertEqual(self.search('dictionaries'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('dictionaries')), 1)
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('"NEAR( OR'), [])
+        self.assertEqual(self.client.get('/api/search/').status_code, 400)
+
+
+class BulkEditTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.course = Course.objects.create(title='Python', description='...', instructor=self.instructor)
+        self.module = Module.objects.create(course=self.course, title='Basics', order=0)
+        self.contents = [
+            Content.objects.create(module=self.module, content_type='TEXT', title=f'Lesson {i}', order=i)
+            for i in range(3)
+        ]
+        self.url = f'/api/courses/{self.course.id}/bulk/'
+        self.client.force_authenticate(self.instructor)
+
+    def test_import_nested_course_in_one_request(self):
+        payload = {'modules': {'create': [
+            {'title': f'Week {w}', 'order': w, 'contents': [
+                {'title': f'Lesson {w}.{c}', 'content_type': 'TEXT', 'text_content': 'Closures', 'order': c}
+                for c in range(20)
+            ]}
+            for w in range(10)
+        ]}}
+        with self.assertNumQueries(12):
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['modules']['created']), 10)
+        self.assertEqual(len(response.data['contents']['created']), 200)
+        self.assertEqual(Content.objects.filter(module__course=self.course).count(), 203)
+        self.assertEqual(len(self.client.get('/api/search/', {'q': 'closures', 'limit': 50}).data['results']), 50)
+
+    def test_update_delete_and_reorder(self):
+        first, second, third = self.contents
+        self.client.get(f'/api/courses/{self.course.id}/')
+        response = self.client.post(self.url, {
+            'contents': {'update': [{'id': first.id, 'title': 'Intro'}], 'delete': [second.id]},
+            'order': {'contents': {str(self.module.id): [third.id, first.id]}},
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        tree = self.client.get(f'/api/courses/{self.course.id}/').json()
+        self.assertEqual([c['title'] for c in tree['modules'][0]['contents']], ['Lesson 2', 'Intro'])
+
+    def test_per_item_errors_roll_back_everything(self):
+        other = Course.objects.create(title='Other', description='...', instructor=self.instructor)
+        foreign = Module.objects.create(course=other, title='Foreign')
+        response = self.client.post(self.url, {
+            'modules': {'create': [{'title': 'Fine'}]},
+            'contents': {'create': [
+                {'module': self.module.id, 'title': 'Ok', 'content_type': 'TEXT'},
+                {'module': foreign.id, 'title': 'Elsewhere', 'content_type': 'TEXT'},
+                {'module': self.module.id, 'content_type': 'AUDIO'},
+            ]},
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(e['section'], e['index']) for e in response.data['errors']],
+                         [('contents.create', 2), ('contents.create', 1)])
+        self.assertFalse(Module.objects.filter(title='Fine').exists())
+
+    def test_order_only_covers_remaining_modules_and_their_contents(self):
+        first, second, third = self.contents
+        week = Module.objects.create(course=self.course, title='Week 2', order=1)
+        moved = Content.objects.create(module=week, content_type='TEXT', title='Moved')
+        response = self.client.post(self.url, {
+            'modules': {'delete': [week.id]},
+            'contents': {'delete': [second.id]},
+            'order': {
+                'modules': [week.id, self.module.id],
+                'contents': {str(self.module.id): [third.id, second.id, moved.id], str(week.id): [moved.id]},
+            },
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(e['section'], e['index']) for e in response.data['errors']], [
+            ('order.modules', 0),
+            (f'order.contents.{self.module.id}', 1),
+            (f'order.contents.{self.module.id}', 2),
+            (f'order.contents.{week.id}', None),
+        ])
+        self.assertTrue(Module.objects.filter(pk=week.pk).exists())
+
+        # A content moved by this edit is ordered under its new module.
+        response = self.client.post(self.url, {
+            'contents': {'update': [{'id': moved.id, 'module': self.module.id}]},
+            'order': {'contents': {str(self.module.id): [moved.id, first.id, second.id, third.id]}},
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(self.module.contents.order_by('order').values_list('pk', flat=True)),
+                         [moved.id, first.id, second.id, third.id])
+
+    def test_only_course_instructor(self):
+        other = User.objects.create_user(username='other', password='pass1234', role='INSTRUCTOR')
+        self.client.force_authenticate(other)
+        response = self.client.post(self.url, {'modules': {'delete': [self.module.id]}}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class ContentFileDeliveryTests(APITestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        os.makedirs(os.path.join(self.media, 'course_content'))
+        self.body = bytes(range(256)) * 1024
+        with open(os.path.join(self.media, 'course_content', 'lecture.mp4'), 'wb') as f:
+            f.write(self.body)
+
+        instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.student = User.objects.create_user(username='learner', password='pass1234')
+        self.course = Course.objects.create(title='Video', description='...', instructor=instructor)
+        module = Module.objects.create(course=self.course, title='Week 1')
+        self.content = Content.objects.create(module=module, content_type='VIDEO', title='Lecture',
+                                              file='course_content/lecture.mp4')
+        self.client.force_authenticate(self.student)
+
+    def file_url(self):
+        Enrollment.objects.get_or_create(student=self.student, course=self.course)
+        return self.client.get(f'/api/contents/{self.content.id}/file_link/').data['url']
+
+    def test_link_requires_enrollment(self):
+        response = self.client.get(f'/api/contents/{self.content.id}/file_link/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_full_and_partial_responses(self):
+        url = self.file_url()
+        self.client.logout()
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        response = self.client.get(url, HTTP_RANGE='bytes=1000-1999')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1999/{len(self.body)}')
+        self.assertEqual(b''.join(response.streaming_content), self.body[1000:2000])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.body[-10:])
+
+    @override_settings(CONTENT_FILE_CHUNK_SIZE=1000)
+    def test_asgi_streams_through_an_async_iterator(self):
+        url = self.file_url()
+        response = async_to_sync(self.async_client.get)(url, headers={'Range': 'bytes=500-4499'})
+        self.assertEqual(response.status_code, 206)
+        # An async iterator is sent chunk by chunk; a sync one would be read into a list first.
+        self.assertTrue(response.is_async)
+
+        async def read():
+            return [chunk async for chunk in response.streaming_content]
+        chunks = async_to_sync(read)()
+        self.assertEqual([len(chunk) for chunk in chunks], [1000] * 4)
+        self.assertEqual(b''.join(chunks), self.body[500:4500])
+
+        response = self.client.get(url, HTTP_RANGE=f'bytes={len(self.body)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        url = self.file_url()
+        etag = self.client.get(url, HTTP_RANGE='bytes=0-0')['ETag']
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=0-0', HTTP_IF_RANGE=etag).status_code, 206)
+        response = self.client.get(url, HTTP_RANGE='bytes=0-0', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_tampered_token_rejected(self):
+        url = self.file_url()
+        self.assertEqual(self.client.get(url + 'x').status_code, 403)
+
+    def test_proxy_offload(self):
+        url = self.file_url()
+        with override_settings(CONTENT_FILE_DELIVERY='x-accel'):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/course_content/lecture.mp4')
+        self.assertEqual(response.content, b'')
+
+
+class BulkEnrollmentTests(APITestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.courses = [
+            Course.objects.create(title=f'Course {i}', description='...', instructor=self.instructor) for i in range(2)
+        ]
+        self.students = User.objects.bulk_create(
+            User(username=f'student{i}', email=f's{i}@example.com') for i in range(30)
+        )
+        Enrollment.objects.create(student=self.students[0], course=self.courses[0])
+
+    def test_api_enrolls_cohort(self):
+        self.client.force_authenticate(self.instructor)
+        identifiers = [s.username for s in self.students[:10]] + [s.email for s in self.students[10:]] + ['ghost']
+        response = self.client.post('/api/courses/bulk_enroll/', {
+            'courses': [c.id for c in self.courses], 'students': identifiers,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['existing']), (59, 1))
+        self.assertEqual(response.data['unknown_students'], ['ghost'])
+        self.assertEqual(Enrollment.objects.count(), 60)
+
+    def test_identifiers_with_at_sign_fall_back_to_username(self):
+        handle = User.objects.create_user(username='ada@home', password='pass1234')
+        User.objects.create_user(username='grace@home', password='pass1234')
+        # When one student's username is another's email, the email wins.
+        owner = User.objects.create_user(username='grace', email='grace@home', password='pass1234')
+        self.assertEqual(resolve_students(['ada@home', 'grace@home', 'nobody@home']),
+                         {'ada@home': handle.pk, 'grace@home': owner.pk})
+
+    def test_api_rejects_foreign_courses(self):
+        other = User.objects.create_user(username='other', password='pass1234', role='INSTRUCTOR')
+        self.client.force_authenticate(other)
+        response = self.client.post('/api/courses/bulk_enroll/', {
+            'courses': [self.courses[0].id], 'students': ['student1'],
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_import_command_streams_csv_and_ndjson(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        csv_path = os.path.join(directory, 'cohort.csv')
+        with open(csv_path, 'w') as f:
+            f.write('student\n' + '\n'.join(s.username for s in self.students) + '\n')
+        ndjson_path = os.path.join(directory, 'cohort.ndjson')
+        with open(ndjson_path, 'w') as f:
+            for s in self.students[:5]:
+                f.write(json.dumps({'student': s.email, 'course': self.courses[1].id}) + '\n')
+
+        out = StringIO()
+        call_command('import_enrollments', csv_path, '--course', str(self.courses[0].id), '--batch-size', '7', stdout=out)
+        self.assertIn('Created 29 enrollments, 1 already existed', out.getvalue())
+
+        out = StringIO()
+        call_command('import_enrollments', ndjson_path, stdout=out)
+        self.assertIn('Created 5 enrollments', out.getvalue())
+
+    def test_import_command_reports_bad_lines(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cases = {
+            'cohort.csv': ('student,course\nstudent1,1\nstudent2,first\n', 'Line 3: course must be a course id'),
+            'short.csv': ('course,student\n1,student1\n1\n', 'Line 3: missing "student" value'),
+            'cohort.ndjson': ('{"student": "student1"}\n{"email": "s2@example.com"}\n', 'Line 2: expected an object'),
+        }
+        for name, (content, message) in cases.items():
+            path = os.path.join(directory, name)
+            with open(path, 'w') as f:
+                f.write(content)
+            with self.assertRaisesMessage(CommandError, message):
+                call_command('import_enrollments', path, '--course', str(self.courses[0].id), stdout=StringIO())
+
+    def test_pairs_taken_concurrently_are_not_counted(self):
+        pair = (self.students[1].id, self.courses[0].id)
+        # The first read misses an enrollment another request commits before the insert.
+        Enrollment.objects.create(student=self.students[1], course=self.courses[0])
+        with mock.patch('courses.enrollment.existing_pairs', side_effect=[set(), existing_pairs({pair})]):
+            with transaction.atomic():
+                self.assertEqual(enroll_pairs([pair]), (0, 1))
+        self.courses[0].refresh_from_db()
+        self.assertEqual(self.courses[0].enrollment_count, 2)
+
+
+class EnrollmentCounterTests(APITestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.cheap = Course.objects.create(title='Cheap', description='...', instructor=self.instructor, price=5)
+        self.pricey = Course.objects.create(title='Pricey', description='...', instructor=self.instructor, price=50)
+        self.students = User.objects.bulk_create(User(username=f'student{i}') for i in range(3))
+
+    def counts(self, course):
+        course.refresh_from_db()
+        return course.enrollment_count, course.recent_enrollment_count
+
+    def test_enroll_and_unenroll_update_counters(self):
+        self.client.force_authenticate(self.students[0])
+        self.client.post(f'/api/courses/{self.cheap.id}/enroll/')
+        self.client.post(f'/api/courses/{self.cheap.id}/enroll/')
+        self.assertEqual(self.counts(self.cheap), (1, 1))
+        self.client.post(f'/api/courses/{self.cheap.id}/unenroll/')
+        self.assertEqual(self.counts(self.cheap), (0, 0))
+
+    def test_bulk_enroll_and_refresh(self):
+        enroll_pairs((s.id, self.pricey.id) for s in self.students)
+        self.assertEqual(self.counts(self.pricey), (3, 3))
+
+        Enrollment.objects.filter(student=self.students[0]).update(enrolled_at=timezone.now() - timedelta(days=30))
+        Course.objects.filter(pk=self.pricey.pk).update(enrollment_count=99)
+        call_command('refresh_enrollment_counts', stdout=StringIO())
+        self.assertEqual(self.counts(self.pricey), (3, 2))
+
+    def test_catalog_sort_and_filters(self):
+        enroll_pairs((s.id, self.pricey.id) for s in self.students)
+        titles = lambda response: [c['title'] for c in response.data['results']]
+
+        self.assertEqual(titles(self.client.get('/api/courses/?ordering=-enrollment_count')), ['Pricey', 'Cheap'])
+        self.assertEqual(titles(self.client.get('/api/courses/?ordering=price')), ['Cheap', 'Pricey'])
+        self.assertEqual(titles(self.client.get('/api/courses/?max_price=10')), ['Cheap'])
+        self.assertEqual(titles(self.client.get(f'/api/courses/?instructor={self.instructor.id}&min_price=10')), ['Pricey'])
+        self.assertEqual(self.client.get('/api/courses/?min_price=abc').status_code, 400)
+        counts = {c['title']: c['enrollment_count'] for c in self.client.get('/api/courses/').data['results']}
+        self.assertEqual(counts, {'Pricey': 3, 'Cheap': 0})
+
+
+class ChunkedUploadTests(APITestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.student = User.objects.create_user(username='learner', password='pass1234')
+        course = Course.objects.create(title='Video', description='...', instructor=self.instructor)
+        self.content = Content.objects.create(module=Module.objects.create(course=course, title='Week 1'),
+                                              content_type='VIDEO', title='Lecture')
+        self.body = os.urandom(10000)
+
+    def upload(self, body, filename='essay.pdf', chunk=4000):
+        upload_id = self.client.post('/api/uploads/', {'filename': filename, 'size': len(body)}).data['id']
+        for start in range(0, len(body), chunk):
+            piece = body[start:start + chunk]
+            response = self.put_chunk(upload_id, piece, start, len(body))
+            self.assertEqual(response.data['received'], start + len(piece))
+        return upload_id
+
+    def put_chunk(self, upload_id, piece, start, total):
+        return self.client.put(
+            f'/api/uploads/{upload_id}/chunk/', piece, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(piece) - 1}/{total}',
+        )
+
+    def test_resume_after_out_of_order_chunk(self):
+        self.client.force_authenticate(self.student)
+        upload_id = self.client.post('/api/uploads/', {'filename': 'a.bin', 'size': 10000}).data['id']
+        self.put_chunk(upload_id, self.body[:4000], 0, 10000)
+        response = self.put_chunk(upload_id, self.body[8000:], 8000, 10000)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['received'], 4000)
+        self.assertEqual(self.client.post(f'/api/uploads/{upload_id}/finalize/').status_code, 409)
+
+        self.put_chunk(upload_id, self.body[4000:], 4000, 10000)
+        upload = self.client.post(f'/api/uploads/{upload_id}/finalize/').data
+        self.assertEqual(upload['status'], 'COMPLETE')
+        with open(os.path.join(self.media, upload['file']), 'rb') as f:
+            self.assertEqual(f.read(), self.body)
+        self.assertEqual(os.listdir(os.path.join(self.media, 'upload_parts')), [])
+
+    def test_identical_files_are_stored_once_and_attached(self):
+        self.client.force_authenticate(self.student)
+        submission = Submission.objects.create(user=self.student, text_answer='see file')
+        first = self.upload(self.body)
+        response = self.client.post(f'/api/uploads/{first}/finalize/', {'submission': submission.id})
+        submission.refresh_from_db()
+        self.assertEqual(submission.file.name, response.data['file'])
+
+        self.client.force_authenticate(self.instructor)
+        second = self.upload(self.body, filename='copy.pdf', chunk=6000)
+        self.assertEqual(self.client.post(f'/api/uploads/{second}/finalize/', {'submission': submission.id}).status_code, 404)
+        self.client.post(f'/api/uploads/{second}/finalize/', {'content': self.content.id})
+        self.content.refresh_from_db()
+        self.assertEqual(self.content.file.name, submission.file.name)
+        self.assertEqual(len(os.listdir(os.path.dirname(os.path.join(self.media, submission.file.name)))), 1)
+
+    def test_uploads_are_private_and_stale_ones_purged(self):
+        self.client.force_authenticate(self.student)
+        upload_id = self.client.post('/api/uploads/', {'filename': 'a.bin', 'size': 10}).data['id']
+        self.put_chunk(upload_id, b'12345', 0, 10)
+        self.client.force_authenticate(self.instructor)
+        self.assertEqual(self.client.get(f'/api/uploads/{upload_id}/').status_code, 404)
+
+        ChunkedUpload.objects.update(created_at=timezone.now() - timedelta(days=2))
+        call_command('purge_uploads', stdout=StringIO())
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media, 'upload_parts')), [])
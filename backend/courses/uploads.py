@@ -0,0 +1,157 @@
+"""Resumable chunked uploads with content-addressed storage.
+
+A client opens an upload with the file's name and size, then PUTs the bytes
+in order with ``Content-Range`` headers. Each chunk is copied from the
+request stream to a part file in small pieces, so neither a chunk nor the
+whole file is held in memory, and after a dropped connection the client
+resumes from ``received``. Finalizing hashes the part file and stores it under
+its SHA-256, so identical files are kept once however often they are sent.
+"""
+import hashlib
+import os
+import re
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from .models import ChunkedUpload, Content
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def temp_dir():
+    return settings.CHUNKED_UPLOAD_TEMP_DIR or os.path.join(settings.MEDIA_ROOT, 'upload_parts')
+
+
+def part_path(upload):
+    return os.path.join(temp_dir(), f'{upload.pk}.part')
+
+
+def parse_content_range(header):
+    """Return ``(start, end, total)`` from ``bytes start-end/total`` (end inclusive)."""
+    match = CONTENT_RANGE_RE.match((header or '').strip())
+    if not match:
+        raise UploadError('Content-Range must be "bytes <start>-<end>/<total>"')
+    start, end, total = map(int, match.groups())
+    if end < start:
+        raise UploadError('Content-Range end is before start')
+    return start, end, total
+
+
+def write_chunk(upload, stream, content_range):
+    """Append one chunk from ``stream`` at ``upload.received``; returns the new offset."""
+    if upload.status != ChunkedUpload.Status.PENDING:
+        raise UploadError('Upload is already complete', status=409)
+    start, end, total = parse_content_range(content_range)
+    length = end - start + 1
+    if total != upload.size or end >= upload.size:
+        raise UploadError('Content-Range does not match the declared size')
+    if length > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunks may be at most {settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE} bytes', status=413)
+    if start != upload.received:
+        raise UploadError(f'Expected a chunk starting at byte {upload.received}', status=409)
+
+    os.makedirs(temp_dir(), exist_ok=True)
+    path = part_path(upload)
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining:
+            piece = stream.read(min(COPY_BUFFER_SIZE, remaining))
+            if not piece:
+                break
+            f.write(piece)
+            remaining -= len(piece)
+        # Drop bytes left over from an earlier, interrupted attempt at this chunk.
+        f.truncate()
+    if remaining:
+        raise UploadError(f'Chunk ended {remaining} bytes early; resend it from byte {start}')
+
+    # Guarded on the old offset so two racing copies of a chunk advance it once.
+    if not ChunkedUpload.objects.filter(pk=upload.pk, received=start).update(received=start + length):
+        raise UploadError('Upload was modified concurrently; fetch it and resume', status=409)
+    upload.received = start + length
+    return upload.received
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while piece := f.read(1024 * 1024):
+            digest.update(piece)
+    return digest.hexdigest()
+
+
+def store_blob(path, sha256, filename):
+    """Save the part file under its hash unless that content is already stored."""
+    previous = (
+        ChunkedUpload.objects.filter(sha256=sha256, status=ChunkedUpload.Status.COMPLETE)
+        .exclude(file='').values_list('file', flat=True).first()
+    )
+    if previous and default_storage.exists(previous):
+        return previous
+    extension = os.path.splitext(filename)[1].lower()[:16]
+    with open(path, 'rb') as f:
+        return default_storage.save(f'uploads/{sha256[:2]}/{sha256}{extension}', File(f))
+
+
+def finalize(upload):
+    if upload.status == ChunkedUpload.Status.COMPLETE:
+        return upload
+    if upload.received != upload.size:
+        raise UploadError(f'Only {upload.received} of {upload.size} bytes received', status=409)
+    path = part_path(upload)
+    if upload.size == 0 and not os.path.exists(path):
+        os.makedirs(temp_dir(), exist_ok=True)
+        open(path, 'wb').close()
+
+    upload.sha256 = file_sha256(path)
+    upload.file = store_blob(path, upload.sha256, upload.filename)
+    os.remove(path)
+    upload.status = ChunkedUpload.Status.COMPLETE
+    upload.completed_at = timezone.now()
+    upload.save(update_fields=['sha256', 'file', 'status', 'completed_at'])
+    return upload
+
+
+def attach(upload, user, submission_id=None, content_id=None):
+    """Point ``Submission.file`` or ``Content.file`` at a finished upload."""
+    from assessments.models import Submission
+
+    if submission_id is not None:
+        target = Submission.objects.filter(pk=submission_id, user=user).first()
+        if target is None:
+            raise UploadError('Submission not found', status=404)
+    else:
+        target = Content.objects.filter(pk=content_id, module__course__instructor=user).first()
+        if target is None:
+            raise UploadError('Content not found in your courses', status=404)
+    target.file.name = upload.file
+    target.save(update_fields=['file'])
+    return target
+
+
+def purge_stale_uploads(hours=None):
+    """Delete pending uploads older than ``hours`` along with their part files."""
+    hours = settings.CHUNKED_UPLOAD_EXPIRY_HOURS if hours is None else hours
+    stale = ChunkedUpload.objects.filter(
+        status=ChunkedUpload.Status.PENDING, created_at__lt=timezone.now() - timedelta(hours=hours)
+    )
+    count = 0
+    for upload in stale.iterator():
+        try:
+            os.remove(part_path(upload))
+        except FileNotFoundError:
+            pass
+        count += 1
+    stale.delete()
+    return count
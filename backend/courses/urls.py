@@ -1,12 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CourseViewSet, ModuleViewSet, ContentViewSet
+from .delivery import serve_content_file
+from .views import CourseViewSet, ModuleViewSet, ContentViewSet, UploadViewSet, SearchView
 
 router = DefaultRouter()
 router.register(r'courses', CourseViewSet)
 router.register(r'modules', ModuleViewSet)
 router.register(r'contents', ContentViewSet)
+router.register(r'uploads', UploadViewSet, basename='upload')
 
 urlpatterns = [
+    path('search/', SearchView.as_view(), name='search'),
+    path('contents/<int:pk>/file/', serve_content_file, name='content-file'),
     path('', include(router.urls)),
 ]
@@ -1,8 +1,29 @@
-from rest_framework import viewsets, permissions, status
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+from rest_framework import viewsets, mixins, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from .models import Course, Module, Content, Enrollment
-from .serializers import CourseSerializer, ModuleSerializer, ContentSerializer, EnrollmentSerializer
+from rest_framework.views import APIView
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from backend.pagination import CoursePagination, StableOrderingFilter
+from . import search
+from .bulk import BulkEdit, BulkEditError
+from .cache import get_course_tree
+from .delivery import signed_file_url
+from .enrollment import bulk_enroll
+from .models import Course, Module, Content, Enrollment, ChunkedUpload
+from .serializers import (
+    CourseSerializer, CourseSummarySerializer, ModuleSerializer, ContentSerializer, EnrollmentSerializer,
+    ChunkedUploadSerializer, parse_field_list,
+)
+from .uploads import UploadError, attach, finalize, write_chunk
 
 class IsInstructorOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -19,9 +40,27 @@ class CourseViewSet(viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsInstructorOrReadOnly]
+    pagination_class = CoursePagination
+    filter_backends = [StableOrderingFilter]
+    # ?ordering=-enrollment_count gives "popular", -recent_enrollment_count "trending".
+    ordering_fields = ['created_at', 'price', 'enrollment_count', 'recent_enrollment_count']
+    ordering = ('-created_at', '-id')
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CourseSummarySerializer
+        return CourseSerializer
 
     def get_queryset(self):
-        queryset = Course.objects.all()
+        queryset = Course.objects.with_user_state(self.request.user).select_related('instructor')
+        if self.action == 'list':
+            queryset = self.apply_catalog_filters(self.apply_list_fields(queryset))
+        elif self.action in ('retrieve', 'update', 'partial_update') and not self.use_tree_cache():
+            queryset = queryset.prefetch_related(
+                'modules__contents',
+                'modules__quiz__questions',
+                'modules__assignment',
+            )
         mine = self.request.query_params.get('mine')
         enrolled = self.request.query_params.get('enrolled')
         
@@ -33,6 +72,69 @@ class CourseViewSet(viewsets.ModelViewSet):
                 
         return queryset
 
+    def use_tree_cache(self):
+        return self.action == 'retrieve' and 'fields' not in self.request.query_params
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_tree_cache():
+            return super().retrieve(request, *args, **kwargs)
+
+        # The course row carries the per-user annotations; the tree itself is
+        # shared pre-rendered JSON keyed by the course version.
+        course = self.get_object()
+        serializer = self.get_serializer()
+        user_fields = {
+            'is_enrolled': serializer.get_is_enrolled(course),
+            'progress': serializer.get_progress(course),
+        }
+        version = course.tree_version
+        user_state = hashlib.md5(json.dumps([request.user.pk, user_fields]).encode()).hexdigest()[:12]
+        etag = f'"{course.pk}-{version}-{user_state}"'
+
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            tree = get_course_tree(course.pk, version, request)
+            response = HttpResponse(
+                tree[:-1] + b',' + json.dumps(user_fields, separators=(',', ':')).encode()[1:],
+                content_type='application/json',
+            )
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def apply_catalog_filters(self, queryset):
+        params = self.request.query_params
+        if params.get('instructor'):
+            if not params['instructor'].isdigit():
+                raise ValidationError({'instructor': 'Must be a user id.'})
+            queryset = queryset.filter(instructor_id=params['instructor'])
+        if params.get('free') in ('true', '1'):
+            queryset = queryset.filter(price=0)
+        for param, lookup in (('min_price', 'price__gte'), ('max_price', 'price__lte')):
+            if params.get(param):
+                try:
+                    queryset = queryset.filter(**{lookup: Decimal(params[param])})
+                except InvalidOperation:
+                    raise ValidationError({param: 'Must be a number.'})
+        return queryset
+
+    def apply_list_fields(self, queryset):
+        # Keep heavy text columns out of the SELECT unless the client asked for them.
+        fields = parse_field_list(self.request, 'fields')
+        if fields is not None and 'description' not in fields:
+            queryset = queryset.defer('description')
+
+        expand = parse_field_list(self.request, 'expand') or set()
+        if 'modules' in expand:
+            contents = Content.objects.only('id', 'module_id', 'title', 'content_type', 'order')
+            modules = Module.objects.only('id', 'course_id', 'title', 'order').prefetch_related(
+                Prefetch('contents', queryset=contents)
+            )
+            queryset = queryset.prefetch_related(Prefetch('modules', queryset=modules))
+        return queryset
+
     def perform_create(self, serializer):
         serializer.save(instructor=self.request.user)
 
@@ -44,6 +146,44 @@ class CourseViewSet(viewsets.ModelViewSet):
             return Response({'status': 'enrolled'}, status=status.HTTP_201_CREATED)
         return Response({'status': 'already enrolled'}, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def unenroll(self, request, pk=None):
+        course = self.get_object()
+        deleted, _ = Enrollment.objects.filter(student=request.user, course=course).delete()
+        if deleted:
+            return Response({'status': 'unenrolled'}, status=status.HTTP_200_OK)
+        return Response({'status': 'not enrolled'}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def bulk_enroll(self, request):
+        """Enroll many students (ids, usernames or emails) into one or more of your courses."""
+        course_ids = request.data.get('courses')
+        students = request.data.get('students')
+        if not isinstance(course_ids, list) or not isinstance(students, list) or not course_ids:
+            return Response({'error': 'courses and students must be lists'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            course_ids = {int(course_id) for course_id in course_ids}
+        except (TypeError, ValueError):
+            return Response({'error': 'courses must be ids'}, status=status.HTTP_400_BAD_REQUEST)
+
+        owned = set(Course.objects.filter(pk__in=course_ids, instructor=request.user).values_list('pk', flat=True))
+        if owned != course_ids:
+            return Response({'error': 'You can only enroll students into your own courses',
+                             'courses': sorted(course_ids - owned)}, status=status.HTTP_403_FORBIDDEN)
+
+        report = bulk_enroll(((student, None) for student in students), courses=owned)
+        return Response(report)
+
+    @action(detail=True, methods=['post'])
+    def bulk(self, request, pk=None):
+        """Create, update, delete and reorder many modules/contents atomically."""
+        course = self.get_object()
+        try:
+            result = BulkEdit(course, request.data).apply()
+        except BulkEditError as e:
+            return Response({'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
 class ModuleViewSet(viewsets.ModelViewSet):
     queryset = Module.objects.all()
     serializer_class = ModuleSerializer
@@ -53,3 +193,67 @@ class ContentViewSet(viewsets.ModelViewSet):
     queryset = Content.objects.all()
     serializer_class = ContentSerializer
     permission_classes = [IsInstructorOrReadOnly]
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def file_link(self, request, pk=None):
+        """Check access once and return a signed URL that streams the file with Range support."""
+        content = get_object_or_404(Content.objects.select_related('module__course'), pk=pk)
+        if not content.file:
+            return Response({'error': 'This content has no file'}, status=status.HTTP_404_NOT_FOUND)
+        course = content.module.course
+        if course.instructor_id != request.user.pk and not Enrollment.objects.filter(student=request.user, course=course).exists():
+            return Response({'error': 'Enroll in this course to access its files'}, status=status.HTTP_403_FORBIDDEN)
+        return Response({'url': signed_file_url(request, content, request.user), 'expires_in': settings.CONTENT_FILE_LINK_MAX_AGE})
+
+class UploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Resumable chunked uploads: create, PUT chunks to ``chunk``, then ``finalize``."""
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ChunkedUpload.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @action(detail=True, methods=['put'])
+    def chunk(self, request, pk=None):
+        """Write the raw request body at the offset given by ``Content-Range``."""
+        upload = self.get_object()
+        try:
+            # request.stream is read directly so DRF never buffers the body.
+            received = write_chunk(upload, request.stream, request.headers.get('Content-Range'))
+        except UploadError as e:
+            return Response({'error': e.message, 'received': upload.received}, status=e.status)
+        return Response({'received': received, 'size': upload.size})
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        """Hash and store the upload, optionally attaching it to ``submission`` or ``content``."""
+        upload = self.get_object()
+        submission_id = request.data.get('submission')
+        content_id = request.data.get('content')
+        try:
+            finalize(upload)
+            if submission_id is not None or content_id is not None:
+                attach(upload, request.user, submission_id=submission_id, content_id=content_id)
+        except UploadError as e:
+            return Response({'error': e.message, 'received': upload.received}, status=e.status)
+        return Response(self.get_serializer(upload).data)
+
+class SearchView(APIView):
+    """Ranked full-text search over course, module and lesson text."""
+    permission_classes = [permissions.AllowAny]
+    max_limit = 50
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), self.max_limit)
+            course_id = request.query_params.get('course')
+            course_id = int(course_id) if course_id else None
+        except ValueError:
+            return Response({'error': 'limit and course must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': search.search(query, limit=max(limit, 1), course_id=course_id)})
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_enrollment_course_idx'),
+        ('payments', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['course', 'status', 'created_at'], name='payment_course_idx'),
+        ),
+    ]
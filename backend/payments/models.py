@@ -11,5 +11,11 @@ class Payment(models.Model):
     status = models.CharField(max_length=20, default='pending')  # pending, succeeded, failed
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='payment_user_idx'),
+            models.Index(fields=['course', 'status', 'created_at'], name='payment_course_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.course} - {self.status}"
@@ -6,6 +6,7 @@ from .models import Payment
 from courses.models import Course, Enrollment
 from .paypal import create_order, capture_order
 from .serializers import PaymentSerializer
+from backend.pagination import PaymentPagination
 
 class CreateOrderView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -59,6 +60,7 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing payment history"""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = PaymentSerializer
+    pagination_class = PaymentPagination
 
     def get_queryset(self):
-        return Payment.objects.filter(user=self.request.user).order_by('-created_at')
+        return Payment.objects.filter(user=self.request.user).select_related('course')
@@ -0,0 +1 @@
+# This file is required for Django to recognize this directory as a Python package
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from courses.models import Content
+from progress.models import Progress, CourseProgress
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (or with --verify, check) the denormalized CourseProgress table from Progress and Content'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Report drifted rows without writing')
+        parser.add_argument('--course', type=int, action='append', dest='courses', help='Limit to this course id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        contents = Content.objects.all()
+        completions = Progress.objects.filter(is_completed=True)
+        existing = CourseProgress.objects.all()
+        if options['courses']:
+            contents = contents.filter(module__course__in=options['courses'])
+            completions = completions.filter(content__module__course__in=options['courses'])
+            existing = existing.filter(course__in=options['courses'])
+
+        totals = dict(
+            contents.order_by().values_list('module__course').annotate(n=Count('pk')).values_list('module__course', 'n')
+        )
+        expected = {}
+        grouped = completions.order_by().values_list('user', 'content__module__course').annotate(n=Count('pk'))
+        for user_id, course_id, completed in grouped.iterator(chunk_size=batch_size):
+            expected[(user_id, course_id)] = (completed, totals.get(course_id, 0))
+
+        in_sync, stale, drifted = set(), [], 0
+        for row in existing.only('id', 'user_id', 'course_id', 'completed_count', 'total_count').iterator(chunk_size=batch_size):
+            key = (row.user_id, row.course_id)
+            if key not in expected:
+                stale.append(row.pk)
+            elif expected[key] == (row.completed_count, row.total_count):
+                in_sync.add(key)
+            else:
+                drifted += 1
+        missing = len(expected) - len(in_sync) - drifted
+
+        self.stdout.write(f'{drifted} drifted, {missing} missing, {len(stale)} stale rows')
+        if options['verify']:
+            return
+
+        rows = [
+            CourseProgress(user_id=user_id, course_id=course_id, completed_count=completed, total_count=total)
+            for (user_id, course_id), (completed, total) in expected.items()
+            if (user_id, course_id) not in in_sync
+        ]
+        with transaction.atomic():
+            for start in range(0, len(stale), batch_size):
+                CourseProgress.objects.filter(pk__in=stale[start:start + batch_size]).delete()
+            CourseProgress.objects.bulk_create(
+                rows,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['user', 'course'],
+                update_fields=['completed_count', 'total_count'],
+            )
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(rows)} course progress rows'))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_enrollment_course_idx'),
+        ('progress', '0004_syncreceipt'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='progress',
+            index=models.Index(fields=['completed_at'], name='progress_completed_at_idx'),
+        ),
+    ]
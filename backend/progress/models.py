@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
 from django.conf import settings
-from courses.models import Content
+from courses.models import Course, Content
 
 class Progress(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='progress')
@@ -10,6 +11,78 @@ class Progress(models.Model):
 
     class Meta:
         unique_together = ('user', 'content')
+        indexes = [
+            # Lets analytics.columnar re-read only the rows saved since its last refresh.
+            models.Index(fields=['completed_at'], name='progress_completed_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.content.title}"
+
+class CourseProgressManager(models.Manager):
+    def record_completion(self, user, content_id, delta=1):
+        """Add ``delta`` to the user's completed count for the course owning ``content_id``."""
+        course_id = Content.objects.filter(pk=content_id).values_list('module__course_id', flat=True).first()
+        if course_id is None:
+            return
+        with transaction.atomic():
+            updated = self.filter(user=user, course_id=course_id).update(completed_count=F('completed_count') + delta)
+            if updated:
+                return
+            try:
+                # First completion in this course: seed the row from the source tables.
+                with transaction.atomic():
+                    self.create(
+                        user=user,
+                        course_id=course_id,
+                        completed_count=Progress.objects.filter(
+                            user=user, is_completed=True, content__module__course_id=course_id
+                        ).count(),
+                        total_count=Content.objects.filter(module__course_id=course_id).count(),
+                    )
+            except IntegrityError:
+                # A concurrent request created the row first; apply our delta to it.
+                self.filter(user=user, course_id=course_id).update(completed_count=F('completed_count') + delta)
+
+    def adjust_total(self, course_id, delta):
+        """Add ``delta`` to the content total of every learner's row for ``course_id``."""
+        self.filter(course_id=course_id).update(total_count=F('total_count') + delta)
+
+class CourseProgress(models.Model):
+    """Denormalized completed/total content counts per (user, course).
+
+    Maintained incrementally by ``ProgressViewSet`` and the ``Content`` signals
+    in ``progress.signals``; ``rebuild_course_progress`` repairs drift.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='course_progress')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='progress_summaries')
+    completed_count = models.IntegerField(default=0)
+    total_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CourseProgressManager()
+
+    class Meta:
+        unique_together = ('user', 'course')
+
+    def __str__(self):
+        return f"{self.user.username} - {self.course.title} ({self.completed_count}/{self.total_count})"
+
+    @property
+    def percent(self):
+        if self.total_count <= 0:
+            return 0
+        return (self.completed_count / self.total_count) * 100
+
+class SyncReceipt(models.Model):
+    """The stored outcome of one offline-sync item, keyed by its client idempotency key."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sync_receipts')
+    key = models.CharField(max_length=64)
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"{self.user.username} - {self.key}"
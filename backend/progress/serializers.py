@@ -6,3 +6,11 @@ class ProgressSerializer(serializers.ModelSerializer):
         model = Progress
         fields = '__all__'
         read_only_fields = ('user', 'completed_at')
+
+    def update(self, instance, validated_data):
+        # Write only the submitted fields, so values read with a stale row (e.g. is_completed) are not saved back.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
+        return instance
@@ -0,0 +1,22 @@
+from django.db.models import F
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from courses.models import Content
+from .models import Progress, CourseProgress
+
+
+@receiver(post_save, sender=Content)
+def content_added(sender, instance, created, **kwargs):
+    if created:
+        CourseProgress.objects.adjust_total(instance.module.course_id, 1)
+
+
+@receiver(pre_delete, sender=Content)
+def content_removed(sender, instance, **kwargs):
+    # Runs before the cascade removes the Progress rows, so we can still see who completed it.
+    course_id = instance.module.course_id
+    completed_by = Progress.objects.filter(content=instance, is_completed=True).values('user')
+    CourseProgress.objects.filter(course_id=course_id, user__in=completed_by).update(
+        completed_count=F('completed_count') - 1
+    )
+    CourseProgress.objects.adjust_total(course_id, -1)
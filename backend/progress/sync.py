@@ -0,0 +1,167 @@
+"""Batch sync of offline learner actions: content completions and quiz attempts.
+
+Every item carries a client-generated idempotency key. Keys already seen for
+the user are answered from their stored ``SyncReceipt`` without touching
+anything else, so replaying a batch costs one query. New items are applied
+in one transaction: completions with a single ``Progress`` upsert, attempts
+graded once per quiz against the cached answer key and inserted with
+``bulk_create``.
+"""
+from collections import defaultdict
+from django.db import transaction
+from rest_framework import serializers
+from assessments.grading import dump_results, get_answer_key
+from assessments.models import Quiz, QuizAttempt
+from assessments.stats import record_attempts
+from courses.models import Content
+from .models import CourseProgress, Progress, SyncReceipt
+
+MAX_BATCH_ITEMS = 500
+
+
+class SyncProgressItemSerializer(serializers.Serializer):
+    key = serializers.CharField(max_length=64)
+    content_id = serializers.IntegerField()
+
+
+class SyncAttemptItemSerializer(serializers.Serializer):
+    key = serializers.CharField(max_length=64)
+    quiz = serializers.IntegerField()
+    answers = serializers.DictField()
+
+
+class SyncBatchError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class SyncBatch:
+    """Apply one sync payload ``{progress: [...], quiz_attempts: [...]}`` for ``user``.
+
+    ``apply()`` returns per-item results in request order, each with the item's
+    ``key`` and a ``status`` of ``applied``, ``duplicate`` (answered from the
+    receipt of an earlier sync) or ``error``.
+    """
+
+    def __init__(self, user, data):
+        self.user = user
+        data = data if isinstance(data, dict) else {}
+        self.sections = {
+            'progress': (data.get('progress') or [], SyncProgressItemSerializer),
+            'quiz_attempts': (data.get('quiz_attempts') or [], SyncAttemptItemSerializer),
+        }
+
+    def apply(self):
+        if not all(isinstance(items, list) for items, _ in self.sections.values()):
+            raise SyncBatchError('progress and quiz_attempts must be lists')
+        if sum(len(items) for items, _ in self.sections.values()) > MAX_BATCH_ITEMS:
+            raise SyncBatchError(f'A batch may hold at most {MAX_BATCH_ITEMS} items')
+
+        results = {section: [] for section in self.sections}
+        pending = {section: [] for section in self.sections}
+        first = {}
+        for section, (items, serializer_class) in self.sections.items():
+            for item in items:
+                serializer = serializer_class(data=item)
+                if not serializer.is_valid():
+                    key = item.get('key') if isinstance(item, dict) else None
+                    results[section].append({'key': key, 'status': 'error', 'errors': serializer.errors})
+                    continue
+                result = {'key': serializer.validated_data['key']}
+                results[section].append(result)
+                pending[section].append((result, serializer.validated_data))
+
+        keys = {data['key'] for items in pending.values() for _, data in items}
+        receipts = dict(SyncReceipt.objects.filter(user=self.user, key__in=keys).values_list('key', 'result'))
+        repeats = []
+        for section, items in pending.items():
+            fresh = []
+            for result, data in items:
+                if data['key'] in receipts:
+                    result.update(receipts[data['key']], status='duplicate')
+                elif data['key'] in first:
+                    repeats.append((result, first[data['key']]))
+                else:
+                    first[data['key']] = result
+                    fresh.append((result, data))
+            pending[section] = fresh
+
+        if first:
+            with transaction.atomic():
+                self.apply_progress(pending['progress'])
+                self.apply_attempts(pending['quiz_attempts'])
+                SyncReceipt.objects.bulk_create([
+                    SyncReceipt(user=self.user, key=data['key'], result={k: v for k, v in result.items() if k != 'key'})
+                    for items in pending.values()
+                    for result, data in items
+                    if result['status'] == 'applied'
+                ])
+        # A key repeated within the batch gets the outcome of its first occurrence.
+        for result, original in repeats:
+            result.update({k: v for k, v in original.items() if k != 'key'})
+            if original['status'] == 'applied':
+                result['status'] = 'duplicate'
+        return results
+
+    def apply_progress(self, items):
+        if not items:
+            return
+        content_ids = {data['content_id'] for _, data in items}
+        courses = dict(Content.objects.filter(pk__in=content_ids).order_by().values_list('pk', 'module__course_id'))
+        already_done = set(
+            Progress.objects.filter(user=self.user, content_id__in=content_ids, is_completed=True)
+            .values_list('content_id', flat=True)
+        )
+
+        completed = {}
+        for result, data in items:
+            content_id = data['content_id']
+            if content_id not in courses:
+                result.update(status='error', errors={'content_id': ['Unknown content.']})
+                continue
+            result.update(status='applied', content_id=content_id)
+            completed[content_id] = Progress(user=self.user, content_id=content_id, is_completed=True)
+
+        Progress.objects.bulk_create(
+            completed.values(),
+            update_conflicts=True,
+            unique_fields=['user', 'content'],
+            update_fields=['is_completed', 'completed_at'],
+        )
+        newly_completed = defaultdict(list)
+        for content_id in completed.keys() - already_done:
+            newly_completed[courses[content_id]].append(content_id)
+        for content_ids in newly_completed.values():
+            CourseProgress.objects.record_completion(self.user, content_ids[0], len(content_ids))
+
+    def apply_attempts(self, items):
+        if not items:
+            return
+        quiz_ids = {data['quiz'] for _, data in items}
+        versions = dict(Quiz.objects.filter(pk__in=quiz_ids).values_list('pk', 'key_version'))
+        by_quiz = defaultdict(list)
+        for result, data in items:
+            if data['quiz'] in versions:
+                by_quiz[data['quiz']].append((result, data))
+            else:
+                result.update(status='error', errors={'quiz': ['Unknown quiz.']})
+
+        attempts, graded = [], []
+        for quiz_id, quiz_items in by_quiz.items():
+            key = get_answer_key(quiz_id, versions[quiz_id])
+            quiz_graded = []
+            for result, data in quiz_items:
+                score, question_results = key.grade(data['answers'])
+                attempts.append((result, QuizAttempt(
+                    user=self.user, quiz_id=quiz_id, answers=data['answers'], score=score,
+                    question_results=dump_results(question_results),
+                )))
+                quiz_graded.append((data['answers'], score, question_results))
+            graded.append((quiz_id, quiz_graded))
+
+        QuizAttempt.objects.bulk_create([attempt for _, attempt in attempts])
+        for result, attempt in attempts:
+            result.update(status='applied', id=attempt.pk, quiz=attempt.quiz_id, score=attempt.score)
+        for quiz_id, quiz_graded in graded:
+            record_attempts(quiz_id, quiz_graded)
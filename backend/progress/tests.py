@@ -1,3 +1,138 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+from assessments.models import Quiz, Question, QuizAttempt
+from courses.models import Course, Module, Content
+from .models import Progress, CourseProgress
+from .views import ProgressViewSet
 
-# Create your tests here.
+User = get_user_model()
+
+
+class CourseProgressTests(APITestCase):
+    def setUp(self):
+        instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.student = User.objects.create_user(username='learner', password='pass1234')
+        self.course = Course.objects.create(title='Python', description='...', instructor=instructor)
+        self.module = Module.objects.create(course=self.course, title='Basics')
+        self.contents = [
+            Content.objects.create(module=self.module, content_type='TEXT', title=f'Lesson {i}') for i in range(4)
+        ]
+        self.client.force_authenticate(self.student)
+
+    def course_progress(self):
+        return CourseProgress.objects.get(user=self.student, course=self.course)
+
+    def test_mark_complete_updates_summary_once(self):
+        for _ in range(2):
+            self.client.post('/api/progress/progress/mark_complete/', {'content_id': self.contents[0].id})
+        row = self.course_progress()
+        self.assertEqual((row.completed_count, row.total_count), (1, 4))
+        self.assertEqual(row.percent, 25)
+
+    def test_racing_completions_count_once(self):
+        # Each request read the row before the other one wrote it.
+        pk = Progress.objects.create(user=self.student, content=self.contents[0]).pk
+        stale = [(Progress.objects.get(pk=pk), False) for _ in range(2)]
+        with mock.patch.object(Progress.objects, 'get_or_create', side_effect=stale):
+            for _ in range(2):
+                self.client.post('/api/progress/progress/mark_complete/', {'content_id': self.contents[0].id})
+        self.assertEqual(self.course_progress().completed_count, 1)
+
+        stale = [Progress.objects.get(pk=pk) for _ in range(2)]
+        with mock.patch.object(ProgressViewSet, 'get_object', side_effect=stale):
+            for _ in range(2):
+                response = self.client.patch(f'/api/progress/progress/{pk}/', {'is_completed': False})
+        self.assertFalse(response.data['is_completed'])
+        self.assertEqual(self.course_progress().completed_count, 0)
+
+    def test_create_and_delete_progress(self):
+        response = self.client.post('/api/progress/progress/', {'content': self.contents[1].id, 'is_completed': True})
+        self.assertEqual(self.course_progress().completed_count, 1)
+        self.client.delete(f"/api/progress/progress/{response.data['id']}/")
+        self.assertEqual(self.course_progress().completed_count, 0)
+
+    def test_content_changes_adjust_totals(self):
+        self.client.post('/api/progress/progress/mark_complete/', {'content_id': self.contents[0].id})
+        Content.objects.create(module=self.module, content_type='TEXT', title='Extra')
+        self.assertEqual(self.course_progress().total_count, 5)
+
+        self.contents[0].delete()
+        row = self.course_progress()
+        self.assertEqual((row.completed_count, row.total_count), (0, 4))
+
+    def test_rebuild_repairs_drift(self):
+        Progress.objects.create(user=self.student, content=self.contents[0], is_completed=True)
+        Progress.objects.create(user=self.student, content=self.contents[1], is_completed=True)
+
+        out = StringIO()
+        call_command('rebuild_course_progress', '--verify', stdout=out)
+        self.assertIn('1 missing', out.getvalue())
+        self.assertFalse(CourseProgress.objects.exists())
+
+        call_command('rebuild_course_progress', stdout=StringIO())
+        row = self.course_progress()
+        self.assertEqual((row.completed_count, row.total_count), (2, 4))
+
+        CourseProgress.objects.filter(pk=row.pk).update(completed_count=7)
+        out = StringIO()
+        call_command('rebuild_course_progress', stdout=out)
+        self.assertIn('1 drifted', out.getvalue())
+        self.assertEqual(self.course_progress().completed_count, 2)
+
+
+class SyncTests(APITestCase):
+    def setUp(self):
+        instructor = User.objects.create_user(username='teacher', password='pass1234', role='INSTRUCTOR')
+        self.student = User.objects.create_user(username='learner', password='pass1234')
+        self.course = Course.objects.create(title='Python', description='...', instructor=instructor)
+        module = Module.objects.create(course=self.course, title='Basics')
+        self.contents = [Content.objects.create(module=module, content_type='TEXT', title=f'Lesson {i}') for i in range(3)]
+        self.quiz = Quiz.objects.create(module=module, title='Check')
+        self.question = Question.objects.create(quiz=self.quiz, text='2 + 2?', options=['3', '4'], correct_answer=1)
+        Progress.objects.create(user=self.student, content=self.contents[0], is_completed=True)
+        self.client.force_authenticate(self.student)
+
+    def batch(self):
+        return {
+            'progress': [
+                {'key': 'p1', 'content_id': self.contents[0].id},
+                {'key': 'p2', 'content_id': self.contents[1].id},
+                {'key': 'p3', 'content_id': 999999},
+            ],
+            'quiz_attempts': [
+                {'key': 'a1', 'quiz': self.quiz.id, 'answers': {str(self.question.id): 1}},
+                {'key': 'a2', 'quiz': self.quiz.id, 'answers': {str(self.question.id): 0}},
+                {'key': 'a1', 'quiz': self.quiz.id, 'answers': {str(self.question.id): 1}},
+            ],
+        }
+
+    def test_sync_applies_once_and_replays_from_receipts(self):
+        response = self.client.post('/api/progress/progress/sync/', self.batch(), format='json')
+        self.assertEqual([r['status'] for r in response.data['progress']], ['applied', 'applied', 'error'])
+        attempts = response.data['quiz_attempts']
+        self.assertEqual([r['status'] for r in attempts], ['applied', 'applied', 'duplicate'])
+        self.assertEqual([r['score'] for r in attempts], [100, 0, 100])
+        self.assertEqual(attempts[0]['id'], attempts[2]['id'])
+
+        self.assertEqual(QuizAttempt.objects.filter(user=self.student).count(), 2)
+        self.assertEqual(Progress.objects.filter(user=self.student, is_completed=True).count(), 2)
+        row = CourseProgress.objects.get(user=self.student, course=self.course)
+        self.assertEqual((row.completed_count, row.total_count), (2, 3))
+
+        batch = self.batch()
+        del batch['progress'][2]  # errors are not receipted, so that item would be retried
+        with self.assertNumQueries(1):
+            replay = self.client.post('/api/progress/progress/sync/', batch, format='json')
+        self.assertEqual([r['status'] for r in replay.data['quiz_attempts']], ['duplicate'] * 3)
+        self.assertEqual(replay.data['quiz_attempts'][1]['score'], 0)
+        self.assertEqual(QuizAttempt.objects.filter(user=self.student).count(), 2)
+        self.assertEqual(CourseProgress.objects.get(pk=row.pk).completed_count, 2)
+
+    def test_rejects_malformed_batches(self):
+        response = self.client.post('/api/progress/progress/sync/', {'progress': 'nope'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/progress/progress/sync/', {'quiz_attempts': [{'quiz': self.quiz.id}]}, format='json')
+        self.assertEqual(response.data['quiz_attempts'][0]['status'], 'error')
@@ -1,8 +1,25 @@
+from django.db import IntegrityError
+from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Progress
+from .models import Progress, CourseProgress
 from .serializers import ProgressSerializer
+from .sync import SyncBatch, SyncBatchError
+
+def set_completed(progress, completed):
+    """Flip ``is_completed`` with a conditional UPDATE and count it only if this call flipped it.
+
+    Two requests that both read the row before either wrote it would otherwise
+    both see the old value and both adjust ``CourseProgress``.
+    """
+    flipped = Progress.objects.filter(pk=progress.pk, is_completed=not completed).update(
+        is_completed=completed, completed_at=timezone.now()
+    )
+    if flipped:
+        CourseProgress.objects.record_completion(progress.user, progress.content_id, 1 if completed else -1)
+    return bool(flipped)
+
 
 class ProgressViewSet(viewsets.ModelViewSet):
     queryset = Progress.objects.all()
@@ -13,7 +30,25 @@ class ProgressViewSet(viewsets.ModelViewSet):
         return Progress.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        progress = serializer.save(user=self.request.user)
+        if progress.is_completed:
+            CourseProgress.objects.record_completion(progress.user, progress.content_id)
+
+    def perform_update(self, serializer):
+        completed = serializer.validated_data.pop('is_completed', None)
+        progress = serializer.save()
+        if completed is not None:
+            set_completed(progress, completed)
+            progress.refresh_from_db(fields=['is_completed', 'completed_at'])
+
+    def perform_destroy(self, instance):
+        user, content_id = instance.user, instance.content_id
+        # Decided by the delete itself, not the row read earlier, so a concurrent un-complete is not counted twice.
+        deleted, _ = Progress.objects.filter(pk=instance.pk, is_completed=True).delete()
+        if deleted:
+            CourseProgress.objects.record_completion(user, content_id, -1)
+        else:
+            instance.delete()
 
     @action(detail=False, methods=['post'])
     def mark_complete(self, request):
@@ -22,6 +57,17 @@ class ProgressViewSet(viewsets.ModelViewSet):
             return Response({'error': 'content_id is required'}, status=status.HTTP_400_BAD_REQUEST)
         
         progress, created = Progress.objects.get_or_create(user=request.user, content_id=content_id)
-        progress.is_completed = True
-        progress.save()
+        set_completed(progress, True)
         return Response({'status': 'marked as complete'}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """Apply a batch of offline completions and quiz attempts; safe to replay."""
+        try:
+            results = SyncBatch(request.user, request.data).apply()
+        except SyncBatchError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError:
+            # The same keys were synced concurrently; a retry is answered from their receipts.
+            return Response({'error': 'Batch is already being synced; retry'}, status=status.HTTP_409_CONFLICT)
+        return Response(results)
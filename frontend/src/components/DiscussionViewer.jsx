@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import api from '../services/api';
+import api, { getAllPages } from '../services/api';
 import { MessageSquare, User } from 'lucide-react';
 
 const DiscussionViewer = ({ courseId }) => {
@@ -14,9 +14,7 @@ const DiscussionViewer = ({ courseId }) => {
 
     const fetchDiscussions = async () => {
         try {
-            const response = await api.get('/communication/discussions/');
-            const courseDiscussions = response.data.filter(d => d.course === parseInt(courseId));
-            setDiscussions(courseDiscussions);
+            setDiscussions(await getAllPages('/communication/discussions/', { course: courseId }));
         } catch (error) {
             console.error("Failed to fetch discussions", error);
         }
@@ -22,7 +22,7 @@ const Navbar = () => {
     const fetchNotifications = async () => {
         try {
             const response = await api.get('/communication/notifications/');
-            setNotifications(response.data);
+            setNotifications(response.data.results);
         } catch (error) {
             console.error("Failed to fetch notifications", error);
         }
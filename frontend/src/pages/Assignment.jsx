@@ -34,7 +34,7 @@ const Assignment = () => {
             const response = await api.get('/submissions/', {
                 params: { assignment: assignmentId }
             });
-            setSubmissions(response.data.filter(s => s.assignment === parseInt(assignmentId)));
+            setSubmissions(response.data.results.filter(s => s.assignment === parseInt(assignmentId)));
         } catch (error) {
             console.error('Failed to fetch submissions', error);
         }
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useParams } from 'react-router-dom';
-import api from '../services/api';
+import api, { getAllPages } from '../services/api';
 import { MessageCircle, Send, User } from 'lucide-react';
 
 const Discussion = () => {
@@ -17,10 +17,7 @@ const Discussion = () => {
 
     const fetchDiscussions = async () => {
         try {
-            const response = await api.get('/communication/discussions/', {
-                params: { course: courseId }
-            });
-            setDiscussions(response.data.filter(d => d.course === parseInt(courseId)));
+            setDiscussions(await getAllPages('/communication/discussions/', { course: courseId }));
             setLoading(false);
         } catch (error) {
             console.error('Failed to fetch discussions', error);
@@ -10,6 +10,68 @@ const InstructorAnalytics = () => {
         fetchStats();
     }, []);
 
+    // Apply live deltas on top of the loaded snapshot instead of re-requesting it.
+    useEffect(() => {
+        let source = null;
+        let retry = null;
+        let closed = false;
+
+        const applyDelta = (courseId, change) => {
+            setStats((current) => {
+                if (!current) return current;
+                const courses = current.courses.map((course) => {
+                    if (course.id !== courseId) return course;
+                    if (change.enrollments) return { ...course, enrollments: course.enrollments + change.enrollments };
+                    if (change.revenue) return { ...course, revenue: course.revenue + change.revenue };
+                    if (change.score !== undefined && change.score !== null) {
+                        const attempts = (course.quiz_attempts || 0) + 1;
+                        const average = ((course.average_quiz_score || 0) * (attempts - 1) + change.score) / attempts;
+                        return { ...course, quiz_attempts: attempts, average_quiz_score: average };
+                    }
+                    return course;
+                });
+                return {
+                    ...current,
+                    courses,
+                    total_enrollments: current.total_enrollments + (change.enrollments || 0),
+                    total_revenue: current.total_revenue + (change.revenue || 0),
+                };
+            });
+        };
+
+        const connect = async () => {
+            try {
+                const response = await api.get('/analytics/stats/live/');
+                if (closed) return;
+                source = new EventSource(response.data.url);
+                source.addEventListener('enrollment', (e) => applyDelta(JSON.parse(e.data).course, { enrollments: 1 }));
+                source.addEventListener('payment', (e) => {
+                    const data = JSON.parse(e.data);
+                    applyDelta(data.course, { revenue: data.amount });
+                });
+                source.addEventListener('quiz_attempt', (e) => {
+                    const data = JSON.parse(e.data);
+                    applyDelta(data.course, { score: data.score });
+                });
+                source.onerror = () => {
+                    // The stream URL expires soon after issue: reload the snapshot and ask for a fresh one.
+                    source.close();
+                    if (!closed) retry = setTimeout(() => fetchStats().then(connect), 5000);
+                };
+            } catch (error) {
+                // 503: the API is not served over ASGI, so keep the loaded snapshot without live updates.
+                if (error.response?.status !== 503) console.error('Live analytics unavailable', error);
+            }
+        };
+
+        connect();
+        return () => {
+            closed = true;
+            clearTimeout(retry);
+            if (source) source.close();
+        };
+    }, []);
+
     const fetchStats = async () => {
         try {
             const response = await api.get('/analytics/stats/instructor_stats/');
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import api from '../services/api';
+import api, { getAllPages } from '../services/api';
 import { Link } from 'react-router-dom';
 import { PlusCircle, Edit, Trash } from 'lucide-react';
 
@@ -12,8 +12,7 @@ const InstructorDashboard = () => {
 
     const fetchCourses = async () => {
         try {
-            const response = await api.get('courses/?mine=true');
-            setCourses(response.data);
+            setCourses(await getAllPages('courses/', { mine: true }));
         } catch (error) {
             console.error("Failed to fetch courses", error);
         }
@@ -13,7 +13,7 @@ const Notifications = () => {
     const fetchNotifications = async () => {
         try {
             const response = await api.get('/communication/notifications/');
-            setNotifications(response.data);
+            setNotifications(response.data.results);
             setLoading(false);
         } catch (error) {
             console.error('Failed to fetch notifications', error);
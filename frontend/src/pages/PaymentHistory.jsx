@@ -13,7 +13,7 @@ const PaymentHistory = () => {
     const fetchPayments = async () => {
         try {
             const response = await api.get('/payments/history/');
-            setPayments(response.data);
+            setPayments(response.data.results);
         } catch (error) {
             console.error('Failed to fetch payment history', error);
         } finally {
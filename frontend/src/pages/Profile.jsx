@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useContext } from 'react';
-import api from '../services/api';
+import api, { getAllPages } from '../services/api';
 import { AuthContext } from '../context/AuthContext';
 import { User, Mail, Save, BookOpen } from 'lucide-react';
 
@@ -43,9 +43,8 @@ const Profile = () => {
 
             if (!authUser) return;
 
-            const endpoint = authUser.role === 'INSTRUCTOR' ? 'courses/?mine=true' : 'courses/?enrolled=true';
-            const response = await api.get(endpoint);
-            setCourses(response.data);
+            const params = authUser.role === 'INSTRUCTOR' ? { mine: true } : { enrolled: true };
+            setCourses(await getAllPages('courses/', params));
         } catch (error) {
             console.error("Failed to fetch courses", error);
         }
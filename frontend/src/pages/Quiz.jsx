@@ -89,7 +89,10 @@ const Quiz = () => {
                         <div className="mb-8">
                             <h2 className="text-xl font-semibold mb-4">{question.text}</h2>
                             <div className="space-y-3">
-                                {question.options.map((option, idx) => (
+                                {question.options.map((option, displayIdx) => {
+                                    // Shuffled quizzes list each option's original index in option_order.
+                                    const idx = question.option_order ? question.option_order[displayIdx] : displayIdx;
+                                    return (
                                     <button
                                         key={idx}
                                         onClick={() => handleAnswerSelect(question.id, idx)}
@@ -112,7 +115,8 @@ const Quiz = () => {
                                             <span>{option}</span>
                                         </div>
                                     </button>
-                                ))}
+                                    );
+                                })}
                             </div>
                         </div>
                     )}
@@ -60,7 +60,9 @@ const QuizResults = () => {
                         <div className="space-y-6">
                             {questions.map((question, idx) => {
                                 const userAnswer = attempt.answers[question.id];
-                                const isCorrect = userAnswer === question.correct_answer;
+                                // The key is only sent to the instructor; students see which questions they got right.
+                                const correctOptions = attempt.correct_answers?.[question.id] || [];
+                                const isCorrect = attempt.question_results?.[question.id] === 1;
 
                                 return (
                                     <div key={question.id} className="border rounded-lg p-6">
@@ -76,9 +78,10 @@ const QuizResults = () => {
                                                 </h3>
 
                                                 <div className="space-y-2">
-                                                    {question.options.map((option, optIdx) => {
-                                                        const isUserAnswer = userAnswer === optIdx;
-                                                        const isCorrectAnswer = optIdx === question.correct_answer;
+                                                    {question.options.map((option, displayIdx) => {
+                                                        const optIdx = question.option_order ? question.option_order[displayIdx] : displayIdx;
+                                                        const isUserAnswer = Array.isArray(userAnswer) ? userAnswer.includes(optIdx) : userAnswer === optIdx;
+                                                        const isCorrectAnswer = correctOptions.includes(optIdx);
 
                                                         return (
                                                             <div
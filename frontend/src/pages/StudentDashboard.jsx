@@ -1,5 +1,5 @@
 import React, { useEffect, useState, useContext } from 'react';
-import api from '../services/api';
+import { getAllPages } from '../services/api';
 import { Link } from 'react-router-dom';
 import { AuthContext } from '../context/AuthContext';
 import Footer from '../components/Footer';
@@ -20,9 +20,7 @@ const StudentDashboard = () => {
         try {
             setLoading(true);
             setError(null);
-            const response = await api.get('/courses/');
-            console.log('Courses fetched:', response.data);
-            setCourses(response.data);
+            setCourses(await getAllPages('/courses/'));
         } catch (error) {
             console.error("Failed to fetch courses", error);
             setError('Failed to load courses. Please try again later.');
@@ -17,4 +17,16 @@ api.interceptors.request.use(
     }
 );
 
+// List endpoints are cursor-paginated; follow `next` until the last page.
+export const getAllPages = async (url, params = {}) => {
+    const items = [];
+    let response = await api.get(url, { params: { page_size: 100, ...params } });
+    items.push(...response.data.results);
+    while (response.data.next) {
+        response = await api.get(response.data.next);
+        items.push(...response.data.results);
+    }
+    return items;
+};
+
 export default api;